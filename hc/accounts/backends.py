@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.http import HttpRequest
@@ -17,6 +18,10 @@ class BasicBackend:
         except User.DoesNotExist:
             return None
 
+    async def aget_user(self, user_id: int) -> User | None:
+        # Used by request.auser() in async middleware and views
+        return await sync_to_async(self.get_user)(user_id)
+
 
 # Authenticate against the token in user's profile.
 class ProfileBackend(BasicBackend):
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 from collections.abc import Callable
-from typing import cast
+from typing import Any, cast
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
 from django.contrib import auth
 from django.core.exceptions import MiddlewareNotUsed
@@ -15,10 +16,20 @@ MiddlewareFunc = Callable[[HttpRequest], HttpResponse]
 
 
 class TeamAccessMiddleware:
-    def __init__(self, get_response: MiddlewareFunc) -> None:
+    # Supports async mode, so that the async ping views of the ASGI entry point
+    # (hc/asgi.py) do not need a thread switch for this middleware.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Any) -> None:
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
 
-    def __call__(self, request: HttpRequest) -> HttpResponse:
         if not request.user.is_authenticated:
             return self.get_response(request)
 
@@ -26,6 +37,15 @@ class TeamAccessMiddleware:
         request.profile = Profile.objects.for_user(request.user)
         return self.get_response(request)
 
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        user = await request.auser()
+        if user.is_authenticated:
+            request = cast(AuthenticatedHttpRequest, request)
+            request.profile = await sync_to_async(Profile.objects.for_user)(user)
+
+        response: HttpResponse = await self.get_response(request)
+        return response
+
 
 class CustomHeaderMiddleware:
     """
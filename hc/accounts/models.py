@@ -206,6 +206,8 @@ class Profile(models.Model):
         return Check.objects.filter(project__in=self.project_ids())
 
     def send_report(self, nag: bool = False) -> bool:
+        from hc.api.statuses import bulk_statuses
+
         q = self.checks_from_all_projects()
 
         # Has there been a ping in last 6 months?
@@ -280,7 +282,8 @@ class Profile(models.Model):
 
         if nag:
             # For nags, only show checks that are currently down
-            checks = [c for c in checks if c.get_status() == "down"]
+            check_statuses = bulk_statuses(q)
+            checks = [c for c in checks if check_statuses.get(c.code) == "down"]
             if not checks:
                 return False
             ctx["checks"] = checks
@@ -499,12 +502,9 @@ class Project(models.Model):
             profile.update_next_nag_date()
 
     def get_n_down(self) -> int:
-        result = 0
-        for check in self.check_set.all():
-            if check.get_status() == "down":
-                result += 1
+        from hc.api.statuses import down_q
 
-        return result
+        return self.check_set.filter(down_q(now())).count()
 
     def have_channel_issues(self) -> bool:
         errors = list(self.channel_set.values_list("last_error", flat=True))
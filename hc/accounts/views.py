@@ -36,6 +36,7 @@ from hc.accounts import forms
 from hc.accounts.decorators import require_sudo_mode
 from hc.accounts.http import AuthenticatedHttpRequest
 from hc.accounts.models import Credential, Member, Profile, Project
+from hc.api import pingcache
 from hc.api.models import Channel, Check, TokenBucket
 from hc.lib.tz import all_timezones
 from hc.lib.webauthn import CreateHelper, GetHelper
@@ -391,7 +392,9 @@ def project(request: AuthenticatedHttpRequest, code: UUID) -> HttpResponse:
             elif request.POST["create_key"] == "api_key_readonly":
                 ctx["new_key"] = project.set_api_key_readonly()
             elif request.POST["create_key"] == "ping_key":
+                old_ping_key = project.ping_key
                 ctx["new_ping_key"] = project.set_ping_key()
+                pingcache.invalidate_ping_key(project, old_ping_key)
             project.save()
 
             ctx["key_created"] = True
@@ -405,6 +408,7 @@ def project(request: AuthenticatedHttpRequest, code: UUID) -> HttpResponse:
             elif request.POST["revoke_key"] == "api_key_readonly":
                 project.api_key_readonly = ""
             elif request.POST["revoke_key"] == "ping_key":
+                pingcache.invalidate_ping_key(project, project.ping_key)
                 project.ping_key = None
             project.save()
 
@@ -14,9 +14,19 @@ from django.http import HttpRequest
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from django.utils.timezone import now
 from django_stubs_ext import WithAnnotations
 
-from hc.api.models import Channel, Check, Flip, Notification, Ping
+from hc.api.models import (
+    BREAKER_COOLDOWN,
+    Channel,
+    Check,
+    CircuitBreaker,
+    Flip,
+    Notification,
+    Ping,
+)
+from hc.api.transports import BREAKER_ERROR
 from hc.lib.date import format_duration
 
 Lookups = Iterable[tuple[str, str]]
@@ -172,6 +182,7 @@ class LastErrorFilter(admin.SimpleListFilter):
         return (
             ("ok", "No Error"),
             ("error", "Error"),
+            ("breaker", "Circuit Breaker Open"),
         )
 
     def queryset(self, r: HttpRequest, qs: QuerySet[Channel]) -> QuerySet[Channel]:
@@ -180,6 +191,8 @@ class LastErrorFilter(admin.SimpleListFilter):
             qs = qs.filter(last_error="")
         elif v == "error":
             qs = qs.exclude(last_error="")
+        elif v == "breaker":
+            qs = qs.filter(last_error__startswith=BREAKER_ERROR)
 
         return qs
 
@@ -258,6 +271,8 @@ class ChannelsAdmin(ModelAdmin[Channel]):
     def status(self, obj: Channel) -> str:
         if obj.disabled:
             return "<span class='d'>Disabled</span>"
+        if obj.last_error.startswith(BREAKER_ERROR):
+            return "<span class='e'>Breaker open</span>"
         if obj.last_error:
             return "<span class='e'>Error</span>"
         if obj.last_notify:
@@ -320,6 +335,20 @@ class NotificationsAdmin(ModelAdmin[Notification]):
         return format_html("""<div><a href="{}">{}</a></div>""", url, name)
 
 
+@admin.register(CircuitBreaker)
+class CircuitBreakersAdmin(ModelAdmin[CircuitBreaker]):
+    search_fields = ("key",)
+    list_display = ("key", "failures", "state", "opened", "updated")
+    ordering = ("-updated",)
+
+    def state(self, obj: CircuitBreaker) -> str:
+        if obj.opened is None:
+            return "Closed"
+        if now() >= obj.opened + BREAKER_COOLDOWN:
+            return "Half-open"
+        return "Open"
+
+
 @admin.register(Flip)
 class FlipsAdmin(ModelAdmin[Flip]):
     list_display = ("id", "created", "processed", "owner", "old_status", "new_status")
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import random
+import statistics
+import threading
+import time
+from argparse import ArgumentParser
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from hc.accounts.models import Project
+from hc.api import pingcache
+from hc.api.models import Check
+
+BENCH_USERNAME = "hc-benchpings"
+# SQL statements that wait for the Check row lock (PostgreSQL, MySQL)
+# or the database write lock (SQLite)
+LOCK_STATEMENTS = ("FOR UPDATE", "BEGIN IMMEDIATE")
+
+
+@dataclass
+class Scenario:
+    name: str
+    by_slug: bool
+    body_size: int = 0
+    filter_http_body: bool = False
+
+
+SCENARIOS = [
+    Scenario("uuid", by_slug=False),
+    Scenario("uuid-body", by_slug=False, body_size=1000),
+    Scenario("slug", by_slug=True),
+    Scenario("slug-body", by_slug=True, body_size=1000),
+    Scenario("filter", by_slug=False, body_size=1000, filter_http_body=True),
+]
+
+
+@dataclass
+class Stats:
+    latencies: list[float] = field(default_factory=list)
+    queries: int = 0
+    lock_wait: float = 0.0
+    errors: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record_query(
+        self,
+        execute: Callable[..., Any],
+        sql: str,
+        params: Any,
+        many: bool,
+        context: dict[str, Any],
+    ) -> Any:
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.queries += 1
+                if any(s in sql.upper() for s in LOCK_STATEMENTS):
+                    self.lock_wait += elapsed
+
+
+def percentile(values: list[float], pct: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+class Command(BaseCommand):
+    help = """Benchmark ping ingestion.
+
+    Creates a throwaway user with projects and checks, sends pings to them
+    through the full Django request handling stack (URL routing, middleware,
+    ping views, Check.ping()) from concurrent threads, and reports throughput,
+    latency percentiles, database queries per ping, and the time spent
+    waiting for locks. Runs against the database configured in settings,
+    so use the DB environment variable to compare SQLite and PostgreSQL.
+
+    """
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        parser.add_argument(
+            "--projects", type=int, default=10, help="Number of projects to seed"
+        )
+        parser.add_argument(
+            "--checks", type=int, default=100, help="Number of checks per project"
+        )
+        parser.add_argument(
+            "--pings", type=int, default=2000, help="Number of pings per scenario"
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Number of threads sending pings",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=[s.name for s in SCENARIOS],
+            help="Scenario to run (can be repeated, default: all)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed for the random ping targets"
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Do not delete the seeded data after the benchmark",
+        )
+
+    def seed(self, num_projects: int, num_checks: int) -> list[Check]:
+        User.objects.filter(username=BENCH_USERNAME).delete()
+        user = User.objects.create(username=BENCH_USERNAME)
+
+        for i in range(0, num_projects):
+            project = Project.objects.create(
+                owner=user,
+                name=f"Benchmark {i}",
+                badge_key=f"benchpings-{i}",
+                ping_key=f"benchpings{i:012d}",
+            )
+            batch = [
+                Check(project=project, name=f"bench-{j}", slug=f"bench-{j}")
+                for j in range(0, num_checks)
+            ]
+            Check.objects.bulk_create(batch)
+
+        q = Check.objects.filter(project__owner=user).select_related("project")
+        return list(q.order_by("id"))
+
+    def run_scenario(
+        self,
+        scenario: Scenario,
+        checks: list[Check],
+        num_pings: int,
+        concurrency: int,
+        rnd: random.Random,
+    ) -> tuple[Stats, float]:
+        ids = [c.id for c in checks]
+        Check.objects.filter(id__in=ids).update(
+            filter_http_body=scenario.filter_http_body,
+            success_kw="SUCCESS" if scenario.filter_http_body else "",
+            failure_kw="FAILURE" if scenario.filter_http_body else "",
+        )
+        # The update above bypasses Check.save(), so invalidate explicitly
+        for check in checks:
+            pingcache.invalidate(check)
+
+        urls = []
+        for check in rnd.choices(checks, k=num_pings):
+            if scenario.by_slug:
+                urls.append(f"/ping/{check.project.ping_key}/{check.slug}")
+            else:
+                urls.append(f"/ping/{check.code}")
+
+        body = b""
+        if scenario.body_size:
+            body = b"x" * (scenario.body_size - len(b"SUCCESS")) + b"SUCCESS"
+
+        host = next((h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"), "")
+        stats = Stats()
+        local = threading.local()
+
+        def send(url: str) -> None:
+            if not hasattr(local, "client"):
+                local.client = Client(HTTP_HOST=host or "localhost")
+
+            with connection.execute_wrapper(stats.record_query):
+                start = time.perf_counter()
+                if body:
+                    r = local.client.post(url, body, content_type="text/plain")
+                else:
+                    r = local.client.get(url)
+                elapsed = time.perf_counter() - start
+
+            with stats.lock:
+                stats.latencies.append(elapsed)
+                if r.status_code != 200:
+                    stats.errors += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(send, urls))
+        wall_time = time.perf_counter() - start
+
+        return stats, wall_time
+
+    def handle(self, **options: Any) -> str:
+        names = options["scenario"] or [s.name for s in SCENARIOS]
+        scenarios = [s for s in SCENARIOS if s.name in names]
+        rnd = random.Random(options["seed"])
+
+        vendor = connection.vendor
+        self.stdout.write(
+            f"Database: {vendor}, concurrency: {options['concurrency']}, "
+            f"pings per scenario: {options['pings']}\n"
+        )
+
+        checks = self.seed(options["projects"], options["checks"])
+        try:
+            header = (
+                f"{'scenario':<10} {'pings/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+                f"{'p99 ms':>8} {'queries':>8} {'lock ms':>8} {'errors':>7}"
+            )
+            self.stdout.write(header)
+            for scenario in scenarios:
+                stats, wall_time = self.run_scenario(
+                    scenario, checks, options["pings"], options["concurrency"], rnd
+                )
+                n = len(stats.latencies)
+                ms = [v * 1000 for v in stats.latencies]
+                self.stdout.write(
+                    f"{scenario.name:<10} {n / wall_time:>9.1f} "
+                    f"{percentile(ms, 50):>8.2f} {percentile(ms, 95):>8.2f} "
+                    f"{percentile(ms, 99):>8.2f} {stats.queries / n:>8.1f} "
+                    f"{stats.lock_wait * 1000 / n:>8.2f} {stats.errors:>7}"
+                )
+        finally:
+            if not options["keep"]:
+                User.objects.filter(username=BENCH_USERNAME).delete()
+
+        return (
+            "\n'queries' and 'lock ms' are per ping. 'lock ms' is the time spent in "
+            "SELECT ... FOR UPDATE (PostgreSQL, MySQL) or BEGIN IMMEDIATE (SQLite)."
+        )
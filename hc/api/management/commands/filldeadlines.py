@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from hc.api import statuses
+from hc.api.models import Check
+
+
+class Command(BaseCommand):
+    help = """Fill in Check.grace_start for existing checks.
+
+    Checks get their grace_start field set whenever they receive a ping or their
+    schedule changes. Run this once after upgrading, to fill in grace_start for
+    the checks that have not been pinged since.
+    """
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of checks to load in one query (default: 1000)",
+        )
+
+    def handle(self, batch_size: int, **options: Any) -> str:
+        q = Check.objects.filter(status="up", grace_start=None).order_by("id")
+        q = q.only("id", *statuses.TIMING_FIELDS)
+
+        num_filled, last_id = 0, 0
+        while checks := list(q.filter(id__gt=last_id)[:batch_size]):
+            last_id = checks[-1].id
+            for check in checks:
+                grace_start = statuses.grace_start(check.timing())
+                if grace_start is None:
+                    continue
+
+                # Skip the check if it has received a ping in the meantime,
+                # the ping has already set grace_start
+                row = Check.objects.filter(
+                    id=check.id, grace_start=None, last_ping=check.last_ping
+                )
+                num_filled += row.update(grace_start=grace_start)
+
+            self.stdout.write(f"Processed checks up to id {last_id}")
+
+        return f"Done! Filled in grace_start for {num_filled} checks."
@@ -1,27 +1,118 @@
 from __future__ import annotations
 
+import heapq
+import itertools
 import logging
+import math
 import signal
 import time
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
+from collections.abc import Callable
 from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
 from datetime import timedelta as td
-from threading import BoundedSemaphore
+from functools import partial
+from queue import Empty, SimpleQueue
+from threading import BoundedSemaphore, Lock, Thread
 from types import FrameType
 from typing import Any
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.db import close_old_connections, connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, transaction
 from django.utils.timezone import now
 
-from hc.api.models import Check, Flip
+from hc.api import pruner
+from hc.api.models import TRANSPORTS, Channel, Check, Flip, NotificationRetry
+from hc.api.shards import Membership
+from hc.api.wakeup import Listener
 from hc.lib.statsd import statsd
 
 logger = logging.getLogger("hc")
 
+# The minimum number of threads per integration kind, see KindPools
+KIND_WORKERS = 4
+# The weight of the latest sample in moving averages
+EWMA_WEIGHT = 0.2
+# How often the Autoscaler adjusts pool sizes
+AUTOSCALE_INTERVAL = td(seconds=5)
+# The longest a notification should wait in a pool's queue, see Autoscaler
+TARGET_WAIT = td(seconds=5)
+# How long an idle WorkerPool thread waits for a job before checking
+# if it should exit, in seconds
+IDLE_TIMEOUT = 1.0
+# Unprocessed "up" flips older than this get claimed before "down" flips,
+# see claim_flips()
+STARVATION_AGE = td(minutes=2)
+# The number of threads per integration kind for notification retries
+RETRY_WORKERS = 2
+# How long a claimed retry stays claimed. If sendalerts stops before making
+# the attempt, another sendalerts process picks it up after this delay.
+RETRY_LEASE = td(minutes=5)
+
+
+def notify_channel(flip: Flip, ch: Channel) -> str:
+    """Send a notification about `flip` to `ch`, return a log line."""
+
+    notify_start = time.time()
+    # Retry failed HTTP requests later, instead of holding up the worker
+    error = ch.notify(flip, retry_queue=True)
+    secs = time.time() - notify_start
+    code8 = str(ch.code)[:8]
+    if error:
+        statsd.incr(f"hc.notifications.{ch.kind}.fail")
+        return f"  {code8} ({ch.kind}) Error in {secs:.1f}s: {error}"
+
+    statsd.incr(f"hc.notifications.{ch.kind}.success")
+    return f"  {code8} ({ch.kind}) OK in {secs:.1f}s"
+
+
+def notify_digest(flips: list[Flip], ch: Channel) -> str:
+    """Send a digest notification about `flips` to `ch`, return a log."""
+
+    statsd.timing("hc.sendalerts.digestSize", len(flips))
+    notify_start = time.time()
+    error = ch.notify_digest(flips)
+    secs = time.time() - notify_start
+    header = f"Digest of {len(flips)} flips to {str(ch.code)[:8]} ({ch.kind})"
+    if error:
+        statsd.incr(f"hc.notifications.{ch.kind}.fail")
+        return f"{header}: Error in {secs:.1f}s: {error}"
+
+    statsd.incr(f"hc.notifications.{ch.kind}.success")
+    return f"{header}: OK in {secs:.1f}s"
+
+
+def notify_retry(retry: NotificationRetry) -> str:
+    """Make another attempt to deliver a failed notification, return a log line."""
+
+    ch = retry.notification.channel
+    attempt = retry.attempts + 1
+    notify_start = time.time()
+    error = retry.attempt()
+    secs = time.time() - notify_start
+    prefix = f"Retry #{attempt} to {str(ch.code)[:8]} ({ch.kind})"
+    if error:
+        statsd.incr(f"hc.notifications.{ch.kind}.fail")
+        return f"{prefix}: Error in {secs:.1f}s: {error}"
+
+    statsd.incr(f"hc.notifications.{ch.kind}.success")
+    return f"{prefix}: OK in {secs:.1f}s"
+
+
+def notify(
+    flip: Flip, pools: KindPools | None = None, digester: Digester | None = None
+) -> str | Delivery | None:
+    """Send notifications about `flip`.
+
+    If `pools` is given, hand the notifications over to the per-kind pools
+    and return a Delivery right away. The pools send them concurrently, and
+    the Delivery logs the results once the last one completes. Otherwise send
+    them one by one, and return the log.
+
+    If `digester` is given, leave out the channels it defers to a digest.
+    """
 
-def notify(flip: Flip) -> str | None:
     # This is run via ThreadPoolExecutor. The thread may already have an open
     # db connection. If notify has not run recently then the db connection may have
     # timed out. We call close_old_connections() to make sure we have a working db
@@ -37,24 +128,601 @@ def notify(flip: Flip) -> str | None:
         return None
 
     send_start = now()
-    logs = [f"{check.code} goes {flip.new_status}"]
+    statsd.timing("hc.sendalerts.dwellTime", send_start - flip.created)
+    if pools:
+        pools.observe_dwell((send_start - flip.created).total_seconds())
+    header = f"{check.code} goes {flip.new_status}"
+    if digester:
+        deferred = [ch for ch in channels if digester.defer(flip, ch)]
+        for ch in deferred:
+            header += f"\n  {str(ch.code)[:8]} ({ch.kind}) Deferred to a digest"
+        channels = [ch for ch in channels if ch not in deferred]
+        if not channels:
+            return header
+
+    if pools:
+        # Channels are sorted by last_notify_duration, submit the fast ones first
+        delivery = Delivery(header, len(channels), send_start, pools.log)
+        for i, ch in enumerate(channels):
+            fn = partial(notify_channel, flip, ch)
+            pools.submit(ch.kind, fn, partial(delivery.add_result, i))
+        return delivery
+
+    logs = [header]
     for ch in channels:
-        notify_start = time.time()
-        error = ch.notify(flip)
-        secs = time.time() - notify_start
-        code8 = str(ch.code)[:8]
-        if error:
-            logs.append(f"  {code8} ({ch.kind}) Error in {secs:.1f}s: {error}")
-            statsd.incr(f"hc.notifications.{ch.kind}.fail")
-        else:
-            logs.append(f"  {code8} ({ch.kind}) OK in {secs:.1f}s")
-            statsd.incr(f"hc.notifications.{ch.kind}.success")
+        logs.append(notify_channel(flip, ch))
 
-    statsd.timing("hc.sendalerts.dwellTime", send_start - flip.created)
     statsd.timing("hc.sendalerts.sendTime", now() - send_start)
     return "\n".join(logs)
 
 
+class Delivery:
+    """Collect the results of one flip's notifications.
+
+    The notifications run concurrently. When the last one completes, log all
+    results together, in the original channel order.
+    """
+
+    def __init__(
+        self,
+        header: str,
+        num_channels: int,
+        send_start: datetime,
+        log: Callable[[str], Any],
+    ) -> None:
+        self.header = header
+        self.results: list[str] = [""] * num_channels
+        self.remaining = num_channels
+        self.send_start = send_start
+        self.log = log
+        self.callbacks: list[Callable[[], Any]] = []
+        self.lock = Lock()
+
+    def add_result(self, idx: int, result: str) -> None:
+        with self.lock:
+            self.results[idx] = result
+            self.remaining -= 1
+            if self.remaining:
+                return
+
+        # The time until the slowest channel completes
+        statsd.timing("hc.sendalerts.sendTime", now() - self.send_start)
+        self.log("\n".join([self.header] + self.results))
+        for fn in self.callbacks:
+            fn()
+
+    def add_done_callback(self, fn: Callable[[], Any]) -> None:
+        """Call `fn` once the last notification completes.
+
+        If it has already completed, call `fn` right away.
+        """
+
+        with self.lock:
+            if self.remaining:
+                self.callbacks.append(fn)
+                return
+
+        fn()
+
+
+class KindPools:
+    """Per-Channel.kind thread pools for sending notifications.
+
+    Each integration kind gets its own pool, so a slow integration (for example,
+    a webhook endpoint that keeps timing out) can only hold up notifications
+    of its own kind. Pools get created on first use, with `sizes[kind]` threads,
+    or `default_size` threads for kinds not listed in `sizes`.
+
+    The number of notifications queued or in progress in each pool is
+    reported to statsd as hc.sendalerts.queueDepth.<kind>, or as
+    hc.sendalerts.<name>QueueDepth.<kind> for pools with a `name`.
+    """
+
+    def __init__(
+        self,
+        default_size: int,
+        sizes: dict[str, int],
+        log: Callable[[str], Any],
+        name: str = "",
+    ) -> None:
+        self.default_size = default_size
+        self.sizes = sizes
+        self.log = log
+        # Named pools get their own thread names and statsd gauges
+        self.prefix = f"sendalerts-{name}" if name else "sendalerts"
+        self.metric = (
+            f"hc.sendalerts.{name}QueueDepth" if name else "hc.sendalerts.queueDepth"
+        )
+        self.executors: dict[str, WorkerPool] = {}
+        self.pending: dict[str, int] = {}
+        # Moving averages of notification latency per kind, and of flip
+        # dwell time (see notify()), in seconds. The Autoscaler uses them.
+        self.latency: dict[str, float] = {}
+        self.dwell = 0.0
+        self.lock = Lock()
+
+    def set_pending(self, kind: str, delta: int) -> None:
+        with self.lock:
+            self.pending[kind] = self.pending.get(kind, 0) + delta
+            statsd.gauge(f"{self.metric}.{kind}", self.pending[kind])
+
+    def observe_latency(self, kind: str, secs: float) -> None:
+        with self.lock:
+            prev = self.latency.get(kind, secs)
+            self.latency[kind] = prev + EWMA_WEIGHT * (secs - prev)
+
+    def observe_dwell(self, secs: float) -> None:
+        with self.lock:
+            self.dwell += EWMA_WEIGHT * (secs - self.dwell)
+
+    def submit(
+        self, kind: str, fn: Callable[[], str], callback: Callable[[str], Any]
+    ) -> None:
+        """Run `fn` in the pool for `kind`, and pass its result to `callback`."""
+
+        with self.lock:
+            if kind not in self.executors:
+                size = self.sizes.get(kind, self.default_size)
+                prefix = f"{self.prefix}-{kind}"
+                self.executors[kind] = WorkerPool(size, prefix)
+            executor = self.executors[kind]
+
+        def run() -> None:
+            # This runs in a long-lived thread, so manage its database
+            # connection the way Django does at the start and end of a request.
+            # Otherwise every idle pool thread would keep a connection open.
+            if not connection.in_atomic_block:
+                close_old_connections()
+
+            start = time.time()
+            try:
+                result = fn()
+            except Exception as exc:
+                logger.error("Exception in notify", exc_info=exc)
+                result = f"  ({kind}) Exception: {exc!r}"
+            finally:
+                if not connection.in_atomic_block:
+                    close_old_connections()
+            self.observe_latency(kind, time.time() - start)
+            self.set_pending(kind, -1)
+            callback(result)
+
+        self.set_pending(kind, 1)
+        executor.submit(run)
+
+    def shutdown(self) -> None:
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+
+
+class WorkerPool:
+    """A thread pool that can grow and shrink while it runs.
+
+    resize() starts new threads right away. When the pool shrinks, surplus
+    threads finish their current job and exit, and close their database
+    connections, so an idle pool does not hold on to connections it no longer
+    needs.
+    """
+
+    def __init__(self, size: int, prefix: str) -> None:
+        self.prefix = prefix
+        self.size = 0
+        self.num_threads = 0
+        self.counter = itertools.count()
+        self.queue: SimpleQueue[Callable[[], Any] | None] = SimpleQueue()
+        self.threads: list[Thread] = []
+        self.lock = Lock()
+        self.resize(size)
+
+    def submit(self, fn: Callable[[], Any]) -> None:
+        self.queue.put(fn)
+
+    def resize(self, size: int) -> None:
+        with self.lock:
+            self.size = size
+            self.threads = [t for t in self.threads if t.is_alive()]
+            while self.num_threads < size:
+                name = f"{self.prefix}_{next(self.counter)}"
+                t = Thread(target=self.work, name=name, daemon=True)
+                self.num_threads += 1
+                self.threads.append(t)
+                t.start()
+
+    def retire(self) -> bool:
+        """Return True if the calling thread should exit to shrink the pool."""
+
+        with self.lock:
+            if self.num_threads > self.size:
+                self.num_threads -= 1
+                return True
+            return False
+
+    def work(self) -> None:
+        while True:
+            try:
+                fn = self.queue.get(timeout=IDLE_TIMEOUT)
+            except Empty:
+                if self.retire():
+                    break
+                continue
+
+            if fn is None:
+                # Shutting down
+                break
+
+            fn()
+            if self.retire():
+                break
+
+        # Release the database connection this thread holds, if any.
+        # The if condition makes sure this does not run during tests.
+        if not connection.in_atomic_block:
+            connection.close()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Finish the queued jobs, then stop all threads."""
+
+        with self.lock:
+            threads = list(self.threads)
+        for _ in threads:
+            self.queue.put(None)
+        if wait:
+            for t in threads:
+                t.join()
+
+
+class Autoscaler:
+    """Adaptive sizing of the per-kind notification pools (--max-workers).
+
+    Every AUTOSCALE_INTERVAL seconds, look at each pool's backlog
+    (notifications queued or in progress) and its moving average latency,
+    and estimate how long a newly queued notification would wait. If the
+    estimate exceeds TARGET_WAIT, grow the pool to bring the wait down
+    to TARGET_WAIT, up to `max_size` threads. Shrink a pool by half, down to
+    `min_size` threads, when it has more than twice the threads its backlog
+    needs, there are no unprocessed flips in the database, and flips wait
+    no longer than TARGET_WAIT to be picked up.
+    """
+
+    def __init__(
+        self,
+        pools: KindPools,
+        min_size: int,
+        max_size: int,
+        log: Callable[[str], Any],
+    ) -> None:
+        self.pools = pools
+        self.min_size = min_size
+        self.max_size = max_size
+        self.log = log
+        self.checked_at = 0.0
+
+    def target_size(self, size: int, pending: int, latency: float, busy: bool) -> int:
+        """Return the new size for a pool of `size` threads."""
+
+        expected_wait = latency * pending / size
+        if expected_wait > TARGET_WAIT.total_seconds():
+            needed = math.ceil(latency * pending / TARGET_WAIT.total_seconds())
+            return min(max(needed, size + 1), self.max_size)
+
+        if not busy and pending * 2 < size:
+            return max(size // 2, pending, self.min_size)
+
+        return size
+
+    def maybe_scale(self) -> None:
+        if time.monotonic() < self.checked_at + AUTOSCALE_INTERVAL.total_seconds():
+            return
+
+        self.checked_at = time.monotonic()
+        backlog = Flip.objects.filter(processed=None).count()
+        statsd.gauge("hc.sendalerts.backlog", backlog)
+        with self.pools.lock:
+            dwell = self.pools.dwell
+            stats = [
+                (
+                    kind,
+                    pool,
+                    self.pools.pending.get(kind, 0),
+                    self.pools.latency.get(kind, 0.0),
+                )
+                for kind, pool in self.pools.executors.items()
+                # Leave the pools sized with --kind-workers alone
+                if kind not in self.pools.sizes
+            ]
+
+        busy = backlog > 0 or dwell > TARGET_WAIT.total_seconds()
+        for kind, pool, pending, latency in stats:
+            size = self.target_size(pool.size, pending, latency, busy)
+            statsd.gauge(f"hc.sendalerts.poolSize.{kind}", size)
+            if size != pool.size:
+                self.log(
+                    f"Autoscaling {kind} pool from {pool.size} to {size} threads "
+                    f"(pending {pending}, latency {latency:.1f}s, "
+                    f"backlog {backlog}, dwell {dwell:.1f}s)\n"
+                )
+                pool.resize(size)
+
+
+class Digester:
+    """Per-channel coalescing of notifications, for the outage digest mode.
+
+    When a shared dependency fails, many checks in a project can go down
+    within seconds, and every channel would receive a separate notification
+    about each of them. In the digest mode, the first flip for a channel
+    is sent right away, and opens a coalescing window of `window` seconds
+    for the channel. Flips for the channel that arrive while the window is open
+    are collected, and sent as a single digest notification when the window
+    closes. After a digest is sent, a new window opens, so a long-running
+    outage produces at most one notification per channel per window.
+
+    Only channels with transports that implement Transport.notify_digest()
+    are coalesced. Windows are tracked in memory, so each sendalerts process
+    coalesces the flips it processes itself.
+    """
+
+    def __init__(self, window: float) -> None:
+        self.window = td(seconds=window)
+        # Channel id -> the time its coalescing window closes
+        self.closes: dict[int, datetime] = {}
+        # Channel id -> the channel and the flips collected for it
+        self.pending: dict[int, tuple[Channel, list[Flip]]] = {}
+        self.lock = Lock()
+
+    def defer(self, flip: Flip, ch: Channel) -> bool:
+        """Return True if the notification to `ch` should go into a digest."""
+
+        if not ch.transport.supports_digest():
+            return False
+
+        frozen_now = now()
+        with self.lock:
+            closes = self.closes.get(ch.id)
+            if closes is None or closes <= frozen_now:
+                # The channel has no open window. Send this one right away,
+                # and open a window
+                self.closes[ch.id] = frozen_now + self.window
+                return False
+
+            if ch.id in self.pending:
+                self.pending[ch.id][1].append(flip)
+            else:
+                self.pending[ch.id] = (ch, [flip])
+            return True
+
+    def pop_due(self, flush: bool = False) -> list[tuple[Channel, list[Flip]]]:
+        """Return the digests of closed windows, and remove them.
+
+        If `flush` is True, return all collected digests regardless of
+        their windows.
+        """
+
+        frozen_now = now()
+        result = []
+        with self.lock:
+            for ch_id, closes in list(self.closes.items()):
+                if closes > frozen_now and not flush:
+                    continue
+
+                if ch_id in self.pending:
+                    result.append(self.pending.pop(ch_id))
+                    # The outage may still be going on, open a new window
+                    self.closes[ch_id] = frozen_now + self.window
+                else:
+                    del self.closes[ch_id]
+
+        return result
+
+    def seconds_until_next(self) -> float | None:
+        """Return the number of seconds until the next digest is due."""
+
+        with self.lock:
+            deadlines = [self.closes[ch_id] for ch_id in self.pending]
+
+        if not deadlines:
+            return None
+        return max((min(deadlines) - now()).total_seconds(), 0)
+
+
+def parse_kind_workers(value: str) -> tuple[str, int]:
+    kind, _, size = value.partition("=")
+    try:
+        if kind in TRANSPORTS and int(size) > 0:
+            return kind, int(size)
+    except ValueError:
+        pass
+
+    raise ArgumentTypeError(f"expected KIND=N, got {value!r}")
+
+
+def _claim_flips_pg(
+    limit: int,
+    processed: datetime,
+    membership: Membership | None,
+    starving_before: datetime | None = None,
+) -> list[int]:
+    """Claim up to `limit` flips with an UPDATE ... RETURNING statement.
+
+    If `starving_before` is given, only claim "up" flips created before it.
+    """
+
+    table = Flip._meta.db_table
+    params: list[Any] = [processed]
+    extra_sql = ""
+    if starving_before:
+        extra_sql += "AND new_status = 'up' AND created < %s "
+        params.append(starving_before)
+    if membership:
+        extra_sql += "AND owner_id %% %s = ANY(%s)"
+        params += [membership.num_shards, membership.shards]
+    sql = f"""
+        UPDATE {table} SET processed = %s WHERE id IN (
+            SELECT id FROM {table} WHERE processed IS NULL {extra_sql}
+            ORDER BY new_status, created LIMIT %s FOR UPDATE SKIP LOCKED
+        ) RETURNING id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def claim_flips(limit: int, membership: Membership | None = None) -> list[Flip]:
+    """Mark up to `limit` unprocessed flips as processed, and return them.
+
+    On PostgreSQL, claim the flips with UPDATE ... RETURNING statements.
+    Elsewhere, select and update them in a transaction. Either way, concurrent
+    sendalerts processes claim disjoint sets of flips.
+
+    Claim "down" flips before "up" flips, and older flips before newer ones,
+    so a backlog of recoveries does not hold up fresh alerts. So that a steady
+    stream of "down" flips cannot hold up recoveries indefinitely, claim
+    the "up" flips older than STARVATION_AGE first. Both orders are index scans
+    on the api_flip_unprocessed partial index. Return the flips in the same
+    order.
+
+    If `membership` is given, only claim the flips of checks in its shards.
+
+    Load the flips together with their checks, projects and channels, so
+    notify() does not need to run queries for them one flip at a time.
+    """
+
+    if membership and not membership.shards:
+        return []
+
+    processed = now()
+    starving_before = processed - STARVATION_AGE
+    if connection.vendor == "postgresql":
+        ids = _claim_flips_pg(limit, processed, membership, starving_before)
+        if len(ids) < limit:
+            ids += _claim_flips_pg(limit - len(ids), processed, membership)
+    else:
+        # On SQLite, the transaction takes the database write lock right away
+        # (the "IMMEDIATE" transaction mode), so this is safe without row locks
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        with transaction.atomic():
+            q = Flip.objects.filter(processed=None).order_by("new_status", "created")
+            if membership:
+                q = membership.filter(q, "owner_id")
+            q = q.select_for_update(skip_locked=skip_locked)
+            starving = q.filter(new_status="up", created__lt=starving_before)
+            ids = list(starving.values_list("id", flat=True)[:limit])
+            if len(ids) < limit:
+                rest = q.exclude(id__in=ids).values_list("id", flat=True)
+                ids += rest[: limit - len(ids)]
+            Flip.objects.filter(id__in=ids).update(processed=processed)
+
+    if not ids:
+        return []
+
+    q = Flip.objects.filter(id__in=ids)
+    q = q.select_related("owner__project").prefetch_related("owner__channel_set")
+
+    def priority(flip: Flip) -> tuple[bool, str, datetime]:
+        starving = flip.new_status == "up" and flip.created < starving_before
+        return (not starving, flip.new_status, flip.created)
+
+    return sorted(q, key=priority)
+
+
+def claim_retries(limit: int) -> list[NotificationRetry]:
+    """Claim up to `limit` notification retries that are due, and return them.
+
+    Claim a retry by moving its next_attempt RETRY_LEASE into the future
+    with a conditional UPDATE, so concurrent sendalerts processes claim
+    disjoint sets of retries. A successful attempt deletes the retry,
+    a failed one reschedules it.
+    """
+
+    frozen_now = now()
+    q = NotificationRetry.objects.filter(next_attempt__lte=frozen_now)
+    candidates = list(q.order_by("next_attempt")[:limit])
+
+    ids = []
+    for retry in candidates:
+        q = NotificationRetry.objects.filter(
+            pk=retry.pk, next_attempt=retry.next_attempt
+        )
+        if q.update(next_attempt=frozen_now + RETRY_LEASE) == 1:
+            ids.append(retry.pk)
+
+    if not ids:
+        return []
+
+    q = NotificationRetry.objects.filter(pk__in=ids).order_by("next_attempt")
+    q = q.select_related("notification__channel__project", "flip__owner__project")
+    return list(q)
+
+
+class Scheduler:
+    """Upcoming alert_after deadlines, for sleeping until the next one.
+
+    Instead of polling for overdue checks every couple of seconds, sendalerts
+    can keep the deadlines of checks that go down soon in a heap, and sleep
+    until the earliest one. Every `sync_interval` seconds the scheduler reloads
+    the deadlines falling within the next 2 * `sync_interval` seconds. This query
+    uses the api_check_aa_not_down index and only returns checks that are
+    about to go down, not the whole table.
+
+    Check timeouts and grace times are at least a minute, so a new or
+    extended deadline is at least a minute in the future when it gets set.
+    As long as `sync_interval` is shorter than that, a sync picks up every
+    deadline before it is due. Deadlines that pings have since pushed later
+    leave stale entries in the heap. They only cause a harmless
+    handle_going_down() call that finds nothing to do.
+    """
+
+    def __init__(
+        self, sync_interval: float = 10, membership: Membership | None = None
+    ) -> None:
+        self.sync_interval = td(seconds=sync_interval)
+        self.membership = membership
+        self.heap: list[tuple[datetime, int]] = []
+        self.synced_at: datetime | None = None
+
+    def sync(self) -> None:
+        """Reload the deadlines from the database."""
+
+        frozen_now = now()
+        horizon = frozen_now + 2 * self.sync_interval
+        q = Check.objects.filter(alert_after__lt=horizon).exclude(status="down")
+        if self.membership:
+            q = self.membership.filter(q, "id")
+        rows = q.values_list("alert_after", "id")
+        self.heap = [(aa, check_id) for aa, check_id in rows if aa]
+        heapq.heapify(self.heap)
+        self.synced_at = frozen_now
+        statsd.gauge("hc.sendalerts.scheduledDeadlines", len(self.heap))
+
+    def add(self, check: Check) -> None:
+        if check.alert_after:
+            heapq.heappush(self.heap, (check.alert_after, check.id))
+
+    def pop_due(self) -> bool:
+        """Remove the deadlines that have passed, return True if there were any.
+
+        Sync first, if a sync is due.
+        """
+
+        frozen_now = now()
+        if self.synced_at is None or frozen_now >= self.synced_at + self.sync_interval:
+            self.sync()
+
+        due = False
+        while self.heap and self.heap[0][0] <= frozen_now:
+            heapq.heappop(self.heap)
+            due = True
+        return due
+
+    def seconds_until_next(self) -> float:
+        """Return the number of seconds until the next deadline or sync."""
+
+        assert self.synced_at
+        target = self.synced_at + self.sync_interval
+        if self.heap:
+            target = min(target, self.heap[0][0])
+        return max((target - now()).total_seconds(), 0)
+
+
 class Command(BaseCommand):
     help = "Sends UP/DOWN email alerts"
 
@@ -63,6 +731,14 @@ class Command(BaseCommand):
         self.executor = ThreadPoolExecutor(max_workers=10)
         self.seats = BoundedSemaphore(10)
         self.shutdown = False
+        self.batch_size = 100
+        self.scheduler: Scheduler | None = None
+        self.listener = Listener()
+        self.pools: KindPools | None = None
+        self.digester: Digester | None = None
+        self.retry_pools: KindPools | None = None
+        self.membership: Membership | None = None
+        self.autoscaler: Autoscaler | None = None
 
     def add_arguments(self, parser: ArgumentParser) -> None:
         parser.add_argument(
@@ -72,24 +748,87 @@ class Command(BaseCommand):
             help="The number of concurrent worker processes to use",
         )
 
+        parser.add_argument(
+            "--max-workers",
+            type=int,
+            default=0,
+            help="Enable autoscaling: grow each integration kind's pool up to "
+            "this many threads when notifications queue up, and shrink it back "
+            "to --num-workers when they don't (default: 0, disabled)",
+        )
+
+        parser.add_argument(
+            "--kind-workers",
+            type=parse_kind_workers,
+            action="append",
+            default=[],
+            metavar="KIND=N",
+            help="The number of concurrent notifications for an integration kind "
+            "(can be repeated, default: --num-workers, but at least 4)",
+        )
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="The number of overdue checks or flips to claim per query",
+        )
+
+        parser.add_argument(
+            "--scheduler",
+            action="store_true",
+            help="Sleep until the next check deadline instead of polling for "
+            "overdue checks",
+        )
+
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=0,
+            metavar="N",
+            help="Split checks into N shards, and share them with other sendalerts "
+            "processes using leases (default: 0, disabled). All sendalerts "
+            "processes must use the same value",
+        )
+
+        parser.add_argument(
+            "--digest-window",
+            type=int,
+            default=0,
+            metavar="SECONDS",
+            help="Coalesce the notifications a channel receives within this many "
+            "seconds into a single digest (default: 0, disabled)",
+        )
+
         parser.add_argument(
             "--pool",
             action="store_true",
             help="Use DB connection pool (PostgreSQL-only)",
         )
 
-    def on_notify_done(self, future: Future[str | None]) -> None:
-        self.seats.release()
-
+    def on_notify_done(self, future: Future[str | Delivery | None]) -> None:
         try:
-            if logs := future.result():
-                self.stdout.write(logs)
+            result = future.result()
         except Exception as exc:
+            self.seats.release()
             logger.error("Exception in notify", exc_info=exc)
             raise
 
-    def process_one_flip(self) -> bool:
-        """Find unprocessed flip, send notifications.
+        if isinstance(result, Delivery):
+            # The notifications are still running in the per-kind pools.
+            # Hold on to the seat until the last one completes, so the number
+            # of claimed but not yet delivered flips stays bounded.
+            result.add_done_callback(self.seats.release)
+            return
+
+        self.seats.release()
+        if result:
+            self.stdout.write(result)
+
+    def process_flips(self) -> bool:
+        """Claim a batch of unprocessed flips, send notifications.
+
+        Claim as many flips as there are free seats, up to `self.batch_size`.
 
         Return True if the main loop should continue right away.
 
@@ -102,78 +841,137 @@ class Command(BaseCommand):
         if not self.seats.acquire(timeout=1):
             return False  # Workers busy, main thread should wait a bit
 
-        flip = Flip.objects.filter(processed=None).first()
-        if flip is None:
-            self.seats.release()
-            return False  # No work found, main thread should wait a bit
+        num_seats = 1
+        while num_seats < self.batch_size and self.seats.acquire(blocking=False):
+            num_seats += 1
 
-        # Mark the flip as processed:
-        q = Flip.objects.filter(id=flip.id, processed=None)
-        num_updated = q.update(processed=now())
-        if num_updated != 1:
+        flips = claim_flips(num_seats, self.membership)
+        for _ in range(num_seats - len(flips)):
             self.seats.release()
-            # Nothing got updated: another sendalerts process got there first.
-            return True
 
-        statsd.incr("hc.sendalerts.processFlip")
-        f = self.executor.submit(notify, flip)
-        f.add_done_callback(self.on_notify_done)
+        if not flips:
+            return False  # No work found, main thread should wait a bit
+
+        for flip in flips:
+            statsd.incr("hc.sendalerts.processFlip")
+            f = self.executor.submit(notify, flip, self.pools, self.digester)
+            f.add_done_callback(self.on_notify_done)
         return True
 
+    def process_retries(self) -> None:
+        """Claim the notification retries that are due, and send them.
+
+        Retries run in their own per-kind pools, so they do not hold up
+        first attempts. Claim no more retries than `self.batch_size`
+        minus the number of retries already queued.
+        """
+
+        assert self.retry_pools
+        limit = self.batch_size - sum(self.retry_pools.pending.values())
+        if limit <= 0:
+            return
+
+        for retry in claim_retries(limit):
+            statsd.incr("hc.sendalerts.processRetry")
+            fn = partial(notify_retry, retry)
+            kind = retry.notification.channel.kind
+            self.retry_pools.submit(kind, fn, self.stdout.write)
+
+    def send_digests(self, flush: bool = False) -> None:
+        """Hand the digests that are due over to the per-kind pools."""
+
+        assert self.digester and self.pools
+        for ch, flips in self.digester.pop_due(flush):
+            fn = partial(notify_digest, flips, ch)
+            self.pools.submit(ch.kind, fn, self.stdout.write)
+
     def handle_going_down(self) -> bool:
-        """Process a single check going down.
+        """Process a batch of checks going down.
+
+        1. Claim up to `self.batch_size` checks with alert_after in the past, and
+           status other than "down". Where the database supports it (PostgreSQL,
+           MySQL 8), lock them with SELECT ... FOR UPDATE SKIP LOCKED, so
+           concurrent sendalerts processes claim disjoint batches. In sharded
+           mode, only look at the checks in our shards.
+        2. Calculate their current statuses.
+        3. If calculation throws an exception, log it, and push alert_after forward.
+        4. For checks that are not "down" yet, update alert_after.
+        5. Update the statuses of checks that are down to "down".
+        6. Create Flip objects for them.
 
-        1. Find a check with alert_after in the past, and status other than "down".
-        2. Calculate its current status.
-        3. If calculation throws an exception, push alert_after forward and re-raise.
-        4. If the current status is not "down", update alert_after and return.
-        5. Update the check's status in the database to "down".
-        6. If exactly 1 row gets updated, create a Flip object.
+        Return True if there were any checks to process.
 
         """
 
-        q = Check.objects.filter(alert_after__lt=now()).exclude(status="down")
-        # Sort by alert_after, to avoid unnecessary sorting by id:
-        check = q.order_by("alert_after").first()
-        if check is None:
-            return False
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        with transaction.atomic():
+            q = Check.objects.filter(alert_after__lt=now()).exclude(status="down")
+            if self.membership:
+                q = self.membership.filter(q, "id")
+            # Sort by alert_after, to avoid unnecessary sorting by id:
+            q = q.order_by("alert_after")
+            if skip_locked:
+                q = q.select_for_update(skip_locked=True)
+            checks = list(q[: self.batch_size])
+            if not checks:
+                return False
 
-        old_status = check.status
-        q = Check.objects.filter(id=check.id, status=old_status)
+            not_down, going_down = [], []
+            for check in checks:
+                try:
+                    status = check.get_status()
+                except Exception:
+                    logger.exception("Exception in Check.get_status()")
+                    # Make sure we don't trip on this check again for an hour:
+                    # Otherwise sendalerts may end up in a crash loop.
+                    check.alert_after = now() + td(hours=1)
+                    not_down.append(check)
+                    continue
 
-        try:
-            status = check.get_status()
-        except Exception:
-            # Make sure we don't trip on this check again for an hour:
-            # Otherwise sendalerts may end up in a crash loop.
-            q.update(alert_after=now() + td(hours=1))
-            # Then re-raise the exception:
-            raise
+                if status != "down":
+                    # It is not down yet. Update alert_after
+                    check.alert_after = check.going_down_after()
+                    not_down.append(check)
+                else:
+                    going_down.append(check)
 
-        if status != "down":
-            # It is not down yet. Update alert_after
-            q.update(alert_after=check.going_down_after())
-            return True
+            Check.objects.bulk_update(not_down, ["alert_after"])
+            if self.scheduler:
+                for check in not_down:
+                    self.scheduler.add(check)
 
-        flip_time = check.going_down_after()
-        # In theory, going_down_after() can return None, but:
-        # get_status() just reported status "down", so "going_down_after()"
-        # must be able to calculate precisely when the check's state flipped.
-        assert flip_time
+            flips = []
+            for check in going_down:
+                if not skip_locked:
+                    # The rows are not locked. Atomically update status, and skip
+                    # the check if another worker process got there first
+                    q = Check.objects.filter(id=check.id, status=check.status)
+                    n = q.update(alert_after=None, grace_start=None, status="down")
+                    if n != 1:
+                        continue
 
-        # Atomically update status
-        num_updated = q.update(alert_after=None, status="down")
-        if num_updated != 1:
-            # Nothing got updated: another worker process got there first.
-            return True
+                flip_time = check.going_down_after()
+                # In theory, going_down_after() can return None, but:
+                # get_status() just reported status "down", so "going_down_after()"
+                # must be able to calculate precisely when the check's state flipped.
+                assert flip_time
+
+                flip = Flip(owner=check)
+                flip.created = flip_time
+                flip.old_status = check.status
+                flip.new_status = "down"
+                flip.reason = "timeout"
+                flips.append(flip)
 
-        flip = Flip(owner=check)
-        flip.created = flip_time
-        flip.old_status = old_status
-        flip.new_status = "down"
-        flip.reason = "timeout"
-        flip.save()
+            if skip_locked:
+                # We hold the row locks, update all statuses in one query
+                ids = [flip.owner_id for flip in flips]
+                q = Check.objects.filter(id__in=ids)
+                q.update(alert_after=None, grace_start=None, status="down")
 
+            Flip.objects.bulk_create(flips)
+
+        statsd.timing("hc.sendalerts.goingDownBatch", len(checks))
         return True
 
     def on_signal(self, signum: int, frame: FrameType | None) -> None:
@@ -181,7 +979,18 @@ class Command(BaseCommand):
         self.stdout.write(f"{desc}, finishing...\n")
         self.shutdown = True
 
-    def handle(self, num_workers: int, pool: bool, **options: Any) -> str:
+    def handle(
+        self,
+        num_workers: int,
+        max_workers: int,
+        kind_workers: list[tuple[str, int]],
+        batch_size: int,
+        scheduler: bool,
+        shards: int,
+        digest_window: int,
+        pool: bool,
+        **options: Any,
+    ) -> str:
         db = settings.DATABASES["default"]
         if "OPTIONS" in db and "application_name" in db["OPTIONS"]:
             db["OPTIONS"]["application_name"] = "sendalerts"
@@ -191,26 +1000,100 @@ class Command(BaseCommand):
                 "WARNING: The --pool argument is not supported any more and will be ignored.\n"
             )
 
-        self.seats = BoundedSemaphore(num_workers)
+        self.batch_size = batch_size
+        if shards:
+            self.membership = Membership(shards)
+            self.membership.create_leases()
+        if scheduler:
+            self.scheduler = Scheduler(membership=self.membership)
         self.executor = ThreadPoolExecutor(max_workers=num_workers)
+        # Use at least KIND_WORKERS threads per integration kind, so channels
+        # of the same kind can be notified concurrently
+        default_size = max(num_workers, KIND_WORKERS)
+        if max_workers:
+            if max_workers < num_workers:
+                raise CommandError("--max-workers must be at least --num-workers")
+            # Start small, the autoscaler grows the pools as needed
+            default_size = num_workers
+        # A flip holds its seat until its last notification completes, so this
+        # caps the flips that are claimed but not yet delivered
+        self.seats = BoundedSemaphore(max_workers or default_size)
+        self.pools = KindPools(default_size, dict(kind_workers), self.stdout.write)
+        if max_workers:
+            self.autoscaler = Autoscaler(
+                self.pools, num_workers, max_workers, self.stdout.write
+            )
+        if digest_window:
+            self.digester = Digester(digest_window)
+        self.retry_pools = KindPools(RETRY_WORKERS, {}, self.stdout.write, "retry")
 
         signal.signal(signal.SIGTERM, self.on_signal)
         signal.signal(signal.SIGINT, self.on_signal)
 
+        # Prune old pings and notifications of checks marked by Check.ping()
+        # in a background thread
+        prune_thread = Thread(target=pruner.run, args=(lambda: self.shutdown,))
+        prune_thread.start()
+
+        # Wake up early when web processes create new flips
+        self.listener.start()
+
         self.stdout.write("sendalerts is now running\n")
         while not self.shutdown:
+            # Renew our shard leases, and pick up any changes in shard ownership
+            if self.membership and self.membership.maybe_renew():
+                self.stdout.write(f"Shards: {self.membership.shards}\n")
+                if self.scheduler:
+                    # Load the deadlines of the checks in our new shards
+                    self.scheduler.synced_at = None
+
             # Create flips for any checks going down
-            while self.handle_going_down() and not self.shutdown:
-                pass
+            if self.scheduler is None or self.scheduler.pop_due():
+                while self.handle_going_down() and not self.shutdown:
+                    pass
 
             # Submit unprocessed flips to the self.executor
-            while self.process_one_flip() and not self.shutdown:
+            while self.process_flips() and not self.shutdown:
                 pass
 
+            # Resize the notification pools to match the backlog
+            if self.autoscaler:
+                self.autoscaler.maybe_scale()
+
+            # Retry failed notifications that are due for another attempt
+            self.process_retries()
+
+            # Send the digests of channels whose coalescing windows have closed
+            if self.digester:
+                self.send_digests()
+
             # Either all workers are busy or there are no unprocessed flips.
-            # Wait a bit:
+            # Wait a bit, or until the next check deadline, or until a new flip
+            # wakes us up:
             if not self.shutdown:
-                time.sleep(2)
+                delay = 2.0
+                if self.scheduler:
+                    delay = self.scheduler.seconds_until_next()
+                    # Without wakeups, poll for new flips every 2 seconds
+                    if not self.listener.active:
+                        delay = min(delay, 2.0)
+                if self.membership:
+                    delay = min(delay, self.membership.seconds_until_renew())
+                if self.digester:
+                    digest_delay = self.digester.seconds_until_next()
+                    if digest_delay is not None:
+                        delay = min(delay, digest_delay)
+                self.listener.wait(delay)
 
         self.executor.shutdown(wait=True)
+        # Send the collected digests now, rather than lose them
+        if self.digester:
+            self.send_digests(flush=True)
+        self.pools.shutdown()
+        self.retry_pools.shutdown()
+        prune_thread.join()
+        self.listener.close()
+        if self.membership:
+            # Hand our shards over to the other sendalerts processes
+            self.membership.release()
         return "Done."
@@ -17,7 +17,7 @@ from django.db import close_old_connections, connection
 
 from hc.api.models import Check
 from hc.lib.html import html2text
-from hc.lib.string import match_keywords
+from hc.lib.string import keyword_matcher
 
 RE_UUID = re.compile(
     r"^[a-fA-F0-9]{8}-[a-fA-F0-9]{4}-4[a-fA-F0-9]{3}-[8|9|aA|bB][a-fA-F0-9]{3}-[a-fA-F0-9]{12}$"
@@ -78,12 +78,9 @@ def _process_message(remote_addr: str, mailfrom: str, mailto: str, data: bytes)
         message = email.message_from_bytes(data, policy=email.policy.SMTP)
         text = _to_text(message, check.filter_subject, check.filter_body)
 
-        if check.failure_kw and match_keywords(text, check.failure_kw):
-            action = "fail"
-        elif check.success_kw and match_keywords(text, check.success_kw):
-            action = "success"
-        elif check.start_kw and match_keywords(text, check.start_kw):
-            action = "start"
+        matcher = keyword_matcher(check.failure_kw, check.success_kw, check.start_kw)
+        if matched := matcher.match(text):
+            action = matched
         elif check.filter_default_fail:
             action = "fail"
         else:
@@ -0,0 +1,23 @@
+# Generated by Django 6.1 on 2026-10-17 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0123_alter_channel_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ping',
+            name='compression',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='ping',
+            name='uncompressed_size',
+            field=models.IntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.1 on 2026-10-17 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0053_alter_profile_sms_limit'),
+        ('api', '0124_ping_compression'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='check',
+            name='prune_due',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='check',
+            index=models.Index(condition=models.Q(('prune_due__isnull', False)), fields=['prune_due'], name='api_check_prune_due'),
+        ),
+    ]
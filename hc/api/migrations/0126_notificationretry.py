@@ -0,0 +1,25 @@
+# Generated by Django 6.1 on 2026-10-17 05:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0125_check_prune_due'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationRetry',
+            fields=[
+                ('notification', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='api.notification')),
+                ('attempts', models.IntegerField(default=1)),
+                ('next_attempt', models.DateTimeField(db_index=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('flip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.flip')),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.1 on 2026-10-17 05:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0126_notificationretry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CircuitBreaker',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=320, unique=True)),
+                ('failures', models.IntegerField(default=0)),
+                ('opened', models.DateTimeField(blank=True, null=True)),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
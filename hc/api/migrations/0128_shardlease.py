@@ -0,0 +1,22 @@
+# Generated by Django 6.1 on 2026-10-17 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0127_circuitbreaker'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardLease',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.IntegerField(unique=True)),
+                ('owner', models.CharField(blank=True, max_length=100)),
+                ('expires', models.DateTimeField()),
+            ],
+        ),
+    ]
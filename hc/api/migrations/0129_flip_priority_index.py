@@ -0,0 +1,21 @@
+# Generated by Django 6.1 on 2026-10-17 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0128_shardlease'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='flip',
+            name='api_flip_not_processed',
+        ),
+        migrations.AddIndex(
+            model_name='flip',
+            index=models.Index(condition=models.Q(('processed', None)), fields=['new_status', 'created'], name='api_flip_unprocessed'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1 on 2026-10-17 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0129_flip_priority_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='check',
+            name='grace_start',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -2,38 +2,52 @@ from __future__ import annotations
 
 import hashlib
 import json
+import logging
+import random
 import socket
+import time
 import uuid
-from collections.abc import Sequence
+from collections.abc import Collection, Iterator, Sequence
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from datetime import timedelta as td
 from importlib import import_module
-from typing import Any, NotRequired, TypedDict
-from zoneinfo import ZoneInfo
+from typing import IO, Any, NotRequired, TypedDict
 
-from cronsim import CronSim
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.humanize.templatetags.humanize import naturaltime
 from django.core.mail import mail_admins
 from django.core.signing import TimestampSigner
 from django.db import IntegrityError, models, transaction
-from django.db.models import F, QuerySet
+from django.db.models import QuerySet
 from django.http import HttpRequest
 from django.urls import reverse
 from django.utils.functional import cached_property
 from django.utils.timezone import now
-from oncalendar import OnCalendar
 from pydantic import BaseModel, Field
 
 from hc.accounts.models import Project
-from hc.api import transports
+from hc.api import pingcache, statuses, transports, wakeup
+from hc.api.pingbody import SpooledBody
 from hc.lib import emails
+from hc.lib.compression import (
+    ZLIB,
+    DecompressionError,
+    compress,
+    compress_file,
+    decompress,
+)
 from hc.lib.date import month_boundaries, seconds_in_month
 from hc.lib.s3 import GetObjectError, get_object, put_object, remove_objects
+from hc.lib.statsd import statsd
+from hc.lib.string import split_tags
+from hc.lib.uploader import uploader
 from hc.lib.urls import absolute_reverse
 
+logger = logging.getLogger(__name__)
+
 STATUSES = (("up", "Up"), ("down", "Down"), ("new", "New"), ("paused", "Paused"))
 DEFAULT_TIMEOUT = td(days=1)
 DEFAULT_GRACE = td(hours=1)
@@ -42,6 +56,32 @@ CHECK_KINDS = (("simple", "Simple"), ("cron", "Cron"), ("oncalendar", "OnCalenda
 # max time between start and ping where we will consider both events related:
 MAX_DURATION = td(hours=72)
 REASONS = (("", "Unknown"), ("timeout", "Timeout"), ("fail", "Fail signal"))
+# The delay before the first retry of a failed notification, doubled on every retry
+RETRY_BASE_DELAY = td(seconds=30)
+RETRY_MAX_DELAY = td(minutes=30)
+# Give up retrying a notification this long after the first attempt
+RETRY_MAX_AGE = td(hours=2)
+# Open a host's circuit breaker after this many consecutive failed requests
+BREAKER_THRESHOLD = 5
+# How long an open circuit breaker fails requests fast before it lets a probe through
+BREAKER_COOLDOWN = td(minutes=1)
+# How long a process remembers that a destination has no failures on record, in seconds
+BREAKER_CACHE_TTL = 10.0
+# The maximum number of destinations a process remembers
+BREAKER_CACHE_SIZE = 10000
+# The fields Check.ping() updates:
+PING_UPDATE_FIELDS = (
+    "last_start",
+    "last_start_rid",
+    "last_ping",
+    "last_duration",
+    "status",
+    "alert_after",
+    "grace_start",
+    "n_pings",
+    "has_confirmation_link",
+    "prune_due",
+)
 
 
 TRANSPORTS: dict[str, tuple[str, type[transports.Transport] | str]] = {
@@ -219,10 +259,17 @@ class Check(models.Model):
     last_duration = models.DurationField(null=True, blank=True)
     has_confirmation_link = models.BooleanField(default=False)
     alert_after = models.DateTimeField(null=True, blank=True, editable=False)
+    # When the grace period starts, ignoring last_start. Kept up to date together
+    # with alert_after, see update_deadlines() and hc/api/statuses.py.
+    grace_start = models.DateTimeField(null=True, blank=True, editable=False)
     status = models.CharField(max_length=6, choices=STATUSES, default="new")
+    # When the check got marked for pruning, see hc/api/pruner.py
+    prune_due = models.DateTimeField(null=True, blank=True, editable=False)
 
     # Used to pass downtime data to report templates. Not persisted to db.
     past_downtimes: list[DowntimeRecord] | None = None
+    # The (project_id, slug) pair the check was loaded from the database with.
+    loaded_slug: tuple[int, str] | None = None
 
     class Meta:
         indexes = [
@@ -234,11 +281,42 @@ class Check(models.Model):
                 condition=~models.Q(status="down"),
             ),
             models.Index(fields=["project_id", "slug"], name="api_check_project_slug"),
+            # Index for checks marked for pruning. Used in hc.api.pruner.
+            models.Index(
+                fields=["prune_due"],
+                name="api_check_prune_due",
+                condition=models.Q(prune_due__isnull=False),
+            ),
         ]
 
     def __str__(self) -> str:
         return "%s (%d)" % (self.name or self.code, self.id)
 
+    @classmethod
+    def from_db(
+        cls,
+        db: str | None,
+        field_names: Collection[str],
+        values: Collection[Any],
+        **kwargs: Any,
+    ) -> Check:
+        instance = super().from_db(db, field_names, values, **kwargs)
+        # Remember the project and slug the check was loaded with, so save()
+        # can invalidate cached ping lookups if they change.
+        if "project_id" in field_names and "slug" in field_names:
+            instance.loaded_slug = (instance.project_id, instance.slug)
+        return instance
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or not pingcache.LOOKUP_FIELDS.isdisjoint(
+            update_fields
+        ):
+            pingcache.invalidate(self, {self.loaded_slug} if self.loaded_slug else None)
+            self.loaded_slug = (self.project_id, self.slug)
+
     def name_then_code(self) -> str:
         if self.name:
             return self.name
@@ -296,6 +374,11 @@ class Check(models.Model):
             return self.last_duration
         return None
 
+    def timing(self) -> statuses.Timing:
+        """Return the fields status evaluation needs, see hc/api/statuses.py."""
+
+        return statuses.Timing(*(getattr(self, f) for f in statuses.TIMING_FIELDS))
+
     def get_grace_start(self, *, with_started: bool = True) -> datetime | None:
         """Return the datetime when the grace period starts.
 
@@ -303,38 +386,22 @@ class Check(models.Model):
         """
         # NEVER is a constant sentinel value (year 3000).
         # Using None instead would make the min() logic clunky.
-        result = NEVER
-
-        if self.kind == "simple" and self.status == "up":
-            assert self.last_ping is not None
-            result = self.last_ping + self.timeout
-        elif self.kind == "cron" and self.status == "up":
-            assert self.last_ping is not None
-            # The complex case, next ping is expected based on cron schedule.
-            # Don't convert to naive datetimes (and so avoid ambiguities around
-            # DST transitions). cronsim will handle the timezone-aware datetimes.
-            last_local = self.last_ping.astimezone(ZoneInfo(self.tz))
-            result = next(CronSim(self.schedule, last_local))
-            # Important: convert from the local timezone back to UTC.
-            # If the result is kept in the local timezone, adding
-            # a timedelta to it later (in `going_down_after` and in `get_status`)
-            # may yield incorrect results during DST transitions.
-            result = result.astimezone(timezone.utc)
-        elif self.kind == "oncalendar" and self.status == "up":
-            assert self.last_ping is not None
-            last_local = self.last_ping.astimezone(ZoneInfo(self.tz))
-            try:
-                result = next(OnCalendar(self.schedule, last_local))
-                # Same as for cron, convert back to UTC:
-                result = result.astimezone(timezone.utc)
-            except StopIteration:
-                result = NEVER
+        result = statuses.grace_start(self.timing()) or NEVER
 
         if with_started and self.last_start and self.status != "down":
             result = min(result, self.last_start)
 
         return result if result != NEVER else None
 
+    def update_deadlines(self) -> None:
+        """Recalculate the persisted alert_after and grace_start fields.
+
+        Call this after changing any of the fields in statuses.TIMING_FIELDS.
+        """
+
+        self.alert_after = self.going_down_after()
+        self.grace_start = statuses.grace_start(self.timing())
+
     def going_down_after(self) -> datetime | None:
         """Return the datetime when the check goes down.
 
@@ -353,30 +420,8 @@ class Check(models.Model):
 
     def get_status(self, *, with_started: bool = False) -> str:
         """Return current status for display."""
-        frozen_now = now()
-
-        if self.last_start:
-            if frozen_now >= self.last_start + self.grace:
-                return "down"
-            elif with_started:
-                return "started"
-
-        if self.status in ("new", "paused", "down"):
-            return self.status
-
-        grace_start = self.get_grace_start(with_started=False)
-        if grace_start is None:
-            # next elapse is "never", so this check will stay up indefinitely
-            return "up"
-
-        grace_end = grace_start + self.grace
-        if frozen_now >= grace_end:
-            return "down"
 
-        if frozen_now >= grace_start:
-            return "grace"
-
-        return "up"
+        return statuses.evaluate(self.timing(), now(), with_started=with_started)
 
     def rename_and_delete(self) -> None:
         """Change check's code and slug, then delete the check.
@@ -398,6 +443,7 @@ class Check(models.Model):
 
         # Rename so it cannot be pinged any longer
         q.update(code=throwaway_uuid, slug=str(throwaway_uuid))
+        pingcache.invalidate(self)
 
         try:
             q.delete()
@@ -410,7 +456,7 @@ class Check(models.Model):
         self.channel_set.set(channels)
 
     def tags_list(self) -> list[str]:
-        return [t.strip() for t in self.tags.split(" ") if t.strip()]
+        return split_tags(self.tags)
 
     def matches_tag_set(self, tag_set: set[str]) -> bool:
         return tag_set.issubset(self.tags_list())
@@ -495,7 +541,7 @@ class Check(models.Model):
         scheme: str,
         method: str,
         ua: str,
-        body: bytes,
+        body: bytes | SpooledBody,
         action: str,
         rid: uuid.UUID | None,
         exitstatus: int | None = None,
@@ -510,66 +556,137 @@ class Check(models.Model):
             self = Check.objects.select_for_update().get(id=self.id)
             frozen_now = now()
 
-            if self.status == "paused" and self.manual_resume:
-                action = "ign"
-
-            if action == "start":
-                self.last_start = frozen_now
-                self.last_start_rid = rid
-                # Don't update "last_ping" field.
-            elif action in ("success", "fail"):
-                self.last_ping = frozen_now
-                self.last_duration = None
-                if self.last_start:
-                    if self.last_start_rid == rid:
-                        # rid matches: calculate last_duration, clear last_start
-                        self.last_duration = self.last_ping - self.last_start
-                        self.last_start = None
-                    elif action == "fail" or rid is None:
-                        # clear last_start (exit the "running" state) on:
-                        # - "success" event with no rid
-                        # - "fail" event, regardless of rid mismatch
-                        self.last_start = None
-
-                new_status = "down" if action == "fail" else "up"
-                if self.status != new_status:
-                    reason = "fail" if action == "fail" else ""
-                    self.create_flip(new_status, reason=reason)
-                    self.status = new_status
-
-            self.alert_after = self.going_down_after()
+            action, flip = self.apply_ping(frozen_now, action, rid)
+            if flip:
+                flip.save()
+                wakeup.notify()
+
+            self.update_deadlines()
+            self.mark_prune_due(self.n_pings, self.n_pings + 1, frozen_now)
             self.n_pings = models.F("n_pings") + 1
-            body_lowercase = body.decode(errors="replace").lower()
-            self.has_confirmation_link = "confirm" in body_lowercase
-            self.save()
-
-            ping = Ping(owner=self)
-            ping.n = self.n_pings
-            ping.created = frozen_now
-            if action in ("start", "fail", "ign", "log"):
-                ping.kind = action
-
-            ping.remote_addr = remote_addr
-            ping.scheme = scheme
-            ping.method = method
-            # If User-Agent is longer than 200 characters, truncate it:
-            ping.ua = ua[:200]
-            if len(body) > 100 and settings.S3_BUCKET:
-                ping.object_size = len(body)
+            if isinstance(body, SpooledBody):
+                self.has_confirmation_link = body.has_confirmation_link
             else:
-                ping.body_raw = body
-            ping.rid = rid
-            ping.exitstatus = exitstatus
+                body_lowercase = body.decode(errors="replace").lower()
+                self.has_confirmation_link = "confirm" in body_lowercase
+            self.save(update_fields=PING_UPDATE_FIELDS)
+
+            ping = self.new_ping(
+                self.n_pings,
+                frozen_now,
+                remote_addr,
+                scheme,
+                method,
+                ua,
+                body,
+                action,
+                rid,
+                exitstatus,
+            )
             ping.save()
 
         # Upload ping body to S3 outside the DB transaction, because this operation
         # can potentially take a long time:
         if ping.object_size:
-            put_object(self.code, ping.n, body)
+            with ping.object_data(body) as data:
+                if not uploader.submit(self.code, self.n_pings, data):
+                    put_object(self.code, self.n_pings, data)
+
+    def apply_ping(
+        self, when: datetime, action: str, rid: uuid.UUID | None
+    ) -> tuple[str, Flip | None]:
+        """Update this check's fields to reflect a ping received at `when`.
+
+        Does not save the check. Returns the effective action (pings to
+        manually paused checks get ignored), and an unsaved Flip object if
+        the ping changes the check's status.
+
+        """
+
+        flip = None
+        if self.status == "paused" and self.manual_resume:
+            action = "ign"
+
+        if action == "start":
+            self.last_start = when
+            self.last_start_rid = rid
+            # Don't update "last_ping" field.
+        elif action in ("success", "fail"):
+            self.last_ping = when
+            self.last_duration = None
+            if self.last_start:
+                if self.last_start_rid == rid:
+                    # rid matches: calculate last_duration, clear last_start
+                    self.last_duration = self.last_ping - self.last_start
+                    self.last_start = None
+                elif action == "fail" or rid is None:
+                    # clear last_start (exit the "running" state) on:
+                    # - "success" event with no rid
+                    # - "fail" event, regardless of rid mismatch
+                    self.last_start = None
+
+            new_status = "down" if action == "fail" else "up"
+            if self.status != new_status:
+                reason = "fail" if action == "fail" else ""
+                flip = Flip(owner=self, created=when, reason=reason)
+                flip.old_status = self.status
+                flip.new_status = new_status
+                self.status = new_status
+
+        return action, flip
+
+    def new_ping(
+        self,
+        n: int,
+        created: datetime,
+        remote_addr: str,
+        scheme: str,
+        method: str,
+        ua: str,
+        body: bytes | SpooledBody,
+        action: str,
+        rid: uuid.UUID | None,
+        exitstatus: int | None,
+    ) -> Ping:
+        """Return an unsaved Ping object for this check."""
+
+        ping = Ping(owner=self, n=n, created=created)
+        if action in ("start", "fail", "ign", "log"):
+            ping.kind = action
+
+        ping.remote_addr = remote_addr
+        ping.scheme = scheme
+        ping.method = method
+        # If User-Agent is longer than 200 characters, truncate it:
+        ping.ua = ua[:200]
+        if len(body) > 100 and settings.S3_BUCKET:
+            ping.object_size = len(body)
+            if settings.PING_BODY_COMPRESSION:
+                ping.compression = ZLIB
+        else:
+            ping.body_raw = body if isinstance(body, bytes) else body.read()
+            if settings.PING_BODY_COMPRESSION and ping.body_raw:
+                compressed = compress(ping.body_raw)
+                # Small or random bodies can get bigger, store those as-is
+                if len(compressed) < len(ping.body_raw):
+                    ping.uncompressed_size = len(ping.body_raw)
+                    ping.body_raw, ping.compression = compressed, ZLIB
+        ping.rid = rid
+        ping.exitstatus = exitstatus
+        return ping
+
+    def mark_prune_due(
+        self, old_n_pings: int, new_n_pings: int, when: datetime
+    ) -> None:
+        """Mark the check for pruning if it has crossed a 100-ping boundary.
 
-        # Every 100 received pings, prune old pings and notifications:
-        if self.n_pings % 100 == 0:
-            self.prune()
+        Does not save the check. Ping handling does not prune old pings and
+        notifications inline, the pruner in sendalerts picks up marked checks
+        in the background. If the check is already marked, keep the older mark.
+        """
+
+        if old_n_pings // 100 != new_n_pings // 100 and self.prune_due is None:
+            self.prune_due = when
 
     def prune(self, wait: bool = False) -> None:
         """Remove old pings and notifications."""
@@ -669,6 +786,8 @@ class Check(models.Model):
         flip.new_status = new_status
         flip.reason = reason
         flip.save()
+        if not mark_as_processed:
+            wakeup.notify()
 
 
 class PingDict(TypedDict):
@@ -696,6 +815,10 @@ class Ping(models.Model):
     ua = models.CharField(max_length=200, blank=True)
     body_raw = models.BinaryField(null=True)
     object_size = models.IntegerField(null=True)
+    # The compression of the stored body, None means uncompressed
+    compression = models.CharField(max_length=10, null=True, blank=True)
+    # The size of a compressed body_raw before compression
+    uncompressed_size = models.IntegerField(null=True)
     exitstatus = models.SmallIntegerField(null=True)
     rid = models.UUIDField(null=True)
 
@@ -746,8 +869,14 @@ class Ping(models.Model):
 
         return bool(self.body_raw)
 
-    def get_body_bytes(self) -> bytes | None:
+    def get_stored_body_bytes(self) -> bytes | None:
+        """Return the body as stored, possibly compressed."""
         if self.object_size and self.n:
+            # The body may still be waiting for upload in the local spool
+            pending = uploader.get_pending(self.owner.code, self.n)
+            if pending is not None:
+                return pending
+
             # Do not attemt to touch S3 if we have recorded more than 3
             # errors (503 responses, request timeouts) in the last minute
             # when accessing S3.
@@ -768,6 +897,32 @@ class Ping(models.Model):
 
         return None
 
+    def get_body_bytes(self) -> bytes | None:
+        stored = self.get_stored_body_bytes()
+        if stored is None:
+            return None
+
+        try:
+            return decompress(stored, self.compression)
+        except DecompressionError:
+            raise self.GetBodyError()
+
+    @contextmanager
+    def object_data(self, body: bytes | SpooledBody) -> Iterator[bytes | IO[bytes]]:
+        """Return the data to upload to object storage for this ping.
+
+        Use as a context manager: it closes the temporary file holding
+        a compressed spooled body once the upload is done.
+        """
+        if isinstance(body, SpooledBody):
+            if self.compression:
+                with compress_file(body.file) as f:
+                    yield f
+            else:
+                yield body.file
+        else:
+            yield compress(body) if self.compression else body
+
     def get_body(self) -> str | None:
         try:
             body_bytes = self.get_body_bytes()
@@ -781,6 +936,8 @@ class Ping(models.Model):
 
     def get_body_size(self) -> int:
         if self.body_raw:
+            if self.uncompressed_size is not None:
+                return self.uncompressed_size
             return len(self.body_raw)
         if self.object_size:
             return self.object_size
@@ -1146,7 +1303,15 @@ class Channel(models.Model):
 
         return cls(self)
 
-    def notify(self, flip: Flip, is_test: bool = False) -> str:
+    def notify(
+        self, flip: Flip, is_test: bool = False, retry_queue: bool = False
+    ) -> str:
+        """Send a notification about `flip`, return the error message, if any.
+
+        If `retry_queue` is True, do not retry failed HTTP requests right away.
+        Instead, schedule a NotificationRetry, for sendalerts to retry later.
+        """
+
         if self.transport.is_noop(flip.new_status):
             return "no-op"
 
@@ -1165,14 +1330,42 @@ class Channel(models.Model):
         except IntegrityError:
             return "Channel or check does not exist any more"
 
-        start, error, disabled = now(), "", self.disabled
+        retry_queue = retry_queue and not is_test
+        exc = self.deliver(flip, n, retry_queue)
+        if exc and exc.retryable:
+            NotificationRetry.objects.create(
+                notification=n,
+                flip=flip,
+                next_attempt=now() + NotificationRetry.backoff(1),
+            )
+
+        return exc.message if exc else ""
+
+    def deliver(
+        self, flip: Flip, n: Notification, defer_retries: bool = False
+    ) -> transports.TransportError | None:
+        """Send `n` using the transport, and record the outcome.
+
+        Return the TransportError, or None on success. With `defer_retries`,
+        HTTP transports make a single attempt, and mark errors
+        they would have retried as retryable.
+        """
+
+        start, exc, disabled = now(), None, self.disabled
+        # Test notifications leave n.owner empty, see notify()
+        is_test = n.owner_id is None
         try:
-            self.transport.notify(flip, notification=n)
+            with (
+                transports.deferred_retries(defer_retries),
+                transports.breaker_scope(str(self.code), is_test),
+            ):
+                self.transport.notify(flip, notification=n)
 
         except transports.TransportError as e:
             disabled = True if e.permanent else disabled
-            error = e.message
+            exc = e
 
+        error = exc.message if exc else ""
         Notification.objects.filter(id=n.id).update(error=error)
         Channel.objects.filter(id=self.id).update(
             last_notify=start,
@@ -1181,6 +1374,53 @@ class Channel(models.Model):
             disabled=disabled,
         )
 
+        return exc
+
+    def notify_digest(self, flips: list[Flip]) -> str:
+        """Send a single digest notification about `flips`.
+
+        Create a Notification object for every flip, so each check's
+        notification log still lists the notification.
+        """
+
+        flips = [f for f in flips if not self.transport.is_noop(f.new_status)]
+        if not flips:
+            return "no-op"
+
+        if len(flips) == 1:
+            return self.notify(flips[0])
+
+        notifications = [
+            Notification(
+                channel=self,
+                owner=flip.owner,
+                check_status=flip.new_status,
+                error="Sending",
+            )
+            for flip in flips
+        ]
+        try:
+            Notification.objects.bulk_create(notifications)
+        except IntegrityError:
+            return "Channel or check does not exist any more"
+
+        start, error, disabled = now(), "", self.disabled
+        try:
+            with transports.breaker_scope(str(self.code)):
+                self.transport.notify_digest(flips, notifications)
+        except transports.TransportError as e:
+            disabled = True if e.permanent else disabled
+            error = e.message
+
+        codes = [n.code for n in notifications]
+        Notification.objects.filter(code__in=codes).update(error=error)
+        Channel.objects.filter(id=self.id).update(
+            last_notify=start,
+            last_notify_duration=now() - start,
+            last_error=error,
+            disabled=disabled,
+        )
+
         return error
 
     def icon_path(self) -> str:
@@ -1365,11 +1605,11 @@ class Flip(models.Model):
 
     class Meta:
         indexes = [
-            # For quickly looking up unprocessed flips.
-            # Used in the sendalerts management command.
+            # For quickly looking up unprocessed flips, "down" flips first,
+            # oldest first. Used in the sendalerts management command.
             models.Index(
-                fields=["processed"],
-                name="api_flip_not_processed",
+                fields=["new_status", "created"],
+                name="api_flip_unprocessed",
                 condition=models.Q(processed=None),
             ),
             # For efficiently selecting flips in hc.front.views._get_events
@@ -1401,9 +1641,14 @@ class Flip(models.Model):
         if self.new_status not in ("up", "down"):
             raise NotImplementedError(f"Unexpected status: {self.new_status}")
 
-        q = self.owner.channel_set.exclude(disabled=True)
-        q = q.order_by(F("last_notify_duration").asc(nulls_last=True))
-        return [ch for ch in q if not ch.transport.is_noop(self.new_status)]
+        # Filter and sort in Python, so this can use channels
+        # prefetched with prefetch_related("owner__channel_set")
+        channels = [ch for ch in self.owner.channel_set.all() if not ch.disabled]
+        # Shorter last_notify_duration first, channels with no duration last
+        channels.sort(
+            key=lambda ch: (ch.last_notify_duration is None, ch.last_notify_duration)
+        )
+        return [ch for ch in channels if not ch.transport.is_noop(self.new_status)]
 
     def reason_long(self) -> str | None:
         if self.reason == "timeout":
@@ -1431,6 +1676,173 @@ class Flip(models.Model):
         return None
 
 
+class NotificationRetry(models.Model):
+    """A failed notification waiting for another delivery attempt.
+
+    When sendalerts sends a notification and the HTTP request fails with
+    an error worth retrying, Channel.notify() does not retry right away.
+    It creates a NotificationRetry instead, and sendalerts makes the next
+    attempt at `next_attempt`, with an exponentially growing, jittered delay
+    between attempts. It gives up RETRY_MAX_AGE after the first attempt.
+    """
+
+    notification = models.OneToOneField(Notification, models.CASCADE, primary_key=True)
+    flip = models.ForeignKey(Flip, models.CASCADE)
+    # The number of delivery attempts made so far
+    attempts = models.IntegerField(default=1)
+    next_attempt = models.DateTimeField(db_index=True)
+    created = models.DateTimeField(default=now)
+
+    @staticmethod
+    def backoff(attempts: int) -> td:
+        """Return the delay before the next attempt, after `attempts` attempts."""
+
+        delay = min(RETRY_BASE_DELAY * 2.0 ** (attempts - 1), RETRY_MAX_DELAY)
+        # Spread out the retries of notifications that failed together
+        return delay * random.uniform(0.5, 1.0)
+
+    def attempt(self) -> str:
+        """Make another delivery attempt, then reschedule or delete this retry.
+
+        Return the error message, or "" on success.
+        """
+
+        channel = self.notification.channel
+        if channel.disabled:
+            self.delete()
+            return "Channel is disabled"
+
+        # If the check has flipped again since, this notification is stale.
+        # For example, a "down" notification delivered after the "up" one
+        # would reopen the incident in PagerDuty, Opsgenie, and similar.
+        newer = Flip.objects.filter(
+            owner_id=self.flip.owner_id, created__gt=self.flip.created
+        )
+        if newer.exists():
+            self.delete()
+            return "Superseded by a newer status change"
+
+        exc = channel.deliver(self.flip, self.notification, defer_retries=True)
+        self.attempts += 1
+        if exc and exc.retryable:
+            next_attempt = now() + self.backoff(self.attempts)
+            if next_attempt < self.created + RETRY_MAX_AGE:
+                self.next_attempt = next_attempt
+                self.save()
+                return exc.message
+
+        self.delete()
+        return exc.message if exc else ""
+
+
+class CircuitBreaker(models.Model):
+    """Consecutive failed requests to an HTTP integration's destination.
+
+    HttpTransport consults the breaker before every request. The breaker's
+    key is the destination's scheme, host and port, see transports.breaker_key().
+    The row only exists while the destination has failures on record, and
+    a successful request deletes it. After BREAKER_THRESHOLD consecutive
+    failures (timeouts, connection errors, 5xx responses), the breaker opens:
+    requests to the destination fail fast for BREAKER_COOLDOWN instead of
+    waiting for their timeouts. After the cooldown the breaker is half-open, and
+    lets a single request through to probe the destination. If the probe fails,
+    the breaker stays open for another cooldown.
+
+    The state is in the database, so all sendalerts processes share it.
+    Each process remembers the destinations without failures on record for
+    BREAKER_CACHE_TTL, so requests to healthy destinations don't need a query.
+    """
+
+    key = models.CharField(max_length=320, unique=True)
+    failures = models.IntegerField(default=0)
+    opened = models.DateTimeField(null=True, blank=True)
+    updated = models.DateTimeField(default=now)
+
+    class Open(Exception):
+        pass
+
+    @staticmethod
+    def guard(key: str) -> CircuitBreaker | None:
+        """Return the destination's breaker, or None if it has no failures.
+
+        Raise CircuitBreaker.Open if the request should fail fast.
+        """
+
+        if _healthy_destinations.get(key, 0.0) > time.monotonic():
+            return None
+
+        obj = CircuitBreaker.objects.filter(key=key).first()
+        if obj is None:
+            if len(_healthy_destinations) >= BREAKER_CACHE_SIZE:
+                _healthy_destinations.clear()
+            _healthy_destinations[key] = time.monotonic() + BREAKER_CACHE_TTL
+            return None
+
+        if obj.opened is None:
+            return obj
+
+        frozen_now = now()
+        if frozen_now >= obj.opened + BREAKER_COOLDOWN:
+            # Half-open: let a single request through. Restart the cooldown, so
+            # concurrent requests, also in other processes, keep failing fast.
+            q = CircuitBreaker.objects.filter(id=obj.id, opened=obj.opened)
+            if q.update(opened=frozen_now) == 1:
+                statsd.incr("hc.breaker.probe")
+                return obj
+
+        statsd.incr("hc.breaker.fastFail")
+        raise CircuitBreaker.Open()
+
+    @staticmethod
+    def record_success(obj: CircuitBreaker | None) -> None:
+        if obj is None:
+            return
+
+        CircuitBreaker.objects.filter(key=obj.key).delete()
+        if obj.opened:
+            statsd.incr("hc.breaker.close")
+            logger.info("Circuit breaker for %s closed", obj.key)
+
+    @staticmethod
+    def record_failure(key: str) -> None:
+        _healthy_destinations.pop(key, None)
+
+        frozen_now = now()
+        obj, _ = CircuitBreaker.objects.get_or_create(key=key)
+        obj.failures += 1
+        obj.updated = frozen_now
+        if obj.opened:
+            # The probe failed, keep the breaker open for another cooldown
+            obj.opened = frozen_now
+        elif obj.failures >= BREAKER_THRESHOLD:
+            obj.opened = frozen_now
+            statsd.incr("hc.breaker.open")
+            logger.warning("Circuit breaker for %s opened", key)
+
+        # Race condition: concurrent failures can overwrite each other's
+        # increments. It's OK to be a little inexact here for the sake
+        # of simplicity.
+        obj.save()
+
+    @staticmethod
+    def clear_cache() -> None:
+        _healthy_destinations.clear()
+
+
+# Breaker keys with no failures on record, and when to look them up again
+# (time.monotonic() values), see CircuitBreaker.guard()
+_healthy_destinations: dict[str, float] = {}
+
+
+class ShardLease(models.Model):
+    """A sendalerts process's lease on a shard of checks, see hc.api.shards."""
+
+    shard = models.IntegerField(unique=True)
+    # An empty owner means the shard is free
+    owner = models.CharField(max_length=100, blank=True)
+    expires = models.DateTimeField()
+
+
 class TokenBucket(models.Model):
     value = models.CharField(max_length=80, unique=True)
     tokens = models.FloatField(default=1.0)
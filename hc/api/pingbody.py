@@ -0,0 +1,134 @@
+"""Chunked reading of ping bodies.
+
+Ping bodies larger than 100 bytes are stored in S3 (when it is configured).
+To keep the memory use of a ping request constant regardless of the body size,
+the ping views read such bodies in chunks into a SpooledBody: a temporary file
+which stays in memory up to SPOOL_MAX_SIZE bytes and spills over to disk after
+that. While reading, SpooledBody scans the chunks for the check's filtering
+keywords and for the word "confirm", so neither the keyword filters nor
+Check.ping() need the whole body in memory. The S3 upload then streams the
+body from the temporary file.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from tempfile import SpooledTemporaryFile
+from types import TracebackType
+
+from django.conf import settings
+from django.http import HttpRequest
+
+CHUNK_SIZE = 64 * 1024
+# Bodies up to this size are kept in memory, larger bodies are spooled to disk
+SPOOL_MAX_SIZE = 256 * 1024
+# Bodies up to this size are stored in the database (see Check.new_ping)
+INLINE_MAX_SIZE = 100
+CONFIRM = b"confirm"
+
+
+def _tail(data: bytes, n: int) -> bytes:
+    """Return the last `n` bytes of `data`."""
+    return data[max(len(data) - n, 0) :]
+
+
+def _split(keywords: str) -> list[str]:
+    return [s.strip() for s in keywords.split(",") if s.strip()]
+
+
+class SpooledBody:
+    def __init__(self, keywords: Iterable[str] = ()) -> None:
+        self.file: SpooledTemporaryFile[bytes] = SpooledTemporaryFile(
+            max_size=SPOOL_MAX_SIZE
+        )
+        self.size = 0
+        self.has_confirmation_link = False
+        self.keywords = {s.encode() for kw in keywords for s in _split(kw)}
+        self.found: set[bytes] = set()
+        # Keep the end of the previous chunk, to find matches across chunks
+        self.overlap = max((len(s) for s in self.keywords), default=1) - 1
+        self.tail = b""
+        self.tail_lower = b""
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __enter__(self) -> SpooledBody:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def write(self, chunk: bytes) -> None:
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+        window = self.tail + chunk
+        for s in self.keywords - self.found:
+            if s in window:
+                self.found.add(s)
+        self.tail = _tail(window, self.overlap)
+
+        window = self.tail_lower + chunk.lower()
+        if CONFIRM in window:
+            self.has_confirmation_link = True
+        self.tail_lower = _tail(window, len(CONFIRM) - 1)
+
+    def contains(self, needle: bytes) -> bool:
+        if needle in self.keywords:
+            return needle in self.found
+
+        # The needle was not scanned for while reading, scan the file now
+        self.file.seek(0)
+        tail = b""
+        while chunk := self.file.read(CHUNK_SIZE):
+            window = tail + chunk
+            if needle in window:
+                return True
+            tail = _tail(window, len(needle) - 1)
+
+        return False
+
+    def __contains__(self, keyword: object) -> bool:
+        """Support `keyword in body`, for use with hc.lib.string.KeywordMatcher."""
+        assert isinstance(keyword, str)
+        return self.contains(keyword.encode())
+
+    def read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def read_body(
+    request: HttpRequest, limit: int | None, keywords: Iterable[str] = ()
+) -> bytes | SpooledBody:
+    """Read up to `limit` bytes of the request body in chunks.
+
+    `keywords` is a list of comma-separated keyword lists to scan the body for.
+
+    Return the body as bytes if it will be stored in the database, or as
+    a SpooledBody if it will be uploaded to S3. In the latter case, the caller
+    is responsible for closing the SpooledBody.
+    """
+
+    body = SpooledBody(keywords)
+    while limit is None or body.size < limit:
+        size = CHUNK_SIZE if limit is None else min(CHUNK_SIZE, limit - body.size)
+        chunk = request.read(size)
+        if not chunk:
+            break
+        body.write(chunk)
+
+    if body.size > INLINE_MAX_SIZE and settings.S3_BUCKET:
+        return body
+
+    with body:
+        return body.read()
@@ -0,0 +1,269 @@
+"""Write-behind buffer for incoming pings.
+
+When PING_BUFFER_ENABLED is set, the ping views hand pings over to a bounded
+in-process queue instead of calling Check.ping() directly. A background thread
+flushes the queue every PING_BUFFER_INTERVAL milliseconds. For each check
+with queued pings, the flusher applies all of its pings in a single
+transaction: one conditional UPDATE for the Check row, and one bulk INSERT
+for the Ping rows.
+
+The conditional UPDATE (it only matches if n_pings and status are unchanged
+since the Check row was read) replaces the row lock Check.ping() takes, so
+concurrent pings to the same check do not serialize on the lock. If the
+UPDATE loses a race (a concurrent ping from another process got there first),
+the flusher re-reads the check and retries. After a few lost races it falls
+back to Check.ping().
+
+The trade-off: a ping is acknowledged before it is stored. If the process
+crashes, the pings still in the queue are lost.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from uuid import UUID
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils.timezone import now
+
+from hc.api import wakeup
+from hc.api.models import Check, Flip, Ping
+from hc.lib.s3 import put_object
+from hc.lib.statsd import statsd
+from hc.lib.uploader import uploader
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BufferedPing:
+    check_id: int
+    created: datetime
+    remote_addr: str
+    scheme: str
+    method: str
+    ua: str
+    body: bytes
+    action: str
+    rid: UUID | None
+    exitstatus: int | None
+
+
+class LostRace(Exception):
+    pass
+
+
+class PingBuffer:
+    def __init__(self, max_size: int = 10000, interval: float = 0.2) -> None:
+        self.queue: Queue[BufferedPing] = Queue(maxsize=max_size)
+        self.interval = interval
+        self.thread: Thread | None = None
+        self.lock = Lock()
+
+    def start(self) -> None:
+        with self.lock:
+            if self.thread is None:
+                self.thread = Thread(target=self.run, daemon=True)
+                self.thread.start()
+                # Flush whatever is left in the queue on interpreter exit
+                atexit.register(self.flush)
+
+    def run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Exception while flushing the ping buffer")
+
+    def submit(
+        self,
+        check: Check,
+        remote_addr: str,
+        scheme: str,
+        method: str,
+        ua: str,
+        body: bytes,
+        action: str,
+        rid: UUID | None,
+        exitstatus: int | None = None,
+    ) -> bool:
+        """Queue a ping. Arguments are the same as for Check.ping().
+
+        Return False if the buffer is full. The caller should then
+        fall back to calling Check.ping() directly.
+        """
+
+        self.start()
+        item = BufferedPing(
+            check_id=check.id,
+            created=now(),
+            remote_addr=remote_addr,
+            scheme=scheme,
+            method=method,
+            ua=ua,
+            body=body,
+            action=action,
+            rid=rid,
+            exitstatus=exitstatus,
+        )
+        try:
+            self.queue.put_nowait(item)
+        except Full:
+            statsd.incr("hc.pingbuffer.overflow")
+            return False
+
+        return True
+
+    def drain(self) -> list[BufferedPing]:
+        items = []
+        while True:
+            try:
+                items.append(self.queue.get_nowait())
+            except Empty:
+                return items
+
+    def flush(self) -> int:
+        """Store all queued pings in the database. Return the number of pings."""
+
+        items = self.drain()
+        if not items:
+            return 0
+
+        # The flusher runs on its own thread, which may hold a db connection
+        # that has timed out. The if condition makes sure this does not run
+        # during tests.
+        if not connection.in_atomic_block:
+            close_old_connections()
+
+        # Group pings by check, preserving the order they arrived in
+        groups: dict[int, list[BufferedPing]] = {}
+        for item in items:
+            groups.setdefault(item.check_id, []).append(item)
+
+        with statsd.timer("hc.pingbuffer.flushTime"):
+            for check_id, group in groups.items():
+                try:
+                    flush_check(check_id, group)
+                except Exception:
+                    logger.exception("Exception while flushing pings")
+
+        statsd.timing("hc.pingbuffer.flushSize", len(items))
+        return len(items)
+
+
+def _apply(check_id: int, items: list[BufferedPing]) -> tuple[Check, list[Ping]]:
+    """Apply the pings to the check with a single conditional UPDATE.
+
+    Raise LostRace if another process updated the check concurrently.
+    """
+
+    with transaction.atomic():
+        check = Check.objects.get(id=check_id)
+        old_n_pings, old_status = check.n_pings, check.status
+
+        flips: list[Flip] = []
+        pings: list[Ping] = []
+        for item in items:
+            action, flip = check.apply_ping(item.created, item.action, item.rid)
+            if flip:
+                flips.append(flip)
+
+            n = old_n_pings + len(pings) + 1
+            ping = check.new_ping(
+                n,
+                item.created,
+                item.remote_addr,
+                item.scheme,
+                item.method,
+                item.ua,
+                item.body,
+                action,
+                item.rid,
+                item.exitstatus,
+            )
+            pings.append(ping)
+
+        check.n_pings = old_n_pings + len(pings)
+        check.mark_prune_due(old_n_pings, check.n_pings, items[-1].created)
+        check.update_deadlines()
+        body_lowercase = items[-1].body.decode(errors="replace").lower()
+        check.has_confirmation_link = "confirm" in body_lowercase
+
+        q = Check.objects.filter(id=check.id, n_pings=old_n_pings, status=old_status)
+        num_updated = q.update(
+            n_pings=check.n_pings,
+            last_ping=check.last_ping,
+            last_start=check.last_start,
+            last_start_rid=check.last_start_rid,
+            last_duration=check.last_duration,
+            status=check.status,
+            alert_after=check.alert_after,
+            grace_start=check.grace_start,
+            has_confirmation_link=check.has_confirmation_link,
+            prune_due=check.prune_due,
+        )
+        if num_updated != 1:
+            raise LostRace()
+
+        Flip.objects.bulk_create(flips)
+        if flips:
+            wakeup.notify()
+        Ping.objects.bulk_create(pings)
+
+    return check, pings
+
+
+def flush_check(check_id: int, items: list[BufferedPing], attempts: int = 3) -> None:
+    for _ in range(attempts):
+        try:
+            check, pings = _apply(check_id, items)
+            break
+        except Check.DoesNotExist:
+            # The check was deleted while its pings were in the buffer
+            return
+        except LostRace:
+            statsd.incr("hc.pingbuffer.lostRace")
+    else:
+        # We kept losing races, fall back to the locking code path
+        _ping_one_by_one(check_id, items)
+        return
+
+    # Upload ping bodies to S3 outside the DB transaction
+    for ping, item in zip(pings, items):
+        if ping.object_size:
+            assert ping.n is not None
+            with ping.object_data(item.body) as data:
+                if not uploader.submit(check.code, ping.n, data):
+                    put_object(check.code, ping.n, data)
+
+
+def _ping_one_by_one(check_id: int, items: Iterable[BufferedPing]) -> None:
+    for item in items:
+        check = Check(id=check_id)
+        try:
+            check.ping(
+                item.remote_addr,
+                item.scheme,
+                item.method,
+                item.ua,
+                item.body,
+                item.action,
+                item.rid,
+                item.exitstatus,
+            )
+        except Check.DoesNotExist:
+            return
+
+
+buffer = PingBuffer(
+    max_size=settings.PING_BUFFER_SIZE, interval=settings.PING_BUFFER_INTERVAL / 1000
+)
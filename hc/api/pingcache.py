@@ -0,0 +1,154 @@
+"""Cache for looking up ping targets by UUID and by ping key + slug.
+
+The ping endpoints look up the check on every request. With PING_CACHE_TTL
+set, the lookup results are cached in the "pings" cache (see CACHES in
+settings.py), including misses. Cached misses take the traffic from deleted
+checks, which keep getting pinged by forgotten cron jobs, off the database.
+
+A cached hit is an unsaved Check instance with only the fields the ping views
+need. Check.ping() always re-reads the check from the database, so stale
+counters or status are never an issue. Cached entries are invalidated
+when a check's lookup fields change, when a check is deleted, and when
+a project's ping key changes.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import caches
+
+if TYPE_CHECKING:
+    from hc.accounts.models import Project
+    from hc.api.models import Check
+
+MISSING = "missing"
+# The fields stored in cache entries
+FIELDS = (
+    "id",
+    "code",
+    "project_id",
+    "methods",
+    "filter_http_body",
+    "filter_default_fail",
+    "start_kw",
+    "success_kw",
+    "failure_kw",
+)
+# Saving any of these fields invalidates check's cache entries
+LOOKUP_FIELDS = frozenset(FIELDS + ("slug", "project"))
+
+
+def _code_key(code: UUID | str) -> str:
+    return f"code-{code}"
+
+
+def _slug_key(ping_key: str, slug: str) -> str:
+    return f"slug-{ping_key}-{slug}"
+
+
+def _pack(check: Check) -> dict[str, Any]:
+    return {f: getattr(check, f) for f in FIELDS}
+
+
+def _unpack(data: dict[str, Any]) -> Check:
+    from hc.api.models import Check
+
+    return Check(**data)
+
+
+def _get(key: str, lookup: dict[str, Any], recheck_missing: bool = False) -> Check:
+    from hc.api.models import Check
+
+    cache = caches["pings"]
+    data = cache.get(key)
+    if data == MISSING:
+        if not recheck_missing:
+            raise Check.DoesNotExist()
+    elif data is not None:
+        return _unpack(data)
+
+    try:
+        check = Check.objects.get(**lookup)
+    except Check.DoesNotExist:
+        cache.set(key, MISSING, settings.PING_CACHE_TTL)
+        raise
+
+    cache.set(key, _pack(check), settings.PING_CACHE_TTL)
+    return check
+
+
+def get_by_code(code: UUID) -> Check:
+    """Return the check with the given code, or raise Check.DoesNotExist."""
+
+    from hc.api.models import Check
+
+    if not settings.PING_CACHE_TTL:
+        return Check.objects.get(code=code)
+
+    return _get(_code_key(code), {"code": code})
+
+
+def get_by_slug(ping_key: str, slug: str, recheck_missing: bool = False) -> Check:
+    """Return the check with the given ping key and slug.
+
+    Raise Check.DoesNotExist or Check.MultipleObjectsReturned if there
+    is no unique match. Ambiguous slugs are not cached.
+
+    With `recheck_missing`, do not trust a cached miss, and look the check up
+    in the database again. The ping endpoint uses it before auto-provisioning
+    a check: another process may have created the check since the miss was
+    cached, and its invalidation does not reach this process's in-memory cache.
+    """
+
+    from hc.api.models import Check
+
+    lookup = {"slug": slug, "project__ping_key": ping_key}
+    if not settings.PING_CACHE_TTL:
+        return Check.objects.get(**lookup)
+
+    return _get(_slug_key(ping_key, slug), lookup, recheck_missing)
+
+
+def invalidate(check: Check, old_slugs: set[tuple[int, str]] | None = None) -> None:
+    """Remove cache entries for the given check.
+
+    `old_slugs` is a set of (project_id, slug) pairs the check was previously
+    reachable by, in case its slug or project has changed.
+    """
+
+    from hc.accounts.models import Project
+    from hc.api.models import Check
+
+    if not settings.PING_CACHE_TTL:
+        return
+
+    keys = [_code_key(check.code)]
+    slugs = set(old_slugs or ())
+    if check.project_id:
+        slugs.add((check.project_id, check.slug))
+
+    for project_id, slug in slugs:
+        if not slug:
+            continue
+        if Check.project.is_cached(check) and check.project_id == project_id:
+            ping_key = check.project.ping_key
+        else:
+            q = Project.objects.filter(id=project_id)
+            ping_key = q.values_list("ping_key", flat=True).first()
+        if ping_key:
+            keys.append(_slug_key(ping_key, slug))
+
+    caches["pings"].delete_many(keys)
+
+
+def invalidate_ping_key(project: Project, ping_key: str | None) -> None:
+    """Remove cache entries for all slugs of a project's (old) ping key."""
+
+    if not settings.PING_CACHE_TTL or not ping_key:
+        return
+
+    slugs = project.check_set.values_list("slug", flat=True)
+    caches["pings"].delete_many([_slug_key(ping_key, slug) for slug in slugs])
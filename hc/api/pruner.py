@@ -0,0 +1,95 @@
+"""Background pruning of old pings, notifications and flips.
+
+Ping handling does not prune old pings inline. Instead, every 100 pings
+Check.ping() marks the check as due for pruning by setting Check.prune_due.
+A background thread in the sendalerts management command picks up the marked
+checks, oldest mark first, and prunes them one by one at a limited rate, so
+large DELETE queries do not add to the latency of ping requests.
+
+Marks coalesce: a check that receives more pings while it waits for
+the pruner is still pruned only once. A check is claimed by clearing its mark
+with a conditional UPDATE, so several sendalerts processes can run the pruner
+concurrently without pruning the same check twice.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable
+
+from django.db import close_old_connections, connection
+
+from hc.api.models import Check
+from hc.lib.statsd import statsd
+
+logger = logging.getLogger(__name__)
+
+# The number of marked checks to load in one query
+BATCH_SIZE = 100
+# The delay between pruning two checks, in seconds
+PRUNE_DELAY = 0.1
+# The delay before looking for marked checks again when there are none, in seconds
+IDLE_DELAY = 10
+
+
+def claim(check: Check) -> bool:
+    """Clear the check's prune mark, return True if we got there first."""
+
+    q = Check.objects.filter(id=check.id, prune_due=check.prune_due)
+    return q.update(prune_due=None) == 1
+
+
+def prune_batch(
+    batch_size: int = BATCH_SIZE,
+    delay: float = PRUNE_DELAY,
+    should_stop: Callable[[], bool] = lambda: False,
+) -> int:
+    """Prune up to `batch_size` marked checks, return the number of checks pruned."""
+
+    q = Check.objects.filter(prune_due__isnull=False).order_by("prune_due")
+    checks = list(q.select_related("project")[:batch_size])
+    statsd.gauge("hc.pruner.batchSize", len(checks))
+
+    num_pruned = 0
+    for check in checks:
+        if should_stop():
+            break
+
+        if not claim(check):
+            # Another process has already pruned this check
+            continue
+
+        with statsd.timer("hc.pruner.pruneTime"):
+            check.prune()
+        num_pruned += 1
+        time.sleep(delay)
+
+    return num_pruned
+
+
+def run(
+    should_stop: Callable[[], bool],
+    batch_size: int = BATCH_SIZE,
+    delay: float = PRUNE_DELAY,
+) -> None:
+    """Prune marked checks until `should_stop` returns True."""
+
+    while not should_stop():
+        # This runs in a long-lived thread. Make sure we have a working
+        # db connection. The if condition makes sure this does not run during tests.
+        if not connection.in_atomic_block:
+            close_old_connections()
+
+        try:
+            num_pruned = prune_batch(batch_size, delay, should_stop)
+        except Exception:
+            logger.exception("Exception while pruning checks")
+            num_pruned = 0
+
+        if num_pruned == 0:
+            # Nothing to prune, wait a bit, but wake up promptly on shutdown
+            for _ in range(IDLE_DELAY):
+                if should_stop():
+                    break
+                time.sleep(1)
@@ -0,0 +1,74 @@
+"""Memoized next-fire computation for cron and OnCalendar schedules.
+
+Check.get_grace_start() needs the first time a check's schedule fires after
+its last ping. It runs for every check on every dashboard refresh, API call,
+Prometheus scrape, badge request and sendalerts iteration, and most of its
+cost is parsing the schedule expression. Between two pings of a check the
+answer does not change, so next_fire() memoizes it, keyed by
+(kind, schedule, tz, last_ping), in a per-process LRU cache of up to
+CACHE_SIZE entries.
+
+cronsim and oncalendar parse the expression in the iterator's constructor,
+together with the starting time, and then advance the iterator in place,
+so the parsed iterators themselves cannot be shared between starting times.
+Memoizing the results gives the same benefit for repeated status checks.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+from cronsim import CronSim
+from oncalendar import OnCalendar
+
+# The maximum number of memoized results per process
+CACHE_SIZE = 10000
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    size: int
+    max_size: int
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def next_fire(kind: str, schedule: str, tz: str, after: datetime) -> datetime | None:
+    """Return the first time `schedule` fires after `after`, in UTC.
+
+    `kind` is "cron" or "oncalendar". Return None if an OnCalendar schedule
+    never fires again.
+    """
+
+    # Don't convert to naive datetimes (and so avoid ambiguities around
+    # DST transitions). cronsim will handle the timezone-aware datetimes.
+    after_local = after.astimezone(ZoneInfo(tz))
+    try:
+        if kind == "cron":
+            result = next(CronSim(schedule, after_local))
+        elif kind == "oncalendar":
+            result = next(OnCalendar(schedule, after_local))
+        else:
+            raise NotImplementedError(f"Unexpected kind: {kind}")
+    except StopIteration:
+        return None
+
+    # Important: convert from the local timezone back to UTC.
+    # If the result is kept in the local timezone, adding
+    # a timedelta to it later (in `going_down_after` and in `get_status`)
+    # may yield incorrect results during DST transitions.
+    return result.astimezone(timezone.utc)
+
+
+def cache_info() -> CacheInfo:
+    """Return the hit and miss counters and the size of the cache."""
+
+    info = next_fire.cache_info()
+    return CacheInfo(info.hits, info.misses, info.currsize, CACHE_SIZE)
+
+
+def cache_clear() -> None:
+    next_fire.cache_clear()
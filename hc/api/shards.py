@@ -0,0 +1,148 @@
+"""Sharding sendalerts across processes and hosts.
+
+With `sendalerts --shards N`, checks are split into N shards by check ID
+(check ID modulo N). Every sendalerts process holds leases on a subset of
+the shards, and only looks for going-down checks and unprocessed flips
+in the shards it holds. Concurrent processes therefore work on disjoint
+sets of checks, instead of racing for the same rows.
+
+The leases are rows in the api_shardlease table. Every RENEW_INTERVAL,
+each process extends its leases, counts the live processes (the distinct
+owners of unexpired leases), and adjusts its holdings to its fair share
+of ceil(N / live processes): it releases surplus shards, or claims free
+and expired ones. A process that joins when all shards are taken takes
+over a single shard from the busiest process, which makes it visible to
+the others, and they hand over their surplus shards within a couple of
+renewals. When a process dies, its leases expire
+after LEASE_DURATION, and the survivors take them over.
+
+Leases make the work split efficient, not correct: while a lease changes
+hands, two processes may briefly work on the same shard, and sendalerts
+relies on its conditional updates and row locks to handle that.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import socket
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from datetime import timedelta as td
+from typing import TypeVar
+
+from django.db.models import Model, QuerySet, Value
+from django.db.models.functions import Mod
+from django.db.models.lookups import In
+from django.utils.timezone import now
+
+from hc.api.models import ShardLease
+from hc.lib.statsd import statsd
+
+M = TypeVar("M", bound=Model)
+
+# A lease expires if its owner does not renew it for this long
+LEASE_DURATION = td(seconds=30)
+RENEW_INTERVAL = td(seconds=10)
+EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+class Membership:
+    def __init__(self, num_shards: int, owner: str | None = None) -> None:
+        self.num_shards = num_shards
+        if owner is None:
+            owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.owner = owner
+        self.shards: list[int] = []
+        self.renewed_at: datetime | None = None
+
+    def leases(self) -> QuerySet[ShardLease]:
+        # Ignore the rows of shards past num_shards, left over by runs with
+        # a higher --shards value
+        return ShardLease.objects.filter(shard__lt=self.num_shards)
+
+    def create_leases(self) -> None:
+        """Create the lease rows for all shards, unowned."""
+
+        rows = [ShardLease(shard=i, expires=EPOCH) for i in range(self.num_shards)]
+        ShardLease.objects.bulk_create(rows, ignore_conflicts=True)
+
+    def renew(self) -> bool:
+        """Renew our leases, and claim or release shards to match our fair share.
+
+        Return True if the set of shards we hold changed.
+        """
+
+        frozen_now = now()
+        expires = frozen_now + LEASE_DURATION
+        ours = self.leases().filter(owner=self.owner)
+        ours.update(expires=expires)
+
+        live = self.leases().filter(expires__gt=frozen_now).exclude(owner="")
+        counts = Counter(live.values_list("owner", flat=True))
+        fair_share = math.ceil(self.num_shards / len(counts.keys() | {self.owner}))
+
+        shards = sorted(ours.values_list("shard", flat=True))
+        if len(shards) > fair_share:
+            # Another process has joined, release the surplus shards
+            surplus = shards[fair_share:]
+            q = ours.filter(shard__in=surplus)
+            q.update(owner="", expires=frozen_now)
+            shards = shards[:fair_share]
+        elif len(shards) < fair_share:
+            free = self.leases().filter(expires__lte=frozen_now).order_by("shard")
+            for lease in free[: fair_share - len(shards)]:
+                if self.claim(lease, expires):
+                    shards.append(lease.shard)
+
+            busiest = counts.most_common(1)
+            if not shards and busiest and busiest[0][1] > fair_share:
+                # The other processes hold all shards, and do not know about us
+                # until we hold one. Take one over from the busiest process,
+                # it will release its other surplus shards on its next renewal.
+                q = live.filter(owner=busiest[0][0]).order_by("-shard")
+                if (victim := q.first()) and self.claim(victim, expires):
+                    shards.append(victim.shard)
+            shards.sort()
+
+        changed = shards != self.shards
+        self.shards = shards
+        self.renewed_at = frozen_now
+        statsd.gauge("hc.sendalerts.shards", len(shards))
+        return changed
+
+    def claim(self, lease: ShardLease, expires: datetime) -> bool:
+        """Take over `lease`, unless another process got there first."""
+
+        q = ShardLease.objects.filter(
+            shard=lease.shard, owner=lease.owner, expires=lease.expires
+        )
+        return q.update(owner=self.owner, expires=expires) == 1
+
+    def maybe_renew(self) -> bool:
+        """Renew the leases if a renewal is due, return True if the shards changed."""
+
+        if self.renewed_at is None or now() >= self.renewed_at + RENEW_INTERVAL:
+            return self.renew()
+        return False
+
+    def seconds_until_renew(self) -> float:
+        assert self.renewed_at
+        target = self.renewed_at + RENEW_INTERVAL
+        return max((target - now()).total_seconds(), 0)
+
+    def release(self) -> None:
+        """Release all our leases, so other processes can take them over right away."""
+
+        self.leases().filter(owner=self.owner).update(owner="", expires=now())
+        self.shards = []
+
+    def filter(self, qs: QuerySet[M], field: str) -> QuerySet[M]:
+        """Filter `qs` to the rows in our shards.
+
+        `field` is the name of the field holding the check ID.
+        """
+
+        shard = Mod(field, Value(self.num_shards))
+        return qs.filter(In(shard, self.shards))
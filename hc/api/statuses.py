@@ -0,0 +1,151 @@
+"""Check status evaluation, in Python for single checks and in SQL in bulk.
+
+evaluate() computes a check's status from a handful of its fields
+(TIMING_FIELDS). Cron and OnCalendar schedules are evaluated through the
+memoized hc.api.schedules.next_fire().
+
+Pages and API endpoints that summarize thousands of checks (the project list,
+the projects menu, badges, the "down" counts) do not need to load the checks
+at all. Check.update_deadlines() keeps two deadlines in the database,
+alert_after (when the check goes down, taking last_start into account) and
+grace_start (when the grace period starts, ignoring last_start), and down_q(),
+grace_q() and status_expression() use them to match get_status() in SQL.
+evaluate_many() and bulk_statuses() build on status_expression() for the
+pages that need every check's status (the dashboard, the Prometheus metrics,
+nag emails).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from datetime import datetime
+from datetime import timedelta as td
+from typing import TYPE_CHECKING, Any, NamedTuple
+from uuid import UUID
+
+from django.db.models import Case, CharField, F, Q, Value, When
+from django.utils.timezone import now
+
+from hc.api import schedules
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+    from hc.api.models import Check
+
+TIMING_FIELDS = (
+    "kind",
+    "status",
+    "last_ping",
+    "last_start",
+    "timeout",
+    "grace",
+    "schedule",
+    "tz",
+)
+
+
+class Timing(NamedTuple):
+    kind: str
+    status: str
+    last_ping: datetime | None
+    last_start: datetime | None
+    timeout: td
+    grace: td
+    schedule: str
+    tz: str
+
+
+def grace_start(t: Timing) -> datetime | None:
+    """Return the datetime when the grace period starts, ignoring last_start.
+
+    If the check is currently new, paused or down, or if its schedule
+    never fires again, return None.
+    """
+
+    if t.status != "up":
+        return None
+
+    assert t.last_ping is not None
+    if t.kind == "simple":
+        return t.last_ping + t.timeout
+
+    if t.kind in ("cron", "oncalendar"):
+        # The complex case, next ping is expected based on the schedule.
+        return schedules.next_fire(t.kind, t.schedule, t.tz, t.last_ping)
+
+    return None
+
+
+def evaluate(t: Timing, frozen_now: datetime, *, with_started: bool = False) -> str:
+    """Return the status of a check with the timing fields `t` at `frozen_now`."""
+
+    if t.last_start:
+        if frozen_now >= t.last_start + t.grace:
+            return "down"
+        elif with_started:
+            return "started"
+
+    if t.status in ("new", "paused", "down"):
+        return t.status
+
+    start = grace_start(t)
+    if start is None:
+        # next elapse is "never", so this check will stay up indefinitely
+        return "up"
+
+    if frozen_now >= start + t.grace:
+        return "down"
+
+    if frozen_now >= start:
+        return "grace"
+
+    return "up"
+
+
+def down_q(frozen_now: datetime) -> Q:
+    """Return a filter for the checks whose status is "down" at `frozen_now`."""
+
+    return Q(status="down") | Q(alert_after__lte=frozen_now)
+
+
+def grace_q(frozen_now: datetime) -> Q:
+    """Return a filter for the checks whose status is "grace" at `frozen_now`."""
+
+    return Q(status="up", grace_start__lte=frozen_now) & ~down_q(frozen_now)
+
+
+def status_expression(frozen_now: datetime, *, with_started: bool = False) -> Case:
+    """Return a SQL expression for the checks' status at `frozen_now`.
+
+    With `with_started`, report running checks that are not down as "started".
+
+    Usage: Check.objects.annotate(current_status=status_expression(now()))
+    """
+
+    whens = [When(down_q(frozen_now), then=Value("down"))]
+    if with_started:
+        whens.append(When(last_start__isnull=False, then=Value("started")))
+    whens.append(When(Q(status="up", grace_start__lte=frozen_now), then=Value("grace")))
+    return Case(*whens, default=F("status"), output_field=CharField())
+
+
+def evaluate_many(
+    q: QuerySet[Check], *fields: str, with_started: bool = False
+) -> Iterator[tuple[str, tuple[Any, ...]]]:
+    """Yield (status, values of `fields`) for each check in `q`.
+
+    Evaluates all statuses in SQL, with a single frozen "now" for the whole
+    batch, and without building Check instances.
+    """
+
+    expr = status_expression(now(), with_started=with_started)
+    for row in q.annotate(current_status=expr).values_list("current_status", *fields):
+        yield row[0], row[1:]
+
+
+def bulk_statuses(q: QuerySet[Check], *, with_started: bool = False) -> dict[UUID, str]:
+    """Return a mapping of check codes to statuses for the checks in `q`."""
+
+    rows = evaluate_many(q, "code", with_started=with_started)
+    return {code: status for status, (code,) in rows}
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-from hc.api.models import Channel, Check
+from datetime import timedelta as td
+
+from django.utils.timezone import now
+
+from hc.api.models import Channel, Check, CircuitBreaker
 from hc.test import BaseTestCase
 
 
@@ -22,3 +26,32 @@ class ApiAdminTestCase(BaseTestCase):
 
         r = self.client.get("/admin/api/channel/")
         self.assertContains(r, '<span class="ic">pushbullet</span>')
+
+    def test_it_shows_open_circuit_breaker(self) -> None:
+        self.client.login(username="alice@example.org", password="password")
+
+        Channel.objects.create(
+            project=self.project,
+            kind="webhook",
+            last_error="Circuit breaker open for example.org, request not sent",
+        )
+
+        r = self.client.get("/admin/api/channel/?status=breaker")
+        self.assertContains(r, "Breaker open")
+
+    def test_it_shows_circuit_breaker_list(self) -> None:
+        self.client.login(username="alice@example.org", password="password")
+
+        CircuitBreaker.objects.create(
+            key="https://example.org:443", failures=5, opened=now()
+        )
+        CircuitBreaker.objects.create(
+            key="https://example.com:443", failures=6, opened=now() - td(minutes=5)
+        )
+        CircuitBreaker.objects.create(key="https://example.net:443", failures=1)
+
+        r = self.client.get("/admin/api/circuitbreaker/")
+        self.assertContains(r, "example.org")
+        self.assertContains(r, '<td class="field-state">Open</td>', html=True)
+        self.assertContains(r, "Half-open")
+        self.assertContains(r, "Closed")
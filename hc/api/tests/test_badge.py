@@ -59,6 +59,7 @@ class BadgeTestCase(BaseTestCase):
     def test_it_treats_late_as_up(self) -> None:
         self.check.last_ping = now() - td(days=1, minutes=10)
         self.check.status = "up"
+        self.check.update_deadlines()
         self.check.save()
 
         doc = self.client.get(self.json_url).json()
@@ -80,6 +81,7 @@ class BadgeTestCase(BaseTestCase):
     def test_late_mode_returns_late_status(self) -> None:
         self.check.last_ping = now() - td(days=1, minutes=10)
         self.check.status = "up"
+        self.check.update_deadlines()
         self.check.save()
 
         doc = self.client.get(self.with_late_url).json()
@@ -89,6 +91,7 @@ class BadgeTestCase(BaseTestCase):
         self.check.last_start = now()
         self.check.last_ping = now() - td(days=1, minutes=10)
         self.check.status = "up"
+        self.check.update_deadlines()
         self.check.save()
 
         doc = self.client.get(self.with_late_url).json()
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.test.utils import override_settings
+
+from hc.api.models import Check
+
+
+# The benchmark sends pings from worker threads, which cannot see
+# the uncommitted data of a TestCase transaction. Use TransactionTestCase.
+# The in-memory SQLite test database does not handle concurrent writers,
+# so the tests use a single worker thread.
+@override_settings(S3_BUCKET=None)
+class BenchPingsTestCase(TransactionTestCase):
+    def test_it_works(self) -> None:
+        out = StringIO()
+        call_command(
+            "benchpings",
+            "--projects=2",
+            "--checks=3",
+            "--pings=10",
+            "--concurrency=1",
+            stdout=out,
+        )
+
+        lines = out.getvalue().splitlines()
+        rows = {line.split()[0]: line.split() for line in lines[2:7]}
+        self.assertEqual(
+            list(rows.keys()), ["uuid", "uuid-body", "slug", "slug-body", "filter"]
+        )
+        for row in rows.values():
+            # No errors
+            self.assertEqual(row[-1], "0")
+
+        # It should clean up after itself
+        self.assertFalse(User.objects.filter(username="hc-benchpings").exists())
+        self.assertFalse(Check.objects.exists())
+
+    def test_it_keeps_data(self) -> None:
+        call_command(
+            "benchpings",
+            "--projects=1",
+            "--checks=2",
+            "--pings=4",
+            "--scenario=slug",
+            "--concurrency=1",
+            "--keep",
+            stdout=StringIO(),
+        )
+
+        total = sum(Check.objects.values_list("n_pings", flat=True))
+        self.assertEqual(total, 4)
@@ -412,6 +412,32 @@ class CheckModelTestCase(BaseTestCase):
 
         self.assertEqual(Flip.objects.count(), 1)
 
+    @override_settings(S3_BUCKET=None)
+    @patch("hc.api.models.Check.prune")
+    def test_ping_marks_check_for_pruning(self, prune: Mock) -> None:
+        check = Check.objects.create(project=self.project, n_pings=98)
+
+        check.ping("1.2.3.4", "http", "get", "", b"", "success", None)
+        check.refresh_from_db()
+        self.assertIsNone(check.prune_due)
+
+        check.ping("1.2.3.4", "http", "get", "", b"", "success", None)
+        check.refresh_from_db()
+        self.assertEqual(check.n_pings, 100)
+        self.assertIsNotNone(check.prune_due)
+        # Pruning happens in the background, not in the request
+        prune.assert_not_called()
+
+    def test_mark_prune_due_keeps_older_mark(self) -> None:
+        check = Check(project=self.project, prune_due=CURRENT_TIME)
+        check.mark_prune_due(199, 200, CURRENT_TIME + td(hours=1))
+        self.assertEqual(check.prune_due, CURRENT_TIME)
+
+    def test_mark_prune_due_handles_skipped_boundary(self) -> None:
+        check = Check(project=self.project)
+        check.mark_prune_due(99, 101, CURRENT_TIME)
+        self.assertEqual(check.prune_due, CURRENT_TIME)
+
     @override_settings(S3_BUCKET="test-bucket")
     @patch("hc.api.models.remove_objects")
     def test_it_prunes_object_storage(self, remove_objects: Mock) -> None:
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+from datetime import timedelta as td
+from unittest.mock import Mock, patch
+
+from django.utils.timezone import now
+
+from hc.api.models import BREAKER_COOLDOWN, BREAKER_THRESHOLD, CircuitBreaker
+from hc.api.transports import HttpTransport, TransportError, breaker_scope
+from hc.lib.curl import CurlError
+from hc.test import BaseTestCase
+
+URL = "https://example.org/hook"
+KEY = "https://example.org:443"
+
+
+def post() -> None:
+    HttpTransport.post(URL, retry=False)
+
+
+@patch("hc.api.transports.curl.request", autospec=True)
+class CircuitBreakerTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        CircuitBreaker.clear_cache()
+
+    def fail_requests(self, mock_request: Mock, times: int) -> None:
+        mock_request.side_effect = CurlError("Connection timed out")
+        for _ in range(0, times):
+            with self.assertRaises(TransportError):
+                post()
+
+    def test_it_counts_consecutive_failures(self, mock_request: Mock) -> None:
+        self.fail_requests(mock_request, BREAKER_THRESHOLD - 1)
+
+        obj = CircuitBreaker.objects.get()
+        self.assertEqual(obj.key, KEY)
+        self.assertEqual(obj.failures, BREAKER_THRESHOLD - 1)
+        self.assertIsNone(obj.opened)
+
+    def test_success_resets_failures(self, mock_request: Mock) -> None:
+        self.fail_requests(mock_request, BREAKER_THRESHOLD - 1)
+
+        mock_request.side_effect = None
+        mock_request.return_value.status_code = 200
+        post()
+        self.assertFalse(CircuitBreaker.objects.exists())
+
+    def test_client_errors_do_not_count(self, mock_request: Mock) -> None:
+        mock_request.return_value.status_code = 404
+        with self.assertRaises(TransportError):
+            post()
+
+        self.assertFalse(CircuitBreaker.objects.exists())
+
+    def test_server_errors_count(self, mock_request: Mock) -> None:
+        mock_request.return_value.status_code = 502
+        with self.assertRaises(TransportError):
+            post()
+
+        self.assertEqual(CircuitBreaker.objects.get().failures, 1)
+
+    @patch("hc.api.models.statsd")
+    def test_it_opens_and_fails_fast(self, statsd: Mock, mock_request: Mock) -> None:
+        self.fail_requests(mock_request, BREAKER_THRESHOLD)
+        self.assertIsNotNone(CircuitBreaker.objects.get().opened)
+        statsd.incr.assert_called_once_with("hc.breaker.open")
+
+        mock_request.reset_mock()
+        with self.assertRaises(TransportError) as cm:
+            post()
+
+        self.assertEqual(
+            cm.exception.message,
+            "Circuit breaker open for example.org, request not sent",
+        )
+        self.assertFalse(cm.exception.permanent)
+        mock_request.assert_not_called()
+
+    @patch("hc.api.models.statsd")
+    def test_it_probes_and_closes(self, statsd: Mock, mock_request: Mock) -> None:
+        self.fail_requests(mock_request, BREAKER_THRESHOLD)
+        CircuitBreaker.objects.update(opened=now() - BREAKER_COOLDOWN)
+
+        mock_request.side_effect = None
+        mock_request.return_value.status_code = 200
+        post()
+
+        self.assertFalse(CircuitBreaker.objects.exists())
+        statsd.incr.assert_any_call("hc.breaker.probe")
+        statsd.incr.assert_any_call("hc.breaker.close")
+
+    def test_failed_probe_reopens(self, mock_request: Mock) -> None:
+        self.fail_requests(mock_request, BREAKER_THRESHOLD)
+        CircuitBreaker.objects.update(opened=now() - BREAKER_COOLDOWN)
+
+        self.fail_requests(mock_request, 1)
+        obj = CircuitBreaker.objects.get()
+        assert obj.opened
+        self.assertGreater(obj.opened, now() - td(seconds=5))
+
+        # The next request fails fast again
+        mock_request.reset_mock()
+        self.fail_requests(mock_request, 1)
+        mock_request.assert_not_called()
+
+    def test_it_lets_one_probe_through(self, mock_request: Mock) -> None:
+        self.fail_requests(mock_request, BREAKER_THRESHOLD)
+        CircuitBreaker.objects.update(opened=now() - BREAKER_COOLDOWN)
+
+        probe = CircuitBreaker.guard(KEY)
+        assert probe
+        # While the probe is in flight, other requests fail fast
+        with self.assertRaises(CircuitBreaker.Open):
+            CircuitBreaker.guard(KEY)
+
+    def test_it_tracks_hosts_separately(self, mock_request: Mock) -> None:
+        self.fail_requests(mock_request, BREAKER_THRESHOLD)
+
+        mock_request.side_effect = None
+        mock_request.return_value.status_code = 200
+        HttpTransport.post("https://other.example.org/hook", retry=False)
+
+    def test_it_tracks_ports_and_schemes_separately(self, mock_request: Mock) -> None:
+        self.fail_requests(mock_request, BREAKER_THRESHOLD)
+
+        mock_request.side_effect = None
+        mock_request.return_value.status_code = 200
+        HttpTransport.post("https://example.org:8443/hook", retry=False)
+        HttpTransport.post("http://example.org/hook", retry=False)
+        self.assertEqual(mock_request.call_count, BREAKER_THRESHOLD + 2)
+
+    def test_test_notifications_bypass_breakers(self, mock_request: Mock) -> None:
+        mock_request.side_effect = CurlError("Connection timed out")
+        with breaker_scope("channel-code", is_test=True):
+            for _ in range(0, BREAKER_THRESHOLD):
+                with self.assertRaises(TransportError):
+                    post()
+
+        self.assertFalse(CircuitBreaker.objects.exists())
+
+        # Test notifications should not fail fast either
+        self.fail_requests(mock_request, BREAKER_THRESHOLD)
+        mock_request.reset_mock()
+        with breaker_scope("channel-code", is_test=True):
+            with self.assertRaises(TransportError):
+                post()
+        mock_request.assert_called_once()
+
+    def test_it_scopes_shared_hosts_per_channel(self, mock_request: Mock) -> None:
+        url = "https://hooks.zapier.com/hooks/catch/1/abc/"
+        mock_request.side_effect = CurlError("Connection timed out")
+        with breaker_scope("ch1"):
+            for _ in range(0, BREAKER_THRESHOLD):
+                with self.assertRaises(TransportError):
+                    HttpTransport.post(url, retry=False)
+
+        obj = CircuitBreaker.objects.get()
+        self.assertEqual(obj.key, "https://hooks.zapier.com:443 ch1")
+        self.assertIsNotNone(obj.opened)
+
+        # Another channel's requests to the same host should go through
+        mock_request.reset_mock()
+        mock_request.side_effect = None
+        mock_request.return_value.status_code = 200
+        with breaker_scope("ch2"):
+            HttpTransport.post(url, retry=False)
+        mock_request.assert_called_once()
+
+    def test_it_skips_shared_hosts_without_channel(self, mock_request: Mock) -> None:
+        mock_request.side_effect = CurlError("Connection timed out")
+        with self.assertRaises(TransportError):
+            HttpTransport.post("https://hooks.zapier.com/hooks/", retry=False)
+
+        self.assertFalse(CircuitBreaker.objects.exists())
+
+    def test_it_caches_healthy_destinations(self, mock_request: Mock) -> None:
+        mock_request.return_value.status_code = 200
+        post()
+        # The second request should not need to look up the breaker
+        with self.assertNumQueries(0):
+            post()
+
+        # A failure should show up right away
+        self.fail_requests(mock_request, BREAKER_THRESHOLD)
+        mock_request.reset_mock()
+        self.fail_requests(mock_request, 1)
+        mock_request.assert_not_called()
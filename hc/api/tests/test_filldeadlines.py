@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from datetime import timedelta as td
+from unittest.mock import Mock
+
+from django.utils.timezone import now
+
+from hc.api.management.commands.filldeadlines import Command
+from hc.api.models import Check
+from hc.test import BaseTestCase
+
+
+class FillDeadlinesTestCase(BaseTestCase):
+    def test_it_works(self) -> None:
+        last_ping = now() - td(hours=1)
+        check = Check.objects.create(
+            project=self.project, status="up", last_ping=last_ping
+        )
+        new = Check.objects.create(project=self.project)
+
+        result = Command(stdout=Mock()).handle(batch_size=1)
+        self.assertEqual(result, "Done! Filled in grace_start for 1 checks.")
+
+        check.refresh_from_db()
+        self.assertEqual(check.grace_start, last_ping + check.timeout)
+        new.refresh_from_db()
+        self.assertIsNone(new.grace_start)
+
+    def test_it_does_not_overwrite_existing_values(self) -> None:
+        grace_start = now() + td(days=1)
+        check = Check.objects.create(
+            project=self.project,
+            status="up",
+            last_ping=now(),
+            grace_start=grace_start,
+        )
+
+        Command(stdout=Mock()).handle(batch_size=1000)
+        check.refresh_from_db()
+        self.assertEqual(check.grace_start, grace_start)
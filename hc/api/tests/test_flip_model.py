@@ -66,6 +66,19 @@ class FlipModelTestCase(BaseTestCase):
         channels = self.flip.select_channels()
         self.assertEqual(channels, [c1, c9, self.channel])
 
+    def test_select_channels_skips_disabled(self) -> None:
+        self.channel.disabled = True
+        self.channel.save()
+
+        self.assertEqual(self.flip.select_channels(), [])
+
+    def test_select_channels_uses_prefetched_channels(self) -> None:
+        self.flip.save()
+        flip = Flip.objects.prefetch_related("owner__channel_set").get()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(flip.select_channels(), [self.channel])
+
     def test_it_calculates_down_duration(self) -> None:
         self.flip.save()
 
@@ -3,6 +3,7 @@ from __future__ import annotations
 from django.test.utils import override_settings
 from django.utils.timezone import now
 
+from hc.api import schedules
 from hc.api.models import Channel, Check, Flip, Notification, Ping
 from hc.test import BaseTestCase
 
@@ -56,3 +57,14 @@ class MetricsTestCase(BaseTestCase):
     def test_it_handles_incorrect_metrics_key(self) -> None:
         r = self.client.get(self.url, HTTP_X_METRICS_KEY="bar")
         self.assertEqual(r.status_code, 403)
+
+    def test_it_returns_schedule_cache_counters(self) -> None:
+        schedules.cache_clear()
+        schedules.next_fire("cron", "* * * * *", "UTC", now())
+
+        r = self.client.get(self.url, HTTP_X_METRICS_KEY="foo")
+        self.assertEqual(r.status_code, 200)
+
+        doc = r.json()
+        self.assertEqual(doc["schedule_cache_hits"], 0)
+        self.assertEqual(doc["schedule_cache_misses"], 1)
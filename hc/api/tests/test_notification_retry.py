@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+from datetime import timedelta as td
+from unittest.mock import Mock, patch
+
+from django.utils.timezone import now
+
+from hc.api.models import (
+    RETRY_MAX_AGE,
+    Channel,
+    Check,
+    Flip,
+    Notification,
+    NotificationRetry,
+)
+from hc.api.transports import TransportError
+from hc.lib.curl import CurlError
+from hc.test import BaseTestCase
+
+WEBHOOK = {
+    "method_down": "GET",
+    "url_down": "http://example.org",
+    "body_down": "",
+    "headers_down": {},
+}
+
+
+@patch("hc.api.transports.curl.request", autospec=True)
+class NotificationRetryTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.check = Check.objects.create(project=self.project, status="down")
+        self.channel = Channel.objects.create(
+            project=self.project, kind="webhook", value=json.dumps(WEBHOOK)
+        )
+        self.flip = Flip.objects.create(
+            owner=self.check, created=now(), old_status="up", new_status="down"
+        )
+
+    def test_it_schedules_retry(self, mock_get: Mock) -> None:
+        mock_get.side_effect = CurlError("Foo failed")
+
+        error = self.channel.notify(self.flip, retry_queue=True)
+        self.assertEqual(error, "Foo failed")
+        # It should make a single attempt
+        self.assertEqual(mock_get.call_count, 1)
+
+        retry = NotificationRetry.objects.get()
+        self.assertEqual(retry.notification, Notification.objects.get())
+        self.assertEqual(retry.flip, self.flip)
+        self.assertEqual(retry.attempts, 1)
+        self.assertGreater(retry.next_attempt, now() + td(seconds=14))
+        self.assertLess(retry.next_attempt, now() + td(seconds=31))
+
+    @patch("hc.integrations.webhook.transport.Webhook.notify")
+    def test_it_skips_permanent_errors(self, notify: Mock, mock_get: Mock) -> None:
+        notify.side_effect = TransportError("Gone", permanent=True)
+
+        self.channel.notify(self.flip, retry_queue=True)
+        self.assertFalse(NotificationRetry.objects.exists())
+
+    def test_it_retries_inline_without_retry_queue(self, mock_get: Mock) -> None:
+        mock_get.side_effect = CurlError("Foo failed")
+
+        self.channel.notify(self.flip)
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertFalse(NotificationRetry.objects.exists())
+
+    def test_attempt_delivers(self, mock_get: Mock) -> None:
+        mock_get.side_effect = CurlError("Foo failed")
+        self.channel.notify(self.flip, retry_queue=True)
+
+        mock_get.side_effect = None
+        mock_get.return_value.status_code = 200
+        retry = NotificationRetry.objects.get()
+        self.assertEqual(retry.attempt(), "")
+
+        self.assertFalse(NotificationRetry.objects.exists())
+        self.assertEqual(Notification.objects.get().error, "")
+        self.channel.refresh_from_db()
+        self.assertEqual(self.channel.last_error, "")
+
+    def test_attempt_reschedules(self, mock_get: Mock) -> None:
+        mock_get.side_effect = CurlError("Foo failed")
+        self.channel.notify(self.flip, retry_queue=True)
+
+        retry = NotificationRetry.objects.get()
+        self.assertEqual(retry.attempt(), "Foo failed")
+
+        retry.refresh_from_db()
+        self.assertEqual(retry.attempts, 2)
+        self.assertGreater(retry.next_attempt, now() + td(seconds=29))
+
+    def test_attempt_gives_up_after_max_age(self, mock_get: Mock) -> None:
+        mock_get.side_effect = CurlError("Foo failed")
+        self.channel.notify(self.flip, retry_queue=True)
+
+        retry = NotificationRetry.objects.get()
+        retry.created = now() - RETRY_MAX_AGE
+        self.assertEqual(retry.attempt(), "Foo failed")
+
+        self.assertFalse(NotificationRetry.objects.exists())
+        self.assertEqual(Notification.objects.get().error, "Foo failed")
+
+    def test_attempt_skips_disabled_channels(self, mock_get: Mock) -> None:
+        mock_get.side_effect = CurlError("Foo failed")
+        self.channel.notify(self.flip, retry_queue=True)
+        Channel.objects.update(disabled=True)
+
+        retry = NotificationRetry.objects.get()
+        self.assertEqual(retry.attempt(), "Channel is disabled")
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertFalse(NotificationRetry.objects.exists())
+
+    def test_attempt_skips_superseded_notifications(self, mock_get: Mock) -> None:
+        mock_get.side_effect = CurlError("Foo failed")
+        self.channel.notify(self.flip, retry_queue=True)
+        # The check has recovered since
+        Flip.objects.create(
+            owner=self.check,
+            created=now() + td(minutes=1),
+            old_status="down",
+            new_status="up",
+        )
+
+        retry = NotificationRetry.objects.get()
+        self.assertEqual(retry.attempt(), "Superseded by a newer status change")
+        # It should not send the stale "down" notification
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertFalse(NotificationRetry.objects.exists())
+
+    def test_backoff_grows_exponentially(self, mock_get: Mock) -> None:
+        with patch("hc.api.models.random.uniform", return_value=1.0):
+            self.assertEqual(NotificationRetry.backoff(1), td(seconds=30))
+            self.assertEqual(NotificationRetry.backoff(3), td(minutes=2))
+            self.assertEqual(NotificationRetry.backoff(10), td(minutes=30))
+
+        with patch("hc.api.models.random.uniform", return_value=0.5):
+            self.assertEqual(NotificationRetry.backoff(1), td(seconds=15))
@@ -79,6 +79,7 @@ class PauseTestCase(BaseTestCase):
     def test_it_clears_last_start_alert_after(self) -> None:
         self.check.last_start = now()
         self.check.alert_after = self.check.last_start + td(hours=1)
+        self.check.grace_start = self.check.last_start
         self.check.save()
 
         r = self.client.post(
@@ -91,6 +92,7 @@ class PauseTestCase(BaseTestCase):
         self.check.refresh_from_db()
         self.assertEqual(self.check.last_start, None)
         self.assertEqual(self.check.alert_after, None)
+        self.assertEqual(self.check.grace_start, None)
 
     def test_it_clears_next_nag_date(self) -> None:
         self.profile.nag_period = td(hours=1)
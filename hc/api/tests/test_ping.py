@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import timedelta as td
+from typing import IO
 from unittest.mock import Mock, patch
 from uuid import UUID, uuid4
 
@@ -34,6 +35,7 @@ class PingTestCase(BaseTestCase):
         assert self.check.last_ping
         expected_aa = self.check.last_ping + td(days=1, hours=1)
         self.assertEqual(self.check.alert_after, expected_aa)
+        self.assertEqual(self.check.grace_start, self.check.last_ping + td(days=1))
 
         ping = Ping.objects.get()
         self.assertEqual(ping.n, 1)
@@ -391,17 +393,34 @@ class PingTestCase(BaseTestCase):
     @override_settings(S3_BUCKET="test-bucket", PING_BODY_LIMIT=None)
     @patch("hc.api.models.put_object")
     def test_it_uploads_body_to_s3(self, put_object: Mock) -> None:
+        uploads = []
+
+        def upload(code: UUID, n: int, f: IO[bytes]) -> None:
+            f.seek(0)
+            uploads.append((code, n, f.read()))
+
+        put_object.side_effect = upload
+
         r = self.client.post(self.url, b"a" * 101, content_type="text/plain")
         self.assertEqual(r.status_code, 200)
 
         ping = Ping.objects.get()
         self.assertEqual(ping.method, "POST")
         self.assertEqual(ping.object_size, 101)
+        self.assertEqual(uploads, [(self.check.code, 1, b"a" * 101)])
+
+    @override_settings(S3_BUCKET="test-bucket", PING_BODY_LIMIT=None)
+    @patch("hc.api.models.put_object")
+    @patch("hc.api.models.uploader")
+    def test_it_queues_body_upload(self, uploader: Mock, put_object: Mock) -> None:
+        uploader.submit.return_value = True
+
+        r = self.client.post(self.url, b"a" * 101, content_type="text/plain")
+        self.assertEqual(r.status_code, 200)
 
-        code, n, data = put_object.call_args.args
-        self.assertEqual(code, self.check.code)
-        self.assertEqual(n, 1)
-        self.assertEqual(data, b"a" * 101)
+        code, n, _ = uploader.submit.call_args.args
+        self.assertEqual((code, n), (self.check.code, 1))
+        put_object.assert_not_called()
 
     def test_log_endpoint_works(self) -> None:
         r = self.client.post(self.url + "/log", "hello", content_type="text/plain")
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase
+from django.test.utils import override_settings
+from django.urls import resolve
+
+from hc.accounts.models import Project
+from hc.api import views
+from hc.api.models import Check, Ping
+
+
+# The async views run their database work in separate threads, which cannot
+# see the uncommitted data of a TestCase transaction. Use TransactionTestCase.
+@override_settings(ROOT_URLCONF="hc.asgi_urls", S3_BUCKET=None)
+class AsyncPingTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        alice = User.objects.create(username="alice", email="alice@example.org")
+        self.project = Project.objects.create(owner=alice, ping_key="p" * 22)
+        self.check = Check.objects.create(project=self.project, slug="foo")
+
+    def test_it_uses_async_views(self) -> None:
+        match = resolve(f"/ping/{self.check.code}/fail")
+        self.assertEqual(match.func, views.ping_async)
+
+        match = resolve(f"/ping/{'p' * 22}/foo/start")
+        self.assertEqual(match.func, views.ping_by_slug_async)
+
+        match = resolve("/ping/bulk")
+        self.assertEqual(match.func, views.ping_bulk)
+
+    async def test_it_works(self) -> None:
+        r = await self.async_client.post(
+            f"/ping/{self.check.code}", b"hello", content_type="text/plain"
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, b"OK")
+        self.assertIn("no-cache", r["Cache-Control"])
+
+        ping = await Ping.objects.aget()
+        self.assertEqual(ping.kind, None)
+        assert ping.body_raw
+        self.assertEqual(bytes(ping.body_raw), b"hello")
+
+        await self.check.arefresh_from_db()
+        self.assertEqual(self.check.status, "up")
+
+    async def test_it_handles_fail(self) -> None:
+        r = await self.async_client.get(f"/ping/{self.check.code}/fail")
+        self.assertEqual(r.status_code, 200)
+
+        await self.check.arefresh_from_db()
+        self.assertEqual(self.check.status, "down")
+
+    async def test_it_handles_exitstatus(self) -> None:
+        r = await self.async_client.get(f"/ping/{self.check.code}/1")
+        self.assertEqual(r.status_code, 200)
+
+        ping = await Ping.objects.aget()
+        self.assertEqual(ping.exitstatus, 1)
+
+    async def test_it_handles_missing_check(self) -> None:
+        r = await self.async_client.get("/ping/07c2f548-9850-4b27-af5d-6c9dc157ec02")
+        self.assertEqual(r.status_code, 404)
+
+    async def test_it_handles_slug(self) -> None:
+        r = await self.async_client.get(f"/ping/{'p' * 22}/foo/start")
+        self.assertEqual(r.status_code, 200)
+
+        ping = await Ping.objects.aget()
+        self.assertEqual(ping.kind, "start")
+
+    async def test_it_creates_check_by_slug(self) -> None:
+        r = await self.async_client.get(f"/ping/{'p' * 22}/bar?create=1")
+        self.assertEqual(r.status_code, 201)
+        self.assertTrue(await Check.objects.filter(slug="bar").aexists())
+
+    async def test_it_works_for_logged_in_user(self) -> None:
+        user = await User.objects.aget(username="alice")
+        await self.async_client.aforce_login(user)
+
+        r = await self.async_client.get(f"/ping/{self.check.code}")
+        self.assertEqual(r.status_code, 200)
+
+
+class ASGIHandlerTestCase(TransactionTestCase):
+    def test_it_sets_urlconf(self) -> None:
+        from hc.asgi import application
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/ping/foo",
+            "query_string": b"",
+            "headers": [],
+        }
+        request, _ = application.create_request(scope, BytesIO())
+        assert request
+        self.assertEqual(request.urlconf, "hc.asgi_urls")
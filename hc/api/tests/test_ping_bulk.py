@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+from unittest.mock import Mock, patch
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.test.utils import override_settings
+from django.utils.timezone import now
+
+from hc.api.models import Check, Flip, Ping
+from hc.test import BaseTestCase, TestHttpResponse
+
+
+@override_settings(S3_BUCKET=None)
+class PingBulkTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.check = Check.objects.create(project=self.project, name="foo", slug="foo")
+        self.url = "/ping/bulk"
+
+    def post(self, data: Any) -> TestHttpResponse:
+        return self.client.post(
+            self.url, json.dumps(data), content_type="application/json"
+        )
+
+    def test_it_works(self) -> None:
+        r = self.post({"pings": [{"uuid": str(self.check.code)}]})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), {"results": [{"ok": True}]})
+        self.assertEqual(r.headers["Access-Control-Allow-Origin"], "*")
+
+        self.check.refresh_from_db()
+        self.assertEqual(self.check.n_pings, 1)
+        self.assertEqual(self.check.status, "up")
+
+        ping = Ping.objects.get()
+        self.assertEqual(ping.method, "POST")
+        self.assertEqual(ping.kind, None)
+
+    def test_it_handles_multiple_pings(self) -> None:
+        rid = uuid4()
+        pings = [
+            {"uuid": str(self.check.code), "action": "start", "rid": str(rid)},
+            {"uuid": str(self.check.code), "rid": str(rid), "body": "hello"},
+        ]
+        r = self.post({"pings": pings})
+        self.assertEqual(r.json(), {"results": [{"ok": True}, {"ok": True}]})
+
+        self.check.refresh_from_db()
+        self.assertEqual(self.check.n_pings, 2)
+        self.assertIsNotNone(self.check.last_duration)
+
+        start, success = Ping.objects.order_by("n")
+        self.assertEqual(start.kind, "start")
+        self.assertEqual(start.rid, rid)
+        self.assertEqual(success.kind, None)
+        assert success.body_raw
+        self.assertEqual(bytes(success.body_raw), b"hello")
+
+    def test_it_handles_slug(self) -> None:
+        ping = {"ping_key": self.project.ping_key, "slug": "foo", "action": "fail"}
+        r = self.post({"pings": [ping]})
+        self.assertEqual(r.json(), {"results": [{"ok": True}]})
+
+        self.check.refresh_from_db()
+        self.assertEqual(self.check.status, "down")
+        flip = Flip.objects.get()
+        self.assertEqual(flip.reason, "fail")
+
+    def test_it_handles_exitstatus(self) -> None:
+        r = self.post({"pings": [{"uuid": str(self.check.code), "exitstatus": 123}]})
+        self.assertEqual(r.json(), {"results": [{"ok": True}]})
+
+        ping = Ping.objects.get()
+        self.assertEqual(ping.kind, "fail")
+        self.assertEqual(ping.exitstatus, 123)
+
+    def test_it_applies_keyword_filters(self) -> None:
+        self.check.filter_http_body = True
+        self.check.failure_kw = "ERROR"
+        self.check.save()
+
+        pings = [
+            {"uuid": str(self.check.code), "body": "all good"},
+            {"uuid": str(self.check.code), "body": "ERROR: disk full"},
+        ]
+        r = self.post({"pings": pings})
+        self.assertEqual(r.json(), {"results": [{"ok": True}, {"ok": True}]})
+
+        kinds = list(Ping.objects.order_by("n").values_list("kind", flat=True))
+        self.assertEqual(kinds, ["ign", "fail"])
+
+    def test_it_reports_results_per_item(self) -> None:
+        pings = [
+            {"uuid": str(uuid4())},
+            {"uuid": "not-a-uuid"},
+            {"uuid": str(self.check.code), "exitstatus": 256},
+            {"slug": "foo"},
+            {"ping_key": self.project.ping_key, "slug": "bar"},
+            {"uuid": str(self.check.code)},
+        ]
+        r = self.post({"pings": pings})
+        self.assertEqual(r.status_code, 200)
+        results = r.json()["results"]
+        self.assertEqual(results[0], {"ok": False, "error": "not found"})
+        self.assertEqual(results[1], {"ok": False, "error": "invalid uuid"})
+        self.assertEqual(results[2], {"ok": False, "error": "invalid exitstatus"})
+        self.assertEqual(results[3], {"ok": False, "error": "missing uuid or slug"})
+        self.assertEqual(results[4], {"ok": False, "error": "not found"})
+        self.assertEqual(results[5], {"ok": True})
+
+        self.assertEqual(Ping.objects.count(), 1)
+
+    def test_it_handles_ambiguous_slug(self) -> None:
+        Check.objects.create(project=self.project, slug="foo")
+
+        ping = {"ping_key": self.project.ping_key, "slug": "foo"}
+        r = self.post({"pings": [ping]})
+        self.assertEqual(
+            r.json(), {"results": [{"ok": False, "error": "ambiguous slug"}]}
+        )
+        self.assertFalse(Ping.objects.exists())
+
+    @override_settings(PING_BODY_LIMIT=5)
+    def test_it_chops_long_body(self) -> None:
+        r = self.post({"pings": [{"uuid": str(self.check.code), "body": "abcdefgh"}]})
+        self.assertEqual(r.headers["Ping-Body-Limit"], "5")
+
+        ping = Ping.objects.get()
+        assert ping.body_raw
+        self.assertEqual(bytes(ping.body_raw), b"abcde")
+
+    def test_it_uses_constant_number_of_writes(self) -> None:
+        other = Check.objects.create(project=self.project, slug="other")
+        Check.objects.update(status="up", last_ping=now())
+        pings = [
+            {"uuid": str(self.check.code)},
+            {"uuid": str(other.code)},
+            {"ping_key": self.project.ping_key, "slug": "other"},
+        ]
+        # One lookup per distinct target, then, in a single transaction:
+        # savepoint, select for update, update checks, insert pings,
+        # release savepoint
+        with self.assertNumQueries(3 + 5):
+            self.post({"pings": pings})
+
+        # More pings for the same checks should not need more queries
+        with self.assertNumQueries(3 + 5):
+            self.post({"pings": pings * 10})
+
+        other.refresh_from_db()
+        self.assertEqual(other.n_pings, 2 + 2 * 10)
+
+    @override_settings(PING_CACHE_TTL=60)
+    def test_it_uses_pingcache(self) -> None:
+        caches["pings"].clear()
+        pings = [{"uuid": str(self.check.code)}, {"uuid": str(self.check.code)}]
+        self.post({"pings": pings})
+
+        # The lookup is now cached
+        with self.assertNumQueries(5):
+            self.post({"pings": pings})
+
+    @override_settings(S3_BUCKET="test-bucket")
+    @patch("hc.api.views.put_object")
+    @patch("hc.api.views.uploader")
+    def test_it_uploads_bodies_after_commit(
+        self, uploader: Mock, put_object: Mock
+    ) -> None:
+        uploader.submit.return_value = False
+        pings = [{"uuid": str(self.check.code), "body": "a" * 1000}]
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.post({"pings": pings})
+        put_object.assert_not_called()
+
+        for fn in callbacks:
+            fn()
+        put_object.assert_called_once_with(self.check.code, 1, b"a" * 1000)
+
+    def test_it_creates_flips(self) -> None:
+        pings = [
+            {"uuid": str(self.check.code), "action": "fail"},
+            {"uuid": str(self.check.code)},
+        ]
+        self.post({"pings": pings})
+
+        flips = Flip.objects.order_by("created")
+        self.assertEqual([f.new_status for f in flips], ["down", "up"])
+        self.check.refresh_from_db()
+        self.assertEqual(self.check.status, "up")
+        self.assertIsNotNone(self.check.alert_after)
+
+    def test_it_requires_post(self) -> None:
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 405)
+
+    def test_it_rejects_bad_json(self) -> None:
+        r = self.client.post(self.url, "{", content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+
+    def test_it_rejects_missing_pings_list(self) -> None:
+        r = self.post({"pings": "foo"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_it_limits_number_of_pings(self) -> None:
+        r = self.post({"pings": [{"uuid": str(self.check.code)}] * 1001})
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(Ping.objects.exists())
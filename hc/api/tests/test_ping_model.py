@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import zlib
 from datetime import datetime, timezone
 from datetime import timedelta as td
 from unittest.mock import Mock, patch
 from uuid import uuid4
 
+from django.test.utils import override_settings
+
 from hc.api.models import MAX_DURATION, Check, Ping, prepare_durations
+from hc.api.pingbody import SpooledBody
 from hc.test import BaseTestCase
 
 EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
@@ -35,6 +39,92 @@ class PingModelTestCase(BaseTestCase):
         with self.assertNumQueries(0):
             self.assertIsNone(p.duration)
 
+    @patch("hc.api.models.get_object")
+    @patch("hc.api.models.uploader")
+    def test_it_reads_pending_body_from_spool(
+        self, uploader: Mock, get_object: Mock
+    ) -> None:
+        uploader.get_pending.return_value = b"hello"
+        ping = Ping.objects.create(owner=self.check, n=1, object_size=5)
+
+        self.assertEqual(ping.get_body_bytes(), b"hello")
+        uploader.get_pending.assert_called_once_with(self.check.code, 1)
+        get_object.assert_not_called()
+
+    @override_settings(PING_BODY_COMPRESSION=True, S3_BUCKET=None)
+    def test_it_compresses_body(self) -> None:
+        body = b"hello world " * 10
+        self.check.ping("1.2.3.4", "http", "get", "", body, "success", None, None)
+
+        ping = Ping.objects.get()
+        self.assertEqual(ping.compression, "zlib")
+        assert ping.body_raw
+        self.assertLess(len(ping.body_raw), len(body))
+        self.assertEqual(ping.get_body_bytes(), body)
+        self.assertEqual(ping.uncompressed_size, len(body))
+        with patch("hc.api.models.decompress") as decompress:
+            self.assertEqual(ping.get_body_size(), len(body))
+            decompress.assert_not_called()
+
+    @override_settings(PING_BODY_COMPRESSION=True, S3_BUCKET=None)
+    def test_it_stores_incompressible_body_as_is(self) -> None:
+        self.check.ping("1.2.3.4", "http", "get", "", b"hi", "success", None, None)
+
+        ping = Ping.objects.get()
+        self.assertIsNone(ping.compression)
+        self.assertEqual(ping.body_raw, b"hi")
+
+    @override_settings(PING_BODY_COMPRESSION=True)
+    def test_it_reads_uncompressed_body(self) -> None:
+        ping = Ping.objects.create(owner=self.check, n=1, body_raw=b"hello")
+        self.assertEqual(ping.get_body_bytes(), b"hello")
+        self.assertEqual(ping.get_body_size(), 5)
+
+    def test_it_handles_corrupt_compressed_body(self) -> None:
+        ping = Ping.objects.create(
+            owner=self.check, n=1, body_raw=b"hello", compression="zlib"
+        )
+        with self.assertRaises(Ping.GetBodyError):
+            ping.get_body_bytes()
+
+    @override_settings(PING_BODY_COMPRESSION=True, S3_BUCKET="test-bucket")
+    @patch("hc.api.models.put_object")
+    @patch("hc.api.models.uploader")
+    def test_it_uploads_compressed_body(self, uploader: Mock, put_object: Mock) -> None:
+        uploader.submit.return_value = False
+        body = b"hello world " * 100
+        self.check.ping("1.2.3.4", "http", "get", "", body, "success", None, None)
+
+        ping = Ping.objects.get()
+        self.assertEqual(ping.compression, "zlib")
+        self.assertEqual(ping.object_size, len(body))
+        code, n, data = put_object.call_args.args
+        self.assertEqual(zlib.decompress(data), body)
+
+    @override_settings(PING_BODY_COMPRESSION=True, S3_BUCKET="test-bucket")
+    @patch("hc.api.models.put_object")
+    @patch("hc.api.models.uploader")
+    def test_it_closes_compressed_spooled_body(
+        self, uploader: Mock, put_object: Mock
+    ) -> None:
+        uploader.submit.return_value = False
+        with SpooledBody() as body:
+            body.write(b"hello world " * 100)
+            self.check.ping("1.2.3.4", "http", "get", "", body, "success", None, None)
+
+        code, n, data = put_object.call_args.args
+        self.assertTrue(data.closed)
+
+    @override_settings(PING_BODY_COMPRESSION=True)
+    @patch("hc.api.models.get_object")
+    def test_it_decompresses_object(self, get_object: Mock) -> None:
+        get_object.return_value = zlib.compress(b"hello world")
+        ping = Ping.objects.create(
+            owner=self.check, n=1, object_size=11, compression="zlib"
+        )
+        self.assertEqual(ping.get_body_bytes(), b"hello world")
+        self.assertEqual(ping.get_body_size(), 11)
+
 
 class PrepareDurationsTestCase(BaseTestCase):
     def test_it_works(self) -> None:
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from typing import IO
+from unittest.mock import Mock, patch
+from uuid import UUID
+
+from django.test.utils import override_settings
+
+from hc.api import pingbody
+from hc.api.models import Check, Ping
+from hc.api.pingbody import SpooledBody
+from hc.test import BaseTestCase
+
+
+class SpooledBodyTestCase(BaseTestCase):
+    def test_it_finds_keywords_across_chunks(self) -> None:
+        body = SpooledBody(["foo", "hello, world"])
+        body.write(b"xxhel")
+        body.write(b"lo")
+        body.write(b"xxwor")
+        body.write(b"ldxx")
+        self.assertEqual(len(body), 16)
+        self.assertIn("hello", body)
+        self.assertIn("world", body)
+        self.assertNotIn("foo", body)
+
+    def test_it_scans_file_for_unexpected_keywords(self) -> None:
+        body = SpooledBody()
+        body.write(b"xxhel")
+        body.write(b"loxx")
+        self.assertIn("hello", body)
+        self.assertNotIn("bye", body)
+
+    def test_it_matches_non_ascii_keywords(self) -> None:
+        body = SpooledBody(["héllo"])
+        body.write("xxhé".encode())
+        body.write("llo".encode())
+        self.assertIn("héllo", body)
+
+    def test_it_finds_confirm_across_chunks(self) -> None:
+        body = SpooledBody()
+        body.write(b"Please CONF")
+        self.assertFalse(body.has_confirmation_link)
+        body.write(b"IRM your subscription")
+        self.assertTrue(body.has_confirmation_link)
+
+    def test_it_spools_to_disk(self) -> None:
+        with SpooledBody() as body:
+            body.write(b"a" * (pingbody.SPOOL_MAX_SIZE + 1))
+            self.assertTrue(body.file._rolled)  # type: ignore[attr-defined]
+            self.assertEqual(len(body.read()), pingbody.SPOOL_MAX_SIZE + 1)
+
+
+@override_settings(S3_BUCKET="test-bucket", PING_BODY_LIMIT=None)
+class StreamingPingTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.check = Check.objects.create(project=self.project)
+        self.url = f"/ping/{self.check.code}"
+        self.uploads: list[tuple[UUID, int, bytes]] = []
+
+    def upload(self, code: UUID, n: int, f: IO[bytes]) -> None:
+        self.assertFalse(isinstance(f, bytes))
+        f.seek(0)
+        self.uploads.append((code, n, f.read()))
+
+    @patch("hc.api.models.put_object")
+    def test_it_streams_large_body(self, put_object: Mock) -> None:
+        put_object.side_effect = self.upload
+        body = b"a" * (pingbody.CHUNK_SIZE * 3 + 1) + b"please confirm"
+
+        r = self.client.post(self.url, body, content_type="text/plain")
+        self.assertEqual(r.status_code, 200)
+
+        ping = Ping.objects.get()
+        self.assertEqual(ping.object_size, len(body))
+        self.assertIsNone(ping.body_raw)
+        self.assertEqual(self.uploads, [(self.check.code, 1, body)])
+
+        self.check.refresh_from_db()
+        self.assertTrue(self.check.has_confirmation_link)
+
+    @override_settings(PING_BODY_LIMIT=pingbody.CHUNK_SIZE + 10)
+    @patch("hc.api.models.put_object")
+    def test_it_applies_body_limit(self, put_object: Mock) -> None:
+        put_object.side_effect = self.upload
+        body = b"a" * (pingbody.CHUNK_SIZE * 2)
+
+        r = self.client.post(self.url, body, content_type="text/plain")
+        self.assertEqual(r.status_code, 200)
+
+        ping = Ping.objects.get()
+        self.assertEqual(ping.object_size, pingbody.CHUNK_SIZE + 10)
+        self.assertEqual(len(self.uploads[0][2]), pingbody.CHUNK_SIZE + 10)
+
+    @patch("hc.api.models.put_object")
+    def test_it_filters_keywords_in_large_body(self, put_object: Mock) -> None:
+        self.check.filter_http_body = True
+        self.check.failure_kw = "ERROR"
+        self.check.save()
+
+        body = b"a" * pingbody.CHUNK_SIZE + b"ERROR: disk full"
+        r = self.client.post(self.url, body, content_type="text/plain")
+        self.assertEqual(r.status_code, 200)
+
+        self.check.refresh_from_db()
+        self.assertEqual(self.check.status, "down")
+
+    @patch("hc.api.models.put_object")
+    def test_it_keeps_small_body_in_database(self, put_object: Mock) -> None:
+        r = self.client.post(self.url, b"hello", content_type="text/plain")
+        self.assertEqual(r.status_code, 200)
+
+        ping = Ping.objects.get()
+        assert ping.body_raw
+        self.assertEqual(bytes(ping.body_raw), b"hello")
+        put_object.assert_not_called()
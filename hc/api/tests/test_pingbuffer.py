@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from datetime import timedelta as td
+from typing import Any
+from unittest.mock import Mock, patch
+from uuid import uuid4
+
+from django.test.utils import override_settings
+from django.utils.timezone import now
+
+from hc.api.models import Check, Flip, Ping
+from hc.api.pingbuffer import LostRace, PingBuffer, flush_check
+from hc.test import BaseTestCase
+
+
+@override_settings(S3_BUCKET=None)
+@patch.object(PingBuffer, "start", Mock())
+class PingBufferTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.check = Check.objects.create(project=self.project)
+        self.buffer = PingBuffer(max_size=3)
+
+    def submit(self, action: str = "success", body: bytes = b"", **kwargs: Any) -> bool:
+        return self.buffer.submit(
+            self.check, "1.2.3.4", "http", "post", "ua", body, action, **kwargs
+        )
+
+    def test_it_works(self) -> None:
+        self.assertTrue(self.submit(rid=None, body=b"hello"))
+        self.assertFalse(Ping.objects.exists())
+
+        self.assertEqual(self.buffer.flush(), 1)
+
+        self.check.refresh_from_db()
+        self.assertEqual(self.check.n_pings, 1)
+        self.assertEqual(self.check.status, "up")
+        assert self.check.last_ping
+        expected_aa = self.check.last_ping + td(days=1, hours=1)
+        self.assertEqual(self.check.alert_after, expected_aa)
+
+        ping = Ping.objects.get()
+        self.assertEqual(ping.n, 1)
+        self.assertEqual(ping.created, self.check.last_ping)
+        self.assertEqual(ping.remote_addr, "1.2.3.4")
+        assert ping.body_raw
+        self.assertEqual(bytes(ping.body_raw), b"hello")
+
+        flip = Flip.objects.get()
+        self.assertEqual(flip.old_status, "new")
+        self.assertEqual(flip.new_status, "up")
+        self.assertEqual(flip.created, ping.created)
+
+    def test_it_coalesces_pings_for_one_check(self) -> None:
+        rid = uuid4()
+        self.submit("start", rid=rid)
+        self.submit("fail", rid=rid)
+        self.submit("success", rid=None, body=b"please confirm")
+
+        with self.assertNumQueries(6):
+            # savepoint, select check, update check, insert flips,
+            # insert pings, release savepoint
+            self.buffer.flush()
+
+        self.check.refresh_from_db()
+        self.assertEqual(self.check.n_pings, 3)
+        self.assertEqual(self.check.status, "up")
+        self.assertTrue(self.check.has_confirmation_link)
+
+        kinds = list(Ping.objects.order_by("n").values_list("n", "kind"))
+        self.assertEqual(kinds, [(1, "start"), (2, "fail"), (3, None)])
+
+        start, fail, success = Ping.objects.order_by("n")
+        self.assertEqual(self.check.last_ping, success.created)
+
+        # It should create flips exactly where Check.ping() would create them
+        flips = Flip.objects.order_by("id")
+        self.assertEqual(
+            [(f.old_status, f.new_status) for f in flips],
+            [("new", "down"), ("down", "up")],
+        )
+        self.assertEqual(flips[0].created, fail.created)
+        self.assertEqual(flips[0].reason, "fail")
+        self.assertEqual(flips[1].created, success.created)
+
+    def test_it_ignores_pings_to_manually_paused_check(self) -> None:
+        self.check.status = "paused"
+        self.check.manual_resume = True
+        self.check.save()
+
+        self.submit(rid=None)
+        self.buffer.flush()
+
+        self.check.refresh_from_db()
+        self.assertEqual(self.check.status, "paused")
+        self.assertEqual(Ping.objects.get().kind, "ign")
+        self.assertFalse(Flip.objects.exists())
+
+    def test_it_rejects_pings_when_full(self) -> None:
+        for _ in range(3):
+            self.assertTrue(self.submit(rid=None))
+
+        self.assertFalse(self.submit(rid=None))
+        self.assertEqual(self.buffer.flush(), 3)
+
+    def test_it_handles_deleted_check(self) -> None:
+        self.submit(rid=None)
+        self.check.delete()
+
+        self.buffer.flush()
+        self.assertFalse(Ping.objects.exists())
+
+    def test_it_retries_lost_race(self) -> None:
+        self.submit(rid=None)
+        items = self.buffer.drain()
+
+        # Simulate a concurrent ping from a different process, which bumps
+        # n_pings right after the flusher has read the check
+        stale = Check.objects.get(id=self.check.id)
+        self.check.ping("1.2.3.4", "http", "get", "", b"", "success", None)
+        fresh = Check.objects.get(id=self.check.id)
+
+        with patch.object(Check.objects, "get", side_effect=[stale, fresh]):
+            flush_check(self.check.id, items)
+
+        self.check.refresh_from_db()
+        self.assertEqual(self.check.n_pings, 2)
+        ns = list(Ping.objects.order_by("n").values_list("n", flat=True))
+        self.assertEqual(ns, [1, 2])
+
+    @patch("hc.api.pingbuffer._apply")
+    def test_it_falls_back_to_check_ping(self, apply: Mock) -> None:
+        apply.side_effect = LostRace
+        self.submit(rid=None)
+        flush_check(self.check.id, self.buffer.drain())
+
+        self.assertEqual(apply.call_count, 3)
+        self.check.refresh_from_db()
+        self.assertEqual(self.check.n_pings, 1)
+        self.assertEqual(Ping.objects.count(), 1)
+
+    @patch("hc.api.models.Check.prune")
+    def test_it_marks_check_for_pruning_every_100_pings(self, prune: Mock) -> None:
+        self.check.n_pings = 99
+        self.check.last_ping = now()
+        self.check.status = "up"
+        self.check.save()
+
+        self.submit(rid=None)
+        self.submit(rid=None)
+        self.buffer.flush()
+
+        self.check.refresh_from_db()
+        self.assertEqual(self.check.n_pings, 101)
+        self.assertIsNotNone(self.check.prune_due)
+        # The pruner in sendalerts does the pruning, not the flusher
+        prune.assert_not_called()
+
+
+@override_settings(S3_BUCKET=None, PING_BUFFER_ENABLED=True)
+class PingViewBufferTestCase(BaseTestCase):
+    @patch("hc.api.views.pingbuffer.buffer")
+    def test_ping_view_uses_buffer(self, buffer: Mock) -> None:
+        check = Check.objects.create(project=self.project)
+        buffer.submit.return_value = True
+
+        r = self.client.get(f"/ping/{check.code}")
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(buffer.submit.called)
+        self.assertFalse(Ping.objects.exists())
+
+    @patch("hc.api.views.pingbuffer.buffer")
+    def test_ping_view_falls_back_when_buffer_is_full(self, buffer: Mock) -> None:
+        check = Check.objects.create(project=self.project)
+        buffer.submit.return_value = False
+
+        r = self.client.get(f"/ping/{check.code}")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(Ping.objects.count(), 1)
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.test.utils import override_settings
+
+from hc.api import pingcache
+from hc.api.models import Check, Ping
+from hc.test import BaseTestCase
+
+
+@override_settings(PING_CACHE_TTL=60, S3_BUCKET=None)
+class PingCacheTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        caches["pings"].clear()
+
+        self.project.ping_key = "abcdefghijklmnopqrstuv"
+        self.project.save()
+
+        self.check = Check.objects.create(project=self.project, slug="foo")
+
+    def test_it_caches_hits(self) -> None:
+        with self.assertNumQueries(1):
+            check = pingcache.get_by_code(self.check.code)
+        self.assertEqual(check.id, self.check.id)
+
+        with self.assertNumQueries(0):
+            check = pingcache.get_by_code(self.check.code)
+        self.assertEqual(check.id, self.check.id)
+        self.assertEqual(check.project_id, self.project.id)
+
+    def test_it_caches_misses(self) -> None:
+        code = uuid4()
+        with self.assertNumQueries(1):
+            with self.assertRaises(Check.DoesNotExist):
+                pingcache.get_by_code(code)
+
+        with self.assertNumQueries(0):
+            with self.assertRaises(Check.DoesNotExist):
+                pingcache.get_by_code(code)
+
+    def test_it_caches_slug_lookups(self) -> None:
+        ping_key = "abcdefghijklmnopqrstuv"
+        check = pingcache.get_by_slug(ping_key, "foo")
+        self.assertEqual(check.id, self.check.id)
+
+        with self.assertNumQueries(0):
+            check = pingcache.get_by_slug(ping_key, "foo")
+        self.assertEqual(check.id, self.check.id)
+
+    def test_it_does_not_cache_ambiguous_slugs(self) -> None:
+        Check.objects.create(project=self.project, slug="foo")
+        for i in range(0, 2):
+            with self.assertRaises(Check.MultipleObjectsReturned):
+                pingcache.get_by_slug("abcdefghijklmnopqrstuv", "foo")
+
+    def test_it_invalidates_on_save(self) -> None:
+        pingcache.get_by_code(self.check.code)
+
+        check = Check.objects.get(id=self.check.id)
+        check.filter_default_fail = True
+        check.save()
+
+        check = pingcache.get_by_code(self.check.code)
+        self.assertTrue(check.filter_default_fail)
+
+    def test_it_invalidates_old_slug(self) -> None:
+        pingcache.get_by_slug("abcdefghijklmnopqrstuv", "foo")
+
+        check = Check.objects.get(id=self.check.id)
+        check.slug = "bar"
+        check.save()
+
+        with self.assertRaises(Check.DoesNotExist):
+            pingcache.get_by_slug("abcdefghijklmnopqrstuv", "foo")
+
+    def test_it_invalidates_cached_miss_on_create(self) -> None:
+        with self.assertRaises(Check.DoesNotExist):
+            pingcache.get_by_slug("abcdefghijklmnopqrstuv", "bar")
+
+        Check.objects.create(project=self.project, slug="bar")
+        check = pingcache.get_by_slug("abcdefghijklmnopqrstuv", "bar")
+        self.assertEqual(check.slug, "bar")
+
+    def test_create_rechecks_cached_miss(self) -> None:
+        with self.assertRaises(Check.DoesNotExist):
+            pingcache.get_by_slug("abcdefghijklmnopqrstuv", "bar")
+
+        # Another process creates the check, its invalidation does not reach
+        # this process's cache
+        Check.objects.bulk_create([Check(project=self.project, slug="bar")])
+
+        r = self.client.get("/ping/abcdefghijklmnopqrstuv/bar?create=1")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(Check.objects.filter(slug="bar").count(), 1)
+
+    def test_pings_do_not_invalidate(self) -> None:
+        pingcache.get_by_code(self.check.code)
+        self.client.get(f"/ping/{self.check.code}")
+
+        key = pingcache._code_key(self.check.code)
+        self.assertIsNotNone(caches["pings"].get(key))
+
+    def test_it_invalidates_on_rename_and_delete(self) -> None:
+        pingcache.get_by_code(self.check.code)
+        self.check.rename_and_delete()
+
+        r = self.client.get(f"/ping/{self.check.code}")
+        self.assertEqual(r.status_code, 404)
+
+    def test_ping_handles_stale_entry(self) -> None:
+        pingcache.get_by_code(self.check.code)
+        # Delete the check behind the cache's back
+        Check.objects.filter(id=self.check.id).delete()
+
+        r = self.client.get(f"/ping/{self.check.code}")
+        self.assertEqual(r.status_code, 404)
+        self.assertFalse(Ping.objects.exists())
+
+    def test_it_invalidates_on_ping_key_revoke(self) -> None:
+        pingcache.get_by_slug("abcdefghijklmnopqrstuv", "foo")
+
+        self.client.login(username="alice@example.org", password="password")
+        url = f"/projects/{self.project.code}/settings/"
+        self.client.post(url, {"revoke_key": "ping_key"})
+
+        r = self.client.get("/ping/abcdefghijklmnopqrstuv/foo")
+        self.assertEqual(r.status_code, 404)
+
+    @override_settings(PING_CACHE_TTL=0)
+    def test_it_is_disabled_by_default(self) -> None:
+        pingcache.get_by_code(self.check.code)
+        with self.assertNumQueries(1):
+            pingcache.get_by_code(self.check.code)
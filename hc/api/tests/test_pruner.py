@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from datetime import timedelta as td
+from unittest.mock import Mock, patch
+
+from django.test.utils import override_settings
+from django.utils.timezone import now
+
+from hc.api import pruner
+from hc.api.models import Check, Ping
+from hc.test import BaseTestCase
+
+
+@override_settings(S3_BUCKET=None)
+class PrunerTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.check = Check.objects.create(project=self.project, n_pings=101)
+        self.check.prune_due = now()
+        self.check.save()
+
+        Ping.objects.create(owner=self.check, n=101)
+        Ping.objects.create(owner=self.check, n=1)
+
+    def test_it_prunes_marked_checks(self) -> None:
+        num_pruned = pruner.prune_batch(delay=0)
+        self.assertEqual(num_pruned, 1)
+
+        self.assertTrue(Ping.objects.filter(n=101).exists())
+        self.assertFalse(Ping.objects.filter(n=1).exists())
+
+        self.check.refresh_from_db()
+        self.assertIsNone(self.check.prune_due)
+
+    def test_it_skips_unmarked_checks(self) -> None:
+        Check.objects.filter(id=self.check.id).update(prune_due=None)
+
+        num_pruned = pruner.prune_batch(delay=0)
+        self.assertEqual(num_pruned, 0)
+        self.assertEqual(Ping.objects.count(), 2)
+
+    def test_it_prunes_oldest_marks_first(self) -> None:
+        other = Check.objects.create(project=self.project, n_pings=101)
+        other.prune_due = now() - td(hours=1)
+        other.save()
+
+        with patch("hc.api.pruner.Check.prune", autospec=True) as prune:
+            pruner.prune_batch(batch_size=1, delay=0)
+            (check,) = prune.call_args.args
+            self.assertEqual(check.id, other.id)
+
+        self.check.refresh_from_db()
+        self.assertIsNotNone(self.check.prune_due)
+
+    def test_it_skips_checks_claimed_by_another_process(self) -> None:
+        # Another process clears the mark after we have loaded the check
+        with patch("hc.api.pruner.claim", return_value=False):
+            num_pruned = pruner.prune_batch(delay=0)
+
+        self.assertEqual(num_pruned, 0)
+        self.assertEqual(Ping.objects.count(), 2)
+
+    def test_claim_clears_the_mark_once(self) -> None:
+        self.assertTrue(pruner.claim(self.check))
+        self.assertFalse(pruner.claim(self.check))
+
+    def test_it_stops(self) -> None:
+        num_pruned = pruner.prune_batch(delay=0, should_stop=lambda: True)
+        self.assertEqual(num_pruned, 0)
+        self.assertEqual(Ping.objects.count(), 2)
+
+    @patch("hc.api.pruner.time.sleep")
+    @patch("hc.api.pruner.prune_batch")
+    def test_run_loops_until_stopped(self, prune_batch: Mock, sleep: Mock) -> None:
+        stop = Mock(side_effect=[False, False, True, True])
+        prune_batch.return_value = 0
+
+        pruner.run(stop)
+        prune_batch.assert_called_once()
+
+    @patch("hc.api.pruner.time.sleep")
+    @patch("hc.api.pruner.logger")
+    @patch("hc.api.pruner.prune_batch")
+    def test_run_handles_exceptions(
+        self, prune_batch: Mock, logger: Mock, sleep: Mock
+    ) -> None:
+        stop = Mock(side_effect=[False, False, True, True])
+        prune_batch.side_effect = Exception("oops")
+
+        pruner.run(stop)
+        logger.exception.assert_called_once()
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from unittest.mock import Mock, patch
+
+from hc.api import schedules
+from hc.api.models import Check
+from hc.test import BaseTestCase
+
+LAST_PING = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+class SchedulesTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        schedules.cache_clear()
+
+    def test_it_handles_cron(self) -> None:
+        result = schedules.next_fire("cron", "0 10 * * *", "UTC", LAST_PING)
+        self.assertEqual(result, datetime(2000, 1, 1, 10, tzinfo=timezone.utc))
+
+    def test_it_handles_oncalendar(self) -> None:
+        result = schedules.next_fire("oncalendar", "10:00", "UTC", LAST_PING)
+        self.assertEqual(result, datetime(2000, 1, 1, 10, tzinfo=timezone.utc))
+
+    def test_it_returns_utc(self) -> None:
+        # Australia/Brisbane is UTC+10
+        result = schedules.next_fire(
+            "cron", "0 10 * * *", "Australia/Brisbane", LAST_PING
+        )
+        assert result
+        self.assertEqual(result, datetime(2000, 1, 2, tzinfo=timezone.utc))
+        self.assertEqual(result.tzinfo, timezone.utc)
+
+    def test_it_handles_stopiteration(self) -> None:
+        result = schedules.next_fire("oncalendar", "1999-01-01", "UTC", LAST_PING)
+        self.assertIsNone(result)
+
+    @patch("hc.api.schedules.CronSim")
+    def test_it_memoizes(self, mock_cronsim: Mock) -> None:
+        mock_cronsim.return_value = iter([LAST_PING])
+        for i in range(0, 3):
+            schedules.next_fire("cron", "* * * * *", "UTC", LAST_PING)
+
+        mock_cronsim.assert_called_once()
+        info = schedules.cache_info()
+        self.assertEqual(info.hits, 2)
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.size, 1)
+
+    def test_it_keys_by_tz_and_last_ping(self) -> None:
+        schedules.next_fire("cron", "0 10 * * *", "UTC", LAST_PING)
+        schedules.next_fire("cron", "0 10 * * *", "Europe/Riga", LAST_PING)
+        schedules.next_fire("cron", "0 10 * * *", "UTC", datetime.now(timezone.utc))
+
+        info = schedules.cache_info()
+        self.assertEqual(info.hits, 0)
+        self.assertEqual(info.misses, 3)
+
+    def test_check_uses_cache(self) -> None:
+        check = Check(kind="cron", schedule="0 0 * * *", status="up")
+        check.last_ping = LAST_PING
+        expected = datetime(2000, 1, 2, tzinfo=timezone.utc)
+        self.assertEqual(check.get_grace_start(), expected)
+        self.assertEqual(check.get_grace_start(), expected)
+
+        self.assertEqual(schedules.cache_info().hits, 1)
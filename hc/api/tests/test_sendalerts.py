@@ -1,12 +1,35 @@
 from __future__ import annotations
 
+from argparse import ArgumentTypeError
+from concurrent.futures import Future
+from datetime import datetime
 from datetime import timedelta as td
+from functools import partial
+from threading import Barrier, BoundedSemaphore, Event
 from unittest.mock import Mock, call, patch
 
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.utils.timezone import now
 
-from hc.api.management.commands.sendalerts import Command, notify
-from hc.api.models import Channel, Check, Flip
+from hc.api.management.commands.sendalerts import (
+    Autoscaler,
+    Command,
+    Delivery,
+    Digester,
+    KindPools,
+    Scheduler,
+    WorkerPool,
+    claim_flips,
+    claim_retries,
+    notify,
+    notify_digest,
+    notify_retry,
+    parse_kind_workers,
+)
+from hc.api.models import Channel, Check, Flip, Notification, NotificationRetry
+from hc.api.shards import Membership
 from hc.api.transports import TransportError
 from hc.test import BaseTestCase
 
@@ -29,6 +52,7 @@ class SendAlertsTestCase(BaseTestCase):
         check = Check(project=self.project, status="up")
         check.last_ping = now() - td(days=2)
         check.alert_after = check.last_ping + td(days=1, hours=1)
+        check.grace_start = check.last_ping + td(days=1)
         check.save()
 
         result = Command().handle_going_down()
@@ -43,10 +67,11 @@ class SendAlertsTestCase(BaseTestCase):
         self.assertEqual(flip.new_status, "down")
         self.assertEqual(flip.reason, "timeout")
 
-        # It should change stored status to "down", and clear out alert_after
+        # It should change stored status to "down", and clear out the deadlines
         check.refresh_from_db()
         self.assertEqual(check.status, "down")
         self.assertEqual(check.alert_after, None)
+        self.assertEqual(check.grace_start, None)
 
     @patch("hc.api.management.commands.sendalerts.statsd")
     @patch("hc.api.management.commands.sendalerts.notify")
@@ -62,7 +87,7 @@ class SendAlertsTestCase(BaseTestCase):
         flip.save()
 
         mock_notify.return_value = "all is well"
-        result = Command(stdout=Mock()).process_one_flip()
+        result = Command(stdout=Mock()).process_flips()
 
         # If it finds work, it should return True
         self.assertTrue(result)
@@ -97,6 +122,181 @@ class SendAlertsTestCase(BaseTestCase):
         # a flip should have not been created
         self.assertEqual(Flip.objects.count(), 0)
 
+    def _overdue_check(self) -> Check:
+        check = Check(project=self.project, status="up")
+        check.last_ping = now() - td(days=2)
+        check.alert_after = check.last_ping + td(days=1, hours=1)
+        check.save()
+        return check
+
+    def test_it_processes_checks_in_batches(self) -> None:
+        checks = [self._overdue_check() for _ in range(0, 3)]
+
+        cmd = Command()
+        cmd.batch_size = 2
+        self.assertTrue(cmd.handle_going_down())
+        self.assertEqual(Flip.objects.count(), 2)
+
+        self.assertTrue(cmd.handle_going_down())
+        self.assertFalse(cmd.handle_going_down())
+
+        flips = Flip.objects.order_by("owner_id")
+        self.assertEqual([f.owner_id for f in flips], [c.id for c in checks])
+        self.assertEqual(Check.objects.filter(status="down").count(), 3)
+
+    def test_it_bulk_updates_with_row_locks(self) -> None:
+        check = self._overdue_check()
+        not_due = Check(project=self.project, status="up")
+        not_due.last_ping = now() - td(hours=1)
+        not_due.alert_after = not_due.last_ping
+        not_due.save()
+
+        features = connection.features
+        with patch.object(features, "has_select_for_update_skip_locked", True):
+            with self.assertNumQueries(6):
+                # SAVEPOINT, SELECT, bulk UPDATE alert_after, UPDATE status,
+                # INSERT flips, RELEASE SAVEPOINT
+                self.assertTrue(Command().handle_going_down())
+
+        check.refresh_from_db()
+        self.assertEqual(check.status, "down")
+        self.assertIsNone(check.alert_after)
+        flip = Flip.objects.get()
+        self.assertEqual(flip.owner_id, check.id)
+        self.assertEqual(flip.old_status, "up")
+
+        not_due.refresh_from_db()
+        self.assertEqual(not_due.alert_after, not_due.last_ping + td(days=1, hours=1))
+
+    @patch("hc.api.management.commands.sendalerts.logger")
+    @patch("hc.api.models.Check.get_status", side_effect=ValueError("oops"))
+    def test_it_handles_get_status_exception(
+        self, get_status: Mock, logger: Mock
+    ) -> None:
+        check = self._overdue_check()
+
+        self.assertTrue(Command().handle_going_down())
+        logger.exception.assert_called_once()
+
+        # It should push alert_after an hour forward
+        check.refresh_from_db()
+        assert check.alert_after
+        self.assertGreater(check.alert_after, now() + td(minutes=59))
+        self.assertEqual(Flip.objects.count(), 0)
+
+    def test_it_skips_checks_another_process_got_first(self) -> None:
+        check = self._overdue_check()
+
+        def mark_down(self: Check) -> str:
+            # Another sendalerts process updates the status in the meantime
+            Check.objects.filter(id=check.id).update(status="down")
+            return "down"
+
+        with patch("hc.api.models.Check.get_status", mark_down):
+            self.assertTrue(Command().handle_going_down())
+
+        self.assertEqual(Flip.objects.count(), 0)
+
+    def _flip(self, check: Check) -> Flip:
+        return Flip.objects.create(
+            owner=check, created=now(), old_status="up", new_status="down"
+        )
+
+    def test_claim_flips_claims_a_batch(self) -> None:
+        check = Check.objects.create(project=self.project, status="down")
+        channel = Channel.objects.create(project=self.project, kind="email")
+        channel.checks.add(check)
+        flips = [self._flip(check) for _ in range(0, 3)]
+
+        with self.assertNumQueries(7):
+            # SAVEPOINT, SELECT starving ids, SELECT ids, UPDATE, RELEASE SAVEPOINT,
+            # SELECT flips with checks and projects, SELECT channels
+            claimed = claim_flips(2)
+
+        self.assertEqual([f.id for f in claimed], [flips[0].id, flips[1].id])
+        self.assertEqual(Flip.objects.filter(processed=None).get(), flips[2])
+
+        # The checks, projects and channels should be loaded already
+        with self.assertNumQueries(0):
+            self.assertEqual(claimed[0].owner.project, self.project)
+            self.assertEqual(claimed[1].select_channels(), [channel])
+
+    def test_claim_flips_handles_no_flips(self) -> None:
+        self.assertEqual(claim_flips(10), [])
+
+    def test_claim_flips_claims_down_flips_first(self) -> None:
+        check = Check.objects.create(project=self.project)
+        up = Flip.objects.create(
+            owner=check,
+            created=now() - td(minutes=1),
+            old_status="down",
+            new_status="up",
+        )
+        newer_down = self._flip(check)
+        older_down = Flip.objects.create(
+            owner=check,
+            created=now() - td(seconds=30),
+            old_status="up",
+            new_status="down",
+        )
+
+        claimed = claim_flips(2)
+        self.assertEqual(claimed, [older_down, newer_down])
+        self.assertEqual(claim_flips(2), [up])
+
+    def test_claim_flips_claims_starving_up_flips_first(self) -> None:
+        check = Check.objects.create(project=self.project)
+        down = self._flip(check)
+        up = Flip.objects.create(
+            owner=check,
+            created=now() - td(minutes=3),
+            old_status="down",
+            new_status="up",
+        )
+
+        self.assertEqual(claim_flips(2), [up, down])
+
+    @patch("hc.api.management.commands.sendalerts.notify")
+    def test_process_flips_claims_a_flip_per_free_seat(self, notify: Mock) -> None:
+        check = Check.objects.create(project=self.project, status="down")
+        for _ in range(0, 3):
+            self._flip(check)
+
+        cmd = Command(stdout=Mock())
+        cmd.executor = Mock()
+        cmd.seats = BoundedSemaphore(2)
+
+        self.assertTrue(cmd.process_flips())
+        self.assertEqual(cmd.executor.submit.call_count, 2)
+        self.assertEqual(Flip.objects.filter(processed=None).count(), 1)
+
+        # All workers are busy now
+        self.assertFalse(cmd.seats.acquire(blocking=False))
+
+    def test_it_holds_seats_until_pooled_delivery_completes(self) -> None:
+        cmd = Command(stdout=Mock())
+        cmd.seats = BoundedSemaphore(1)
+        cmd.seats.acquire()
+
+        delivery = Delivery("header", 1, now(), Mock())
+        future: Future[str | Delivery | None] = Future()
+        future.set_result(delivery)
+        cmd.on_notify_done(future)
+        # The notification is still in flight, the seat should stay taken
+        self.assertFalse(cmd.seats.acquire(blocking=False))
+
+        delivery.add_result(0, "  OK")
+        self.assertTrue(cmd.seats.acquire(blocking=False))
+
+    @patch("hc.api.management.commands.sendalerts.notify")
+    def test_process_flips_releases_unused_seats(self, notify: Mock) -> None:
+        cmd = Command(stdout=Mock())
+        cmd.seats = BoundedSemaphore(2)
+
+        self.assertFalse(cmd.process_flips())
+        self.assertTrue(cmd.seats.acquire(blocking=False))
+        self.assertTrue(cmd.seats.acquire(blocking=False))
+
     def test_it_sets_next_nag_date(self) -> None:
         self.profile.nag_period = td(hours=1)
         self.profile.save()
@@ -244,3 +444,513 @@ class SendAlertsTestCase(BaseTestCase):
         self.assertEqual(
             statsd.incr.mock_calls, [call("hc.notifications.webhook.fail")]
         )
+
+
+class SchedulerTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.check = Check(project=self.project, status="up")
+        self.check.last_ping = now() - td(days=1)
+        self.check.alert_after = now() + td(seconds=5)
+        self.check.save()
+
+    def test_it_loads_upcoming_deadlines(self) -> None:
+        # Not due within the sync horizon
+        far = Check(project=self.project, status="up")
+        far.alert_after = now() + td(hours=1)
+        far.save()
+        # Already down
+        Check.objects.create(project=self.project, status="down", alert_after=now())
+
+        scheduler = Scheduler(sync_interval=10)
+        scheduler.sync()
+        self.assertEqual(scheduler.heap, [(self.check.alert_after, self.check.id)])
+
+    def test_it_sleeps_until_next_deadline(self) -> None:
+        scheduler = Scheduler(sync_interval=10)
+        self.assertFalse(scheduler.pop_due())
+        self.assertAlmostEqual(scheduler.seconds_until_next(), 5, delta=1)
+
+    def test_it_sleeps_until_next_sync(self) -> None:
+        Check.objects.all().delete()
+
+        scheduler = Scheduler(sync_interval=10)
+        self.assertFalse(scheduler.pop_due())
+        self.assertAlmostEqual(scheduler.seconds_until_next(), 10, delta=1)
+
+    def test_it_pops_due_deadlines(self) -> None:
+        scheduler = Scheduler(sync_interval=10)
+        scheduler.sync()
+
+        with patch("hc.api.management.commands.sendalerts.now") as mock_now:
+            mock_now.return_value = now() + td(seconds=6)
+            self.assertTrue(scheduler.pop_due())
+            # The sync is not due yet, so it should not query the database
+            with self.assertNumQueries(0):
+                self.assertFalse(scheduler.pop_due())
+
+        self.assertEqual(scheduler.heap, [])
+
+    def test_it_resyncs(self) -> None:
+        scheduler = Scheduler(sync_interval=10)
+        scheduler.sync()
+
+        Check.objects.filter(id=self.check.id).update(alert_after=now())
+        with patch("hc.api.management.commands.sendalerts.now") as mock_now:
+            mock_now.return_value = now() + td(seconds=11)
+            self.assertTrue(scheduler.pop_due())
+
+    def test_handle_going_down_reschedules_checks(self) -> None:
+        self.check.alert_after = now() - td(seconds=1)
+        self.check.save()
+
+        cmd = Command()
+        cmd.scheduler = Scheduler(sync_interval=10)
+        cmd.handle_going_down()
+
+        self.check.refresh_from_db()
+        assert self.check.alert_after
+        self.assertEqual(cmd.scheduler.heap, [(self.check.alert_after, self.check.id)])
+
+
+class KindPoolsTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.check = Check.objects.create(project=self.project, status="down")
+        self.flip = Flip.objects.create(
+            owner=self.check, created=now(), old_status="up", new_status="down"
+        )
+        self.log = Mock()
+        self.pools = KindPools(2, {"webhook": 1}, self.log)
+
+    def test_it_uses_a_pool_per_kind(self) -> None:
+        release = Event()
+        results = Mock()
+
+        def hanging_webhook() -> str:
+            release.wait(5)
+            return "webhook OK"
+
+        self.pools.submit("webhook", hanging_webhook, results)
+        self.pools.submit("email", lambda: "email OK", results)
+
+        # The email notification should not wait for the webhook
+        self.pools.executors["email"].shutdown(wait=True)
+        results.assert_called_once_with("email OK")
+
+        release.set()
+        self.pools.shutdown()
+        self.assertEqual(results.call_count, 2)
+
+        self.assertEqual(self.pools.executors["webhook"].size, 1)
+        self.assertEqual(self.pools.executors["email"].size, 2)
+
+    @patch("hc.api.management.commands.sendalerts.close_old_connections")
+    def test_it_releases_db_connection_after_each_task(
+        self, close_old_connections: Mock
+    ) -> None:
+        self.pools.submit("email", lambda: "OK", Mock())
+        self.pools.submit("email", Mock(side_effect=ValueError("oops")), Mock())
+        self.pools.shutdown()
+
+        # Before and after each of the two tasks
+        self.assertEqual(close_old_connections.call_count, 4)
+
+    @patch("hc.api.management.commands.sendalerts.statsd")
+    def test_it_reports_queue_depth(self, statsd: Mock) -> None:
+        self.pools.submit("email", lambda: "OK", Mock())
+        self.pools.shutdown()
+
+        statsd.gauge.assert_has_calls(
+            [
+                call("hc.sendalerts.queueDepth.email", 1),
+                call("hc.sendalerts.queueDepth.email", 0),
+            ]
+        )
+
+    @patch("hc.api.management.commands.sendalerts.logger")
+    def test_it_handles_exceptions(self, logger: Mock) -> None:
+        results = Mock()
+        self.pools.submit("email", Mock(side_effect=ValueError("oops")), results)
+        self.pools.shutdown()
+
+        logger.error.assert_called_once()
+        results.assert_called_once_with("  (email) Exception: ValueError('oops')")
+        self.assertEqual(self.pools.pending["email"], 0)
+
+    @patch("hc.api.management.commands.sendalerts.notify_channel")
+    def test_notify_dispatches_to_pools(self, notify_channel: Mock) -> None:
+        notify_channel.return_value = "  OK"
+        channel = Channel.objects.create(project=self.project, kind="email")
+        channel.checks.add(self.check)
+
+        delivery = notify(self.flip, self.pools)
+        self.assertIsInstance(delivery, Delivery)
+        self.pools.shutdown()
+
+        notify_channel.assert_called_once_with(self.flip, channel)
+        self.log.assert_called_once_with(f"{self.check.code} goes down\n  OK")
+
+    @patch("hc.api.management.commands.sendalerts.notify_channel")
+    def test_notify_sends_concurrently(self, notify_channel: Mock) -> None:
+        # Both email notifications must be in flight at the same time
+        # for either of them to complete
+        barrier = Barrier(2, timeout=5)
+
+        def slow(flip: Flip, ch: Channel) -> str:
+            barrier.wait()
+            return f"  {ch.name} OK"
+
+        notify_channel.side_effect = slow
+        for i, duration in enumerate([td(seconds=9), td(seconds=1)]):
+            ch = Channel.objects.create(
+                project=self.project,
+                kind="email",
+                name=f"ch{i}",
+                last_notify_duration=duration,
+            )
+            ch.checks.add(self.check)
+
+        notify(self.flip, self.pools)
+        self.pools.shutdown()
+
+        # It should log the results together, in channel order
+        expected = f"{self.check.code} goes down\n  ch1 OK\n  ch0 OK"
+        self.log.assert_called_once_with(expected)
+
+    def test_delivery_logs_after_last_result(self) -> None:
+        delivery = Delivery("header", 2, now(), self.log)
+        delivery.add_result(1, "  second")
+        self.log.assert_not_called()
+
+        delivery.add_result(0, "  first")
+        self.log.assert_called_once_with("header\n  first\n  second")
+
+    def test_delivery_calls_done_callbacks(self) -> None:
+        delivery = Delivery("header", 1, now(), self.log)
+        done = Mock()
+        delivery.add_done_callback(done)
+        done.assert_not_called()
+
+        delivery.add_result(0, "  OK")
+        done.assert_called_once()
+
+        # Once delivered, it should call new callbacks right away
+        late = Mock()
+        delivery.add_done_callback(late)
+        late.assert_called_once()
+
+    def test_parse_kind_workers(self) -> None:
+        self.assertEqual(parse_kind_workers("webhook=3"), ("webhook", 3))
+
+        for value in ["webhook", "webhook=0", "webhook=x", "nosuchkind=3"]:
+            with self.assertRaises(ArgumentTypeError):
+                parse_kind_workers(value)
+
+
+class WorkerPoolTestCase(BaseTestCase):
+    def test_it_grows_and_shrinks(self) -> None:
+        pool = WorkerPool(1, "test")
+        self.assertEqual(pool.num_threads, 1)
+
+        pool.resize(3)
+        self.assertEqual(pool.num_threads, 3)
+        self.assertEqual(len([t for t in pool.threads if t.is_alive()]), 3)
+
+        pool.resize(1)
+        # Surplus threads should retire once they run out of work
+        with patch("hc.api.management.commands.sendalerts.IDLE_TIMEOUT", 0.01):
+            for t in pool.threads[1:]:
+                t.join(5)
+        self.assertEqual(pool.num_threads, 1)
+
+        pool.shutdown()
+        self.assertFalse(any(t.is_alive() for t in pool.threads))
+
+    def test_shutdown_finishes_queued_jobs(self) -> None:
+        pool = WorkerPool(2, "test")
+        results = Mock()
+        for i in range(0, 5):
+            pool.submit(partial(results, i))
+        pool.shutdown()
+
+        self.assertEqual(results.call_count, 5)
+
+
+@patch("hc.api.management.commands.sendalerts.statsd")
+class AutoscalerTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.log = Mock()
+        self.pools = KindPools(2, {"webhook": 1}, self.log)
+        self.autoscaler = Autoscaler(self.pools, 2, 10, self.log)
+
+    def tearDown(self) -> None:
+        self.pools.shutdown()
+        super().tearDown()
+
+    def test_target_size_grows(self, statsd: Mock) -> None:
+        # 2 threads, 20 pending, 1s each: the last one waits 10s.
+        # 4 threads bring the wait down to TARGET_WAIT (5s).
+        self.assertEqual(self.autoscaler.target_size(2, 20, 1.0, True), 4)
+        # It should grow by at least one thread
+        self.assertEqual(self.autoscaler.target_size(4, 21, 1.0, True), 5)
+        # It should not grow past max_size
+        self.assertEqual(self.autoscaler.target_size(4, 100, 2.0, True), 10)
+
+    def test_target_size_shrinks(self, statsd: Mock) -> None:
+        self.assertEqual(self.autoscaler.target_size(8, 1, 1.0, False), 4)
+        self.assertEqual(self.autoscaler.target_size(8, 3, 1.0, False), 4)
+        # It should not shrink below min_size
+        self.assertEqual(self.autoscaler.target_size(3, 0, 1.0, False), 2)
+        # It should not shrink while there is a backlog
+        self.assertEqual(self.autoscaler.target_size(8, 1, 1.0, True), 8)
+        # It should not shrink a pool that has work for most of its threads
+        self.assertEqual(self.autoscaler.target_size(8, 5, 1.0, False), 8)
+
+    def test_maybe_scale_resizes_pools(self, statsd: Mock) -> None:
+        self.pools.submit("email", lambda: "OK", Mock())
+        self.pools.submit("webhook", lambda: "OK", Mock())
+        self.pools.shutdown()
+        with self.pools.lock:
+            self.pools.pending["email"] = 30
+            self.pools.latency["email"] = 1.0
+            self.pools.pending["webhook"] = 30
+            self.pools.latency["webhook"] = 1.0
+
+        self.autoscaler.maybe_scale()
+        self.assertEqual(self.pools.executors["email"].size, 6)
+        # It should leave the pools sized with --kind-workers alone
+        self.assertEqual(self.pools.executors["webhook"].size, 1)
+
+        statsd.gauge.assert_any_call("hc.sendalerts.backlog", 0)
+        statsd.gauge.assert_any_call("hc.sendalerts.poolSize.email", 6)
+        self.log.assert_called_once()
+        self.assertIn("from 2 to 6 threads", self.log.call_args.args[0])
+
+        # It should not check again before AUTOSCALE_INTERVAL
+        with self.pools.lock:
+            self.pools.pending["email"] = 0
+        self.autoscaler.maybe_scale()
+        self.assertEqual(self.pools.executors["email"].size, 6)
+
+    def test_maybe_scale_shrinks_idle_pools(self, statsd: Mock) -> None:
+        self.pools.submit("email", lambda: "OK", Mock())
+        self.pools.executors["email"].resize(8)
+
+        self.autoscaler.maybe_scale()
+        self.assertEqual(self.pools.executors["email"].size, 4)
+
+    def test_maybe_scale_does_not_shrink_with_backlog(self, statsd: Mock) -> None:
+        check = Check.objects.create(project=self.project, status="down")
+        Flip.objects.create(owner=check, created=now(), new_status="down")
+        self.pools.submit("email", lambda: "OK", Mock())
+        self.pools.executors["email"].resize(8)
+
+        self.autoscaler.maybe_scale()
+        self.assertEqual(self.pools.executors["email"].size, 8)
+
+    def test_command_requires_max_workers_above_num_workers(self, statsd: Mock) -> None:
+        with self.assertRaises(CommandError):
+            call_command("sendalerts", "--num-workers=4", "--max-workers=2")
+
+
+class DigesterTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.check = Check.objects.create(project=self.project, status="down")
+        self.channel = Channel.objects.create(project=self.project, kind="slack")
+        self.channel.checks.add(self.check)
+        self.digester = Digester(60)
+
+    def flip(self) -> Flip:
+        return Flip.objects.create(
+            owner=self.check, created=now(), old_status="up", new_status="down"
+        )
+
+    def test_it_sends_first_flip_right_away(self) -> None:
+        self.assertFalse(self.digester.defer(self.flip(), self.channel))
+        self.assertIsNone(self.digester.seconds_until_next())
+
+    def test_it_collects_flips_within_window(self) -> None:
+        self.digester.defer(self.flip(), self.channel)
+        f1, f2 = self.flip(), self.flip()
+        self.assertTrue(self.digester.defer(f1, self.channel))
+        self.assertTrue(self.digester.defer(f2, self.channel))
+
+        # The window is still open
+        self.assertEqual(self.digester.pop_due(), [])
+        delay = self.digester.seconds_until_next()
+        assert delay is not None
+        self.assertAlmostEqual(delay, 60, delta=1)
+
+        with patch("hc.api.management.commands.sendalerts.now") as mock_now:
+            mock_now.return_value = now() + td(seconds=61)
+            self.assertEqual(self.digester.pop_due(), [(self.channel, [f1, f2])])
+            # A new window opens right after the digest
+            self.assertTrue(self.digester.defer(self.flip(), self.channel))
+
+    def test_it_closes_empty_windows(self) -> None:
+        self.digester.defer(self.flip(), self.channel)
+        with patch("hc.api.management.commands.sendalerts.now") as mock_now:
+            mock_now.return_value = now() + td(seconds=61)
+            self.assertEqual(self.digester.pop_due(), [])
+            self.assertEqual(self.digester.closes, {})
+            self.assertFalse(self.digester.defer(self.flip(), self.channel))
+
+    def test_it_flushes(self) -> None:
+        self.digester.defer(self.flip(), self.channel)
+        f1 = self.flip()
+        self.digester.defer(f1, self.channel)
+        self.assertEqual(self.digester.pop_due(flush=True), [(self.channel, [f1])])
+
+    def test_it_skips_transports_without_digests(self) -> None:
+        self.channel.kind = "webhook"
+        self.digester.defer(self.flip(), self.channel)
+        self.assertFalse(self.digester.defer(self.flip(), self.channel))
+
+    @patch("hc.api.management.commands.sendalerts.notify_channel")
+    def test_notify_defers_to_digest(self, notify_channel: Mock) -> None:
+        notify_channel.return_value = "  OK"
+        notify(self.flip(), digester=self.digester)
+
+        result = notify(self.flip(), digester=self.digester)
+        assert isinstance(result, str)
+        self.assertIn("(slack) Deferred to a digest", result)
+        notify_channel.assert_called_once()
+
+    @patch("hc.api.management.commands.sendalerts.statsd")
+    @patch("hc.api.models.Channel.notify_digest")
+    def test_notify_digest_works(self, channel_notify: Mock, statsd: Mock) -> None:
+        channel_notify.return_value = ""
+        flips = [self.flip(), self.flip()]
+
+        result = notify_digest(flips, self.channel)
+        self.assertIn("Digest of 2 flips to", result)
+        self.assertIn("(slack): OK", result)
+        channel_notify.assert_called_once_with(flips)
+        statsd.incr.assert_called_once_with("hc.notifications.slack.success")
+
+    @patch("hc.api.management.commands.sendalerts.notify_digest")
+    def test_command_sends_due_digests(self, notify_digest: Mock) -> None:
+        notify_digest.return_value = "Digest OK"
+        cmd = Command()
+        cmd.stdout = Mock()
+        cmd.pools = KindPools(1, {}, cmd.stdout.write)
+        cmd.digester = self.digester
+
+        self.digester.defer(self.flip(), self.channel)
+        f1 = self.flip()
+        self.digester.defer(f1, self.channel)
+        cmd.send_digests(flush=True)
+        cmd.pools.shutdown()
+
+        notify_digest.assert_called_once_with([f1], self.channel)
+        cmd.stdout.write.assert_called_once_with("Digest OK")
+
+
+class RetriesTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.check = Check.objects.create(project=self.project, status="down")
+        self.channel = Channel.objects.create(project=self.project, kind="webhook")
+        self.flip = Flip.objects.create(
+            owner=self.check, created=now(), old_status="up", new_status="down"
+        )
+
+    def retry(self, next_attempt: datetime) -> NotificationRetry:
+        n = Notification.objects.create(owner=self.check, channel=self.channel)
+        return NotificationRetry.objects.create(
+            notification=n, flip=self.flip, next_attempt=next_attempt
+        )
+
+    def test_claim_retries_claims_due_retries(self) -> None:
+        due = self.retry(now() - td(seconds=1))
+        self.retry(now() + td(minutes=1))
+
+        claimed = claim_retries(10)
+        self.assertEqual(claimed, [due])
+        # It should lease the claimed retry
+        self.assertGreater(claimed[0].next_attempt, now() + td(minutes=4))
+
+        # The retry is not due any more
+        self.assertEqual(claim_retries(10), [])
+
+    def test_claim_retries_respects_limit(self) -> None:
+        for i in range(0, 3):
+            self.retry(now() - td(seconds=i + 1))
+
+        self.assertEqual(len(claim_retries(2)), 2)
+        self.assertEqual(len(claim_retries(2)), 1)
+
+    @patch("hc.api.management.commands.sendalerts.statsd")
+    @patch("hc.api.models.NotificationRetry.attempt")
+    def test_notify_retry_works(self, attempt: Mock, statsd: Mock) -> None:
+        attempt.return_value = "Received status code 500"
+        retry = self.retry(now())
+
+        result = notify_retry(retry)
+        self.assertIn("Retry #2 to", result)
+        self.assertIn("(webhook): Error in", result)
+        statsd.incr.assert_called_once_with("hc.notifications.webhook.fail")
+
+    @patch("hc.api.management.commands.sendalerts.notify_retry")
+    def test_process_retries_uses_retry_pools(self, notify_retry: Mock) -> None:
+        notify_retry.return_value = "Retry OK"
+        retry = self.retry(now() - td(seconds=1))
+
+        cmd = Command()
+        cmd.stdout = Mock()
+        cmd.retry_pools = KindPools(1, {}, cmd.stdout.write, "retry")
+        cmd.process_retries()
+        cmd.retry_pools.shutdown()
+
+        notify_retry.assert_called_once_with(retry)
+        cmd.stdout.write.assert_called_once_with("Retry OK")
+        self.assertIn("webhook", cmd.retry_pools.executors)
+
+
+class ShardedSendAlertsTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.checks = [
+            Check.objects.create(
+                project=self.project,
+                status="up",
+                last_ping=now() - td(days=2),
+                alert_after=now() - td(minutes=1),
+            )
+            for _ in range(0, 4)
+        ]
+        self.membership = Membership(2, owner="test")
+        self.membership.shards = [0]
+        self.ours = [c for c in self.checks if c.id % 2 == 0]
+
+    def test_handle_going_down_uses_shards(self) -> None:
+        cmd = Command()
+        cmd.membership = self.membership
+        cmd.handle_going_down()
+
+        flipped = set(Flip.objects.values_list("owner_id", flat=True))
+        self.assertEqual(flipped, {c.id for c in self.ours})
+
+    def test_claim_flips_uses_shards(self) -> None:
+        for check in self.checks:
+            Flip.objects.create(
+                owner=check, created=now(), old_status="up", new_status="down"
+            )
+
+        flips = claim_flips(10, self.membership)
+        self.assertEqual({f.owner_id for f in flips}, {c.id for c in self.ours})
+        # The other shard's flips stay unprocessed
+        self.assertEqual(Flip.objects.filter(processed=None).count(), 2)
+
+    def test_claim_flips_handles_no_shards(self) -> None:
+        self.membership.shards = []
+        self.assertEqual(claim_flips(10, self.membership), [])
+
+    def test_scheduler_uses_shards(self) -> None:
+        scheduler = Scheduler(membership=self.membership)
+        scheduler.sync()
+        ids = {check_id for _, check_id in scheduler.heap}
+        self.assertEqual(ids, {c.id for c in self.ours})
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from datetime import timedelta as td
+from unittest.mock import patch
+
+from django.utils.timezone import now
+
+from hc.api.models import Check, ShardLease
+from hc.api.shards import LEASE_DURATION, RENEW_INTERVAL, Membership
+from hc.test import BaseTestCase
+
+
+class MembershipTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.a = Membership(4, owner="a")
+        self.a.create_leases()
+
+    def test_it_creates_leases(self) -> None:
+        self.assertEqual(ShardLease.objects.count(), 4)
+        self.assertFalse(ShardLease.objects.exclude(owner="").exists())
+
+        # Creating the leases again is a no-op
+        Membership(4, owner="b").create_leases()
+        self.assertEqual(ShardLease.objects.count(), 4)
+
+    def test_single_member_takes_all_shards(self) -> None:
+        self.assertTrue(self.a.renew())
+        self.assertEqual(self.a.shards, [0, 1, 2, 3])
+        self.assertEqual(ShardLease.objects.filter(owner="a").count(), 4)
+
+        # Nothing changes on the next renewal
+        self.assertFalse(self.a.renew())
+
+    def test_members_split_shards(self) -> None:
+        self.a.renew()
+
+        b = Membership(4, owner="b")
+        # All shards are taken, b takes one over from a
+        b.renew()
+        self.assertEqual(b.shards, [3])
+
+        # a learns about b, and releases its surplus shard
+        self.a.renew()
+        self.assertEqual(self.a.shards, [0, 1])
+
+        b.renew()
+        self.assertEqual(b.shards, [2, 3])
+
+    def test_it_takes_over_expired_leases(self) -> None:
+        self.a.renew()
+        b = Membership(4, owner="b")
+        b.renew()
+        self.a.renew()
+        b.renew()
+
+        # a dies, and its leases expire
+        with patch("hc.api.shards.now") as mock_now:
+            mock_now.return_value = now() + LEASE_DURATION + td(seconds=1)
+            b.renew()
+
+        self.assertEqual(b.shards, [0, 1, 2, 3])
+
+    def test_release_frees_shards(self) -> None:
+        self.a.renew()
+        self.a.release()
+        self.assertEqual(self.a.shards, [])
+
+        b = Membership(4, owner="b")
+        b.renew()
+        self.assertEqual(b.shards, [0, 1, 2, 3])
+
+    def test_it_ignores_extra_leases(self) -> None:
+        ShardLease.objects.create(shard=7, owner="", expires=now())
+        self.a.renew()
+        self.assertEqual(self.a.shards, [0, 1, 2, 3])
+
+    def test_maybe_renew(self) -> None:
+        self.assertTrue(self.a.maybe_renew())
+        self.assertFalse(self.a.maybe_renew())
+        self.assertLessEqual(self.a.seconds_until_renew(), 10)
+
+        with patch("hc.api.shards.now") as mock_now:
+            mock_now.return_value = now() + RENEW_INTERVAL
+            with patch.object(self.a, "renew") as renew:
+                self.a.maybe_renew()
+                renew.assert_called_once()
+
+    def test_filter(self) -> None:
+        checks = [Check.objects.create(project=self.project) for _ in range(0, 8)]
+        self.a.shards = [1]
+
+        q = self.a.filter(Check.objects.all(), "id")
+        expected = {c.id for c in checks if c.id % 4 == 1}
+        self.assertEqual({c.id for c in q}, expected)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from datetime import timedelta as td
+
+import time_machine
+from django.utils.timezone import now
+
+from hc.api.models import Check
+from hc.api.statuses import (
+    bulk_statuses,
+    down_q,
+    evaluate_many,
+    grace_q,
+    status_expression,
+)
+from hc.test import BaseTestCase
+
+CURRENT_TIME = datetime(2020, 1, 15, tzinfo=timezone.utc)
+
+
+@time_machine.travel(CURRENT_TIME)
+class StatusesTestCase(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        day_ago = CURRENT_TIME - td(days=1)
+
+        def create(name: str, **kwargs: object) -> Check:
+            return Check.objects.create(project=self.project, name=name, **kwargs)
+
+        self.checks = [
+            create("new"),
+            create("paused", status="paused"),
+            create("up", status="up", last_ping=CURRENT_TIME),
+            create("grace", status="up", last_ping=day_ago - td(minutes=30)),
+            create("late", status="up", last_ping=day_ago - td(hours=2)),
+            create("down", status="down", last_ping=day_ago),
+            create("started", status="up", last_ping=day_ago, last_start=CURRENT_TIME),
+            create(
+                "stuck",
+                status="up",
+                last_ping=CURRENT_TIME,
+                last_start=CURRENT_TIME - td(hours=2),
+            ),
+            create(
+                "cron",
+                kind="cron",
+                schedule="0 * * * *",
+                status="up",
+                last_ping=CURRENT_TIME - td(minutes=30),
+            ),
+            create(
+                "oncalendar",
+                kind="oncalendar",
+                schedule="1999-01-01",
+                status="up",
+                last_ping=day_ago,
+            ),
+        ]
+
+    def test_it_evaluates_statuses(self) -> None:
+        result = {c.name: c.get_status() for c in self.checks}
+        self.assertEqual(result["grace"], "grace")
+        self.assertEqual(result["late"], "down")
+        self.assertEqual(result["stuck"], "down")
+        self.assertEqual(result["cron"], "grace")
+        self.assertEqual(result["oncalendar"], "up")
+
+    def test_it_handles_with_started(self) -> None:
+        check = self.checks[6]
+        self.assertEqual(check.get_status(with_started=True), "started")
+        self.assertEqual(check.get_status(), "grace")
+
+    def test_sql_filters_match_get_status(self) -> None:
+        for check in self.checks:
+            check.update_deadlines()
+            check.save()
+
+        expected = {c.name: c.get_status() for c in self.checks}
+        with self.assertNumQueries(1):
+            q = Check.objects.annotate(current_status=status_expression(now()))
+            result = dict(q.values_list("name", "current_status"))
+        self.assertEqual(result, expected)
+
+        down = Check.objects.filter(down_q(now()))
+        self.assertEqual({c.name for c in down}, {"late", "down", "stuck"})
+
+        grace = Check.objects.filter(grace_q(now()))
+        self.assertEqual({c.name for c in grace}, {"grace", "started", "cron"})
+
+    def test_bulk_statuses_match_get_status(self) -> None:
+        for check in self.checks:
+            check.update_deadlines()
+            check.save()
+
+        with self.assertNumQueries(1):
+            result = bulk_statuses(Check.objects.all())
+
+        expected = {c.code: c.get_status() for c in self.checks}
+        self.assertEqual(result, expected)
+
+    def test_evaluate_many_handles_with_started(self) -> None:
+        for check in self.checks:
+            check.update_deadlines()
+            check.save()
+
+        rows = evaluate_many(Check.objects.all(), "name", with_started=True)
+        result = {name: status for status, (name,) in rows}
+
+        expected = {c.name: c.get_status(with_started=True) for c in self.checks}
+        self.assertEqual(result, expected)
+        self.assertEqual(result["started"], "started")
+
+    def test_evaluate_many_returns_extra_fields(self) -> None:
+        q = Check.objects.filter(name="down")
+        rows = list(evaluate_many(q, "name", "project_id"))
+        self.assertEqual(rows, [("down", ("down", self.project.id))])
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import os
+import socket
+import tempfile
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from hc.api import wakeup
+from hc.api.models import Check
+from hc.test import BaseTestCase
+
+
+class WakeupTestCase(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = str(Path(tmp.name) / "sendalerts.sock")
+
+    def test_it_does_nothing_by_default(self) -> None:
+        listener = wakeup.Listener()
+        listener.start()
+        self.assertFalse(listener.active)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            wakeup.notify()
+        self.assertEqual(callbacks, [])
+
+    def test_it_wakes_up_listener(self) -> None:
+        with override_settings(SENDALERTS_WAKEUP_SOCKET=self.path):
+            listener = wakeup.Listener()
+            listener.start()
+            self.addCleanup(listener.close)
+            self.assertTrue(listener.active)
+
+            # The datagram should only be sent after the transaction commits
+            with self.captureOnCommitCallbacks(execute=True):
+                wakeup.notify()
+                wakeup.notify()
+                self.assertFalse(listener.wait(0))
+
+            self.assertTrue(listener.wait(1))
+            # Two notify() calls, one wakeup
+            self.assertFalse(listener.wait(0))
+
+    def test_notify_handles_missing_listener(self) -> None:
+        with override_settings(SENDALERTS_WAKEUP_SOCKET=self.path):
+            with self.captureOnCommitCallbacks(execute=True):
+                wakeup.notify()
+
+    def test_close_removes_socket_file(self) -> None:
+        with override_settings(SENDALERTS_WAKEUP_SOCKET=self.path):
+            listener = wakeup.Listener()
+            listener.start()
+            own_path = Path(f"{self.path}.{os.getpid()}")
+            self.assertEqual(listener.path, own_path)
+            self.assertTrue(own_path.exists())
+            listener.close()
+            self.assertFalse(own_path.exists())
+
+    def test_start_removes_stale_socket_files(self) -> None:
+        stale_path = f"{self.path}.12345"
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
+            s.bind(stale_path)
+
+        with override_settings(SENDALERTS_WAKEUP_SOCKET=self.path):
+            listener = wakeup.Listener()
+            listener.start()
+            self.addCleanup(listener.close)
+            self.assertTrue(listener.active)
+            self.assertFalse(Path(stale_path).exists())
+
+    def test_it_wakes_up_all_listeners(self) -> None:
+        with override_settings(SENDALERTS_WAKEUP_SOCKET=self.path):
+            listeners = []
+            for pid in (101, 102):
+                with patch("hc.api.wakeup.os.getpid", Mock(return_value=pid)):
+                    listener = wakeup.Listener()
+                    listener.start()
+                    self.addCleanup(listener.close)
+                    listeners.append(listener)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                wakeup.notify()
+
+            for listener in listeners:
+                self.assertTrue(listener.wait(1))
+
+    def test_it_leaves_other_processes_sockets_alone(self) -> None:
+        with override_settings(SENDALERTS_WAKEUP_SOCKET=self.path):
+            with patch("hc.api.wakeup.os.getpid", Mock(return_value=101)):
+                other = wakeup.Listener()
+                other.start()
+                self.addCleanup(other.close)
+
+            listener = wakeup.Listener()
+            listener.start()
+            listener.close()
+
+            # The other listener's socket survives our start() and close()
+            self.assertTrue(Path(f"{self.path}.101").exists())
+            with self.captureOnCommitCallbacks(execute=True):
+                wakeup.notify()
+            self.assertTrue(other.wait(1))
+
+    def test_it_falls_back_to_polling_if_path_is_taken(self) -> None:
+        with override_settings(SENDALERTS_WAKEUP_SOCKET=self.path):
+            with patch("hc.api.wakeup.os.getpid", Mock(return_value=101)):
+                other = wakeup.Listener()
+                other.start()
+                self.addCleanup(other.close)
+
+                with patch("hc.api.wakeup.logger") as logger:
+                    listener = wakeup.Listener()
+                    listener.start()
+
+            self.assertFalse(listener.active)
+            logger.exception.assert_called_once()
+            self.assertTrue(Path(f"{self.path}.101").exists())
+
+    @patch("hc.api.wakeup.connection")
+    def test_it_uses_notify_on_postgres(self, connection: Mock) -> None:
+        connection.vendor = "postgresql"
+        wakeup.notify()
+
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.execute.assert_called_once_with("NOTIFY hc_flips")
+
+    @patch("hc.api.wakeup.connection")
+    def test_listener_uses_listen_on_postgres(self, connection: Mock) -> None:
+        connection.vendor = "postgresql"
+        connection.get_connection_params.return_value = {"dbname": "hc"}
+
+        with patch("psycopg.connect") as connect:
+            conn = connect.return_value
+            conn.notifies.return_value = iter([Mock()])
+
+            listener = wakeup.Listener()
+            listener.start()
+            connect.assert_called_once_with(dbname="hc", autocommit=True)
+            conn.execute.assert_called_once_with("LISTEN hc_flips")
+
+            self.assertTrue(listener.wait(5))
+            conn.notifies.assert_called_once_with(timeout=5, stop_after=1)
+
+
+class FlipWakeupTestCase(BaseTestCase):
+    @override_settings(S3_BUCKET=None)
+    @patch("hc.api.models.wakeup")
+    def test_ping_wakes_up_sendalerts_on_flip(self, wakeup: Mock) -> None:
+        check = Check.objects.create(project=self.project, status="up")
+
+        check.ping("1.2.3.4", "http", "get", "", b"", "success", None)
+        wakeup.notify.assert_not_called()
+
+        check.ping("1.2.3.4", "http", "get", "", b"", "fail", None)
+        wakeup.notify.assert_called_once()
+
+    @patch("hc.api.models.wakeup")
+    def test_create_flip_wakes_up_sendalerts(self, wakeup: Mock) -> None:
+        check = Check.objects.create(project=self.project, status="up")
+
+        check.create_flip("paused", mark_as_processed=True)
+        wakeup.notify.assert_not_called()
+
+        check.create_flip("down")
+        wakeup.notify.assert_called_once()
@@ -2,7 +2,11 @@ from __future__ import annotations
 
 import logging
 import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import TYPE_CHECKING, Any, NoReturn
+from urllib.parse import urlsplit
 
 from django.template.loader import render_to_string
 
@@ -15,6 +19,92 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# The maximum number of flips to list in a digest notification
+DIGEST_MAX_FLIPS = 20
+# The prefix of the error message of requests failed fast by a circuit breaker
+BREAKER_ERROR = "Circuit breaker open"
+# Whether HttpTransport.request should leave retries to the caller,
+# see deferred_retries()
+RETRIES_DEFERRED: ContextVar[bool] = ContextVar("retries_deferred", default=False)
+# The channel HttpTransport is sending a notification for, see breaker_scope()
+BREAKER_CHANNEL: ContextVar[str] = ContextVar("breaker_channel", default="")
+# Whether HttpTransport should bypass the circuit breakers, see breaker_scope()
+BREAKER_BYPASS: ContextVar[bool] = ContextVar("breaker_bypass", default=False)
+# Multi-tenant webhook hosts (and their subdomains). A failing endpoint on these
+# hosts is usually one user's misconfigured workflow, and not an outage of the
+# whole host, so their circuit breakers are per channel.
+SHARED_HOSTS = (
+    "zapier.com",
+    "ifttt.com",
+    "make.com",
+    "integromat.com",
+    "logic.azure.com",
+)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+@contextmanager
+def deferred_retries(enabled: bool = True) -> Iterator[None]:
+    """Make HTTP requests within this block make a single attempt.
+
+    Instead of retrying a failed request right away, HttpTransport.request
+    marks the TransportError as retryable, and the caller can schedule
+    a retry for later (see Channel.notify).
+    """
+
+    token = RETRIES_DEFERRED.set(enabled)
+    try:
+        yield
+    finally:
+        RETRIES_DEFERRED.reset(token)
+
+
+@contextmanager
+def breaker_scope(channel_code: str, is_test: bool = False) -> Iterator[None]:
+    """Tell HttpTransport which channel the requests within this block are for.
+
+    Circuit breakers for SHARED_HOSTS are kept per channel. Requests for test
+    notifications bypass the circuit breakers: they neither fail fast nor
+    count as failures.
+    """
+
+    channel_token = BREAKER_CHANNEL.set(channel_code)
+    bypass_token = BREAKER_BYPASS.set(is_test)
+    try:
+        yield
+    finally:
+        BREAKER_CHANNEL.reset(channel_token)
+        BREAKER_BYPASS.reset(bypass_token)
+
+
+def breaker_key(url: str) -> str | None:
+    """Return the circuit breaker key for a request to `url`.
+
+    The key is the scheme, host and port of the destination. For SHARED_HOSTS
+    it also includes the channel code. Return None if the request should
+    bypass the circuit breakers.
+    """
+
+    if BREAKER_BYPASS.get():
+        return None
+
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    try:
+        port = parts.port or DEFAULT_PORTS.get(parts.scheme)
+    except ValueError:
+        # Invalid port, the request will fail without reaching any host
+        return None
+
+    key = f"{parts.scheme}://{host}:{port}"
+    if any(host == d or host.endswith(f".{d}") for d in SHARED_HOSTS):
+        channel_code = BREAKER_CHANNEL.get()
+        if not channel_code:
+            return None
+        key += f" {channel_code}"
+
+    return key
+
 
 def get_ping_body_bytes(ping: Ping | None) -> bytes | None:
     """Return ping body as bytes for a given Ping object.
@@ -57,6 +147,8 @@ class TransportError(Exception):
     def __init__(self, message: str, permanent: bool = False) -> None:
         self.message = message
         self.permanent = permanent
+        # Set by HttpTransport.request when it left the retries to the caller
+        self.retryable = False
 
 
 class Transport:
@@ -73,6 +165,23 @@ class Transport:
 
         raise NotImplementedError()
 
+    def notify_digest(
+        self, flips: list[Flip], notifications: list[Notification]
+    ) -> None:
+        """Send a single notification about several flips.
+
+        sendalerts calls this method in the outage digest mode, to coalesce
+        flips that arrive in quick succession. Transports that support
+        digests override it. Like notify(), this method raises TransportError
+        on error, and returns None on success.
+
+        """
+
+        raise NotImplementedError()
+
+    def supports_digest(self) -> bool:
+        return type(self).notify_digest is not Transport.notify_digest
+
     def is_noop(self, status: str) -> bool:
         """Return True if transport will ignore check's current status.
 
@@ -147,6 +256,18 @@ class HttpTransport(Transport):
         headers: curl.Headers,
         auth: curl.Auth,
     ) -> None:
+        from hc.api.models import CircuitBreaker
+
+        # Fail fast if the destination keeps failing, see CircuitBreaker
+        key = breaker_key(url)
+        breaker = None
+        try:
+            if key:
+                breaker = CircuitBreaker.guard(key)
+        except CircuitBreaker.Open:
+            host = urlsplit(url).hostname
+            raise TransportError(f"{BREAKER_ERROR} for {host}, request not sent")
+
         try:
             r = curl.request(
                 method,
@@ -158,11 +279,21 @@ class HttpTransport(Transport):
                 auth=auth,
                 timeout=30,
             )
-            if r.status_code not in (200, 201, 202, 204):
-                cls.raise_for_response(r)
         except curl.CurlError as e:
+            if key:
+                CircuitBreaker.record_failure(key)
             raise TransportError(e.message)
 
+        # Server errors count as failures of the destination. Other responses
+        # show it is up, even if it rejected this particular request.
+        if key and r.status_code in range(500, 600):
+            CircuitBreaker.record_failure(key)
+        else:
+            CircuitBreaker.record_success(breaker)
+
+        if r.status_code not in (200, 201, 202, 204):
+            cls.raise_for_response(r)
+
     @classmethod
     def request(
         cls,
@@ -190,6 +321,11 @@ class HttpTransport(Transport):
                 )
             except TransportError as e:
                 tries_left = 0 if e.permanent else tries_left - 1
+                if tries_left and RETRIES_DEFERRED.get():
+                    # The caller will retry later, with a backoff
+                    e.retryable = True
+                    raise
+
                 # If we have no tries left then abort the retry loop by re-raising
                 # the exception:
                 if tries_left == 0:
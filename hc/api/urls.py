@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+from typing import Any
 from urllib.parse import quote, unquote
 
-from django.urls import include, path, register_converter
+from django.urls import URLPattern, URLResolver, include, path, register_converter
 
 from hc.api import views
 
@@ -30,20 +32,34 @@ class SHA1Converter:
 register_converter(QuoteConverter, "quoted")
 register_converter(SHA1Converter, "sha1")
 
-uuid_urls = [
-    path("", views.ping),
-    path("fail", views.ping, {"action": "fail"}),
-    path("start", views.ping, {"action": "start"}),
-    path("log", views.ping, {"action": "log"}),
-    path("<int:exitstatus>", views.ping),
-]
 
-slug_urls = [
-    path("fail", views.ping_by_slug, {"action": "fail"}),
-    path("start", views.ping_by_slug, {"action": "start"}),
-    path("log", views.ping_by_slug, {"action": "log"}),
-    path("<int:exitstatus>", views.ping_by_slug),
-]
+def ping_urls(
+    ping: Callable[..., Any], ping_by_slug: Callable[..., Any]
+) -> list[URLPattern | URLResolver]:
+    """Return URL patterns for the ping endpoints, served by the given views."""
+
+    uuid_urls = [
+        path("", ping),
+        path("fail", ping, {"action": "fail"}),
+        path("start", ping, {"action": "start"}),
+        path("log", ping, {"action": "log"}),
+        path("<int:exitstatus>", ping),
+    ]
+
+    slug_urls = [
+        path("fail", ping_by_slug, {"action": "fail"}),
+        path("start", ping_by_slug, {"action": "start"}),
+        path("log", ping_by_slug, {"action": "log"}),
+        path("<int:exitstatus>", ping_by_slug),
+    ]
+
+    return [
+        path("ping/<uuid:code>", ping),
+        path("ping/<uuid:code>/", include(uuid_urls)),
+        path("ping/<slug:ping_key>/<slug:slug>", ping_by_slug),
+        path("ping/<slug:ping_key>/<slug:slug>/", include(slug_urls)),
+    ]
+
 
 api_urls = [
     path("checks/", views.checks),
@@ -72,10 +88,8 @@ api_urls = [
 ]
 
 urlpatterns = [
-    path("ping/<uuid:code>", views.ping),
-    path("ping/<uuid:code>/", include(uuid_urls)),
-    path("ping/<slug:ping_key>/<slug:slug>", views.ping_by_slug),
-    path("ping/<slug:ping_key>/<slug:slug>/", include(slug_urls)),
+    path("ping/bulk", views.ping_bulk, name="hc-ping-bulk"),
+    *ping_urls(views.ping, views.ping_by_slug),
     path("api/v1/", include(api_urls)),
     path("api/v2/", include(api_urls)),
     path("api/v3/", include(api_urls)),
@@ -96,3 +110,6 @@ urlpatterns = [
         name="hc-badge-check",
     ),
 ]
+
+# The ping endpoints with async views, for the ASGI entry point (see hc/asgi.py)
+async_ping_urlpatterns = ping_urls(views.ping_async, views.ping_by_slug_async)
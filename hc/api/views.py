@@ -1,19 +1,23 @@
 from __future__ import annotations
 
 import email.policy
+import json
 import time
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from datetime import timedelta as td
 from email import message_from_bytes
+from functools import partial
 from ipaddress import ip_address
 from typing import Any, Literal
 from uuid import UUID
 
+from asgiref.sync import sync_to_async
 from cronsim import CronSim, CronSimError
 from django.conf import settings
 from django.core.signing import BadSignature
-from django.db import connection, transaction
+from django.db import close_old_connections, connection, transaction
 from django.db.models import Prefetch
 from django.db.models.functions import Length
 from django.http import (
@@ -36,13 +40,26 @@ from pydantic import BaseModel, Field, ValidationError, field_validator, model_v
 from pydantic_core import PydanticCustomError
 
 from hc.accounts.models import Profile, Project
+from hc.api import pingbody, pingbuffer, pingcache, schedules, wakeup
 from hc.api.decorators import ApiRequest, authorize, authorize_read, cors
 from hc.api.forms import FlipsFiltersForm
-from hc.api.models import Channel, Check, Flip, Notification, Ping, prepare_durations
+from hc.api.models import (
+    PING_UPDATE_FIELDS,
+    Channel,
+    Check,
+    Flip,
+    Notification,
+    Ping,
+    prepare_durations,
+)
+from hc.api.pingbody import SpooledBody
+from hc.api.statuses import status_expression
 from hc.lib.badges import check_signature, get_badge_svg, get_badge_url
+from hc.lib.s3 import put_object
 from hc.lib.signing import unsign_bounce_id
-from hc.lib.string import is_valid_uuid_string, match_keywords
+from hc.lib.string import is_valid_uuid_string, keyword_matcher, split_tags
 from hc.lib.tz import all_timezones, legacy_timezones
+from hc.lib.uploader import uploader
 
 
 class BadChannelException(Exception):
@@ -176,26 +193,9 @@ def valid_ip(ip: str) -> bool:
         return False
 
 
-@csrf_exempt
-@never_cache
-def ping(
-    request: HttpRequest,
-    code: UUID,
-    check: Check | None = None,
-    action: str = "success",
-    exitstatus: int | None = None,
-) -> HttpResponse:
-    if check is None:
-        try:
-            check = Check.objects.get(code=code)
-        except Check.DoesNotExist:
-            return HttpResponseNotFound("not found")
-
-    if exitstatus is not None and exitstatus > 255:
-        return HttpResponseBadRequest("invalid url format")
-
+def _remote_addr(request: HttpRequest) -> str:
     headers = request.META
-    remote_addr = headers.get("HTTP_X_FORWARDED_FOR", headers["REMOTE_ADDR"])
+    remote_addr = str(headers.get("HTTP_X_FORWARDED_FOR", headers["REMOTE_ADDR"]))
     remote_addr = remote_addr.split(",")[0]
 
     # If remote_addr does not validate but appears to be in ipv4:port form
@@ -205,10 +205,17 @@ def ping(
         if len(parts) == 4 and ":" in parts[-1]:
             remote_addr = remote_addr.split(":")[0]
 
-    scheme = headers.get("HTTP_X_FORWARDED_PROTO", "http")
-    method = headers["REQUEST_METHOD"]
-    ua = headers.get("HTTP_USER_AGENT", "")
-    body = request.body[: settings.PING_BODY_LIMIT]
+    return remote_addr
+
+
+def _resolve_action(
+    check: Check,
+    method: str,
+    body: bytes | SpooledBody,
+    action: str,
+    exitstatus: int | None,
+) -> str:
+    """Return the final action for a ping, after applying check's filters."""
 
     if exitstatus is not None and exitstatus > 0:
         action = "fail"
@@ -217,25 +224,68 @@ def ping(
         action = "ign"
 
     if action != "ign" and check.filter_http_body:
-        body_text = body.decode()
-        if check.failure_kw and match_keywords(body_text, check.failure_kw):
-            action = "fail"
-        elif check.success_kw and match_keywords(body_text, check.success_kw):
-            action = "success"
-        elif check.start_kw and match_keywords(body_text, check.start_kw):
-            action = "start"
+        matcher = keyword_matcher(check.failure_kw, check.success_kw, check.start_kw)
+        haystack = body if isinstance(body, SpooledBody) else body.decode()
+        if matched := matcher.match(haystack):
+            action = matched
         elif check.filter_default_fail:
             action = "fail"
         else:
             action = "ign"
 
+    return action
+
+
+@csrf_exempt
+@never_cache
+def ping(
+    request: HttpRequest,
+    code: UUID,
+    check: Check | None = None,
+    action: str = "success",
+    exitstatus: int | None = None,
+) -> HttpResponse:
+    if check is None:
+        try:
+            check = pingcache.get_by_code(code)
+        except Check.DoesNotExist:
+            return HttpResponseNotFound("not found")
+
+    if exitstatus is not None and exitstatus > 255:
+        return HttpResponseBadRequest("invalid url format")
+
+    headers = request.META
+    remote_addr = _remote_addr(request)
+    scheme = headers.get("HTTP_X_FORWARDED_PROTO", "http")
+    method = headers["REQUEST_METHOD"]
+    ua = headers.get("HTTP_USER_AGENT", "")
     rid, rid_str = None, request.GET.get("rid")
     if rid_str is not None:
         if not is_valid_uuid_string(rid_str):
             return HttpResponseBadRequest("invalid uuid format")
         rid = UUID(rid_str)
 
-    check.ping(remote_addr, scheme, method, ua, body, action, rid, exitstatus)
+    keywords = (check.start_kw, check.success_kw, check.failure_kw)
+    body = pingbody.read_body(request, settings.PING_BODY_LIMIT, keywords)
+    action = _resolve_action(check, method, body, action, exitstatus)
+
+    try:
+        if isinstance(body, SpooledBody):
+            # A large body spooled to a temporary file. Bypass the ping buffer,
+            # and remove the temporary file once the body is uploaded to S3.
+            with body:
+                check.ping(
+                    remote_addr, scheme, method, ua, body, action, rid, exitstatus
+                )
+        else:
+            args = (remote_addr, scheme, method, ua, body, action, rid, exitstatus)
+            if not settings.PING_BUFFER_ENABLED or not pingbuffer.buffer.submit(
+                check, *args
+            ):
+                check.ping(*args)
+    except Check.DoesNotExist:
+        # The check came from the lookup cache, and has since been deleted
+        return HttpResponseNotFound("not found")
 
     response = HttpResponse("OK")
     if settings.PING_BODY_LIMIT is not None:
@@ -256,10 +306,11 @@ def ping_by_slug(
         return HttpResponseBadRequest("invalid url format")
 
     created = False
+    create = request.GET.get("create") == "1"
     try:
-        check = Check.objects.get(slug=slug, project__ping_key=ping_key)
+        check = pingcache.get_by_slug(ping_key, slug, recheck_missing=create)
     except Check.DoesNotExist:
-        if request.GET.get("create") != "1":
+        if not create:
             return HttpResponseNotFound("not found")
 
         try:
@@ -287,6 +338,226 @@ def ping_by_slug(
     return response
 
 
+# A bounded thread pool for the database work of the async ping views. It caps
+# the number of database connections the ASGI ping endpoints use, regardless
+# of the number of concurrent (possibly slow) client connections.
+_ping_executor = ThreadPoolExecutor(
+    max_workers=settings.ASGI_PING_THREADS, thread_name_prefix="ping"
+)
+
+
+async def _run_in_ping_pool(
+    view: Callable[..., HttpResponse], *args: Any
+) -> HttpResponse:
+    def job() -> HttpResponse:
+        # The pool threads live across requests, so manage their database
+        # connections the way Django does at the start and end of a request.
+        close_old_connections()
+        try:
+            return view(*args)
+        finally:
+            close_old_connections()
+
+    return await sync_to_async(job, thread_sensitive=False, executor=_ping_executor)()
+
+
+@csrf_exempt
+@never_cache
+async def ping_async(
+    request: HttpRequest,
+    code: UUID,
+    action: str = "success",
+    exitstatus: int | None = None,
+) -> HttpResponse:
+    """Async version of ping(), used by the ASGI entry point."""
+    return await _run_in_ping_pool(ping, request, code, None, action, exitstatus)
+
+
+@csrf_exempt
+@never_cache
+async def ping_by_slug_async(
+    request: HttpRequest,
+    ping_key: str,
+    slug: str,
+    action: str = "success",
+    exitstatus: int | None = None,
+) -> HttpResponse:
+    """Async version of ping_by_slug(), used by the ASGI entry point."""
+    return await _run_in_ping_pool(
+        ping_by_slug, request, ping_key, slug, action, exitstatus
+    )
+
+
+class BulkPingSpec(BaseModel):
+    uuid: UUID | None = None
+    ping_key: str | None = None
+    slug: str | None = None
+    action: Literal["success", "fail", "start", "log"] = "success"
+    exitstatus: int | None = Field(None, ge=0, le=255)
+    rid: UUID | None = None
+    body: str = ""
+
+
+MAX_BULK_PINGS = 1000
+
+
+@csrf_exempt
+@never_cache
+@require_POST
+def ping_bulk(request: HttpRequest) -> HttpResponse:
+    """Record multiple pings, possibly for different checks, in one request.
+
+    The request body is a JSON document with a "pings" key holding a list
+    of ping objects. Each ping identifies its check either by "uuid", or by
+    a "ping_key" and "slug" pair. All valid pings are applied in a single
+    transaction: it locks the referenced checks with one query, applies the
+    pings to them in memory, and writes the checks, flips and pings with
+    one bulk query each. Ping bodies are uploaded to object storage after
+    the transaction commits. The response lists a result for each submitted
+    ping, in the same order.
+
+    """
+
+    try:
+        doc = json.loads(request.body.decode())
+    except ValueError:
+        return HttpResponseBadRequest("could not parse request body")
+
+    if not isinstance(doc, dict) or not isinstance(doc.get("pings"), list):
+        return HttpResponseBadRequest("pings is not an array")
+
+    items = doc["pings"]
+    if len(items) > MAX_BULK_PINGS:
+        return HttpResponseBadRequest("too many pings")
+
+    # Validate the submitted pings. Keep the valid ones in the "specs" dict,
+    # keyed by their position in the list.
+    specs: dict[int, BulkPingSpec] = {}
+    results: list[dict[str, Any]] = []
+    for i, item in enumerate(items):
+        try:
+            spec = BulkPingSpec.model_validate(item)
+        except ValidationError as e:
+            loc = e.errors()[0]["loc"]
+            field = loc[0] if loc else "ping"
+            results.append({"ok": False, "error": f"invalid {field}"})
+            continue
+
+        if spec.uuid is None and not (spec.ping_key and spec.slug):
+            results.append({"ok": False, "error": "missing uuid or slug"})
+            continue
+
+        specs[i] = spec
+        results.append({"ok": True})
+
+    headers = request.META
+    remote_addr = _remote_addr(request)
+    scheme = headers.get("HTTP_X_FORWARDED_PROTO", "http")
+    ua = headers.get("HTTP_USER_AGENT", "")
+
+    # Look up each referenced check once, through pingcache, and group the
+    # pings by check, preserving their order
+    targets: dict[tuple[Any, ...], Check | str] = {}
+    groups: dict[int, list[tuple[int, BulkPingSpec, bytes, str]]] = {}
+    for i, spec in specs.items():
+        key = (spec.uuid, spec.ping_key, spec.slug)
+        if key not in targets:
+            targets[key] = _bulk_lookup(spec)
+
+        target = targets[key]
+        if isinstance(target, str):
+            results[i].update(ok=False, error=target)
+            continue
+
+        body = spec.body.encode()[: settings.PING_BODY_LIMIT]
+        action = _resolve_action(target, "POST", body, spec.action, spec.exitstatus)
+        groups.setdefault(target.id, []).append((i, spec, body, action))
+
+    uploads: list[tuple[UUID, Ping, bytes]] = []
+    with transaction.atomic():
+        # Lock all checks with one query. Lock them in a consistent order,
+        # so concurrent bulk requests cannot deadlock.
+        q = Check.objects.select_for_update().filter(id__in=groups).order_by("id")
+        checks = list(q)
+        locked_ids = {check.id for check in checks}
+        for check_id, items in groups.items():
+            if check_id not in locked_ids:
+                # The check got deleted after we looked it up
+                for i, *_ in items:
+                    results[i].update(ok=False, error="not found")
+
+        flips: list[Flip] = []
+        pings: list[Ping] = []
+        for check in checks:
+            items = groups[check.id]
+            old_n_pings = check.n_pings
+            for _, spec, body, action in items:
+                created = now()
+                action, flip = check.apply_ping(created, action, spec.rid)
+                if flip:
+                    flips.append(flip)
+
+                check.n_pings += 1
+                ping = check.new_ping(
+                    check.n_pings,
+                    created,
+                    remote_addr,
+                    scheme,
+                    "POST",
+                    ua,
+                    body,
+                    action,
+                    spec.rid,
+                    spec.exitstatus,
+                )
+                pings.append(ping)
+                if ping.object_size:
+                    uploads.append((check.code, ping, body))
+
+            check.mark_prune_due(old_n_pings, check.n_pings, now())
+            check.update_deadlines()
+            body_lowercase = items[-1][2].decode(errors="replace").lower()
+            check.has_confirmation_link = "confirm" in body_lowercase
+
+        Check.objects.bulk_update(checks, PING_UPDATE_FIELDS)
+        Flip.objects.bulk_create(flips)
+        if flips:
+            wakeup.notify()
+        Ping.objects.bulk_create(pings)
+
+        # Upload ping bodies to S3 after the transaction commits, because
+        # this can potentially take a long time
+        transaction.on_commit(partial(_upload_bodies, uploads))
+
+    response = JsonResponse({"results": results})
+    if settings.PING_BODY_LIMIT is not None:
+        response["Ping-Body-Limit"] = str(settings.PING_BODY_LIMIT)
+    response["Access-Control-Allow-Origin"] = "*"
+    return response
+
+
+def _bulk_lookup(spec: BulkPingSpec) -> Check | str:
+    """Return the check a bulk ping is for, or an error message."""
+
+    try:
+        if spec.uuid is not None:
+            return pingcache.get_by_code(spec.uuid)
+        assert spec.ping_key and spec.slug
+        return pingcache.get_by_slug(spec.ping_key, spec.slug)
+    except Check.DoesNotExist:
+        return "not found"
+    except Check.MultipleObjectsReturned:
+        return "ambiguous slug"
+
+
+def _upload_bodies(uploads: list[tuple[UUID, Ping, bytes]]) -> None:
+    for code, ping, body in uploads:
+        assert ping.n is not None
+        with ping.object_data(body) as data:
+            if not uploader.submit(code, ping.n, data):
+                put_object(code, ping.n, data)
+
+
 def _lookup(project: Project, spec: Spec) -> Check | None:
     if not spec.unique:
         return None
@@ -395,8 +666,8 @@ def _update(check: Check, spec: Spec, v: int) -> None:
             setattr(check, key, v)
             update_fields.add(key)
 
-    check.alert_after = check.going_down_after()
-    update_fields.add("alert_after")
+    check.update_deadlines()
+    update_fields.update(("alert_after", "grace_start"))
     if check._state.adding:
         check.save()
     else:
@@ -559,7 +830,8 @@ def pause(request: ApiRequest, code: UUID) -> HttpResponse:
     check.status = "paused"
     check.last_start = None
     check.alert_after = None
-    check.save(update_fields=("status", "last_start", "alert_after"))
+    check.grace_start = None
+    check.save(update_fields=("status", "last_start", "alert_after", "grace_start"))
 
     # After pausing a check we must check if all checks are up,
     # and Profile.next_nag_date needs to be cleared out:
@@ -585,7 +857,9 @@ def resume(request: ApiRequest, code: UUID) -> HttpResponse:
     check.last_start = None
     check.last_ping = None
     check.alert_after = None
-    check.save(update_fields=("status", "last_start", "last_ping", "alert_after"))
+    check.grace_start = None
+    fields = ("status", "last_start", "last_ping", "alert_after", "grace_start")
+    check.save(update_fields=fields)
 
     return JsonResponse(check.to_dict(v=request.v))
 
@@ -747,12 +1021,12 @@ def badge(
         label = tag
 
     status, total, grace, down = "up", 0, 0, 0
-    for check in q:
-        if tag != "*" and tag not in check.tags_list():
+    q = q.annotate(current_status=status_expression(now()))
+    for tags, check_status in q.values_list("tags", "current_status"):
+        if tag != "*" and tag not in split_tags(tags):
             continue
 
         total += 1
-        check_status = check.get_status()
 
         if check_status == "down":
             down += 1
@@ -860,11 +1134,15 @@ def metrics(request: HttpRequest) -> HttpResponse:
     if key != settings.METRICS_KEY:
         return HttpResponseForbidden()
 
+    schedule_cache = schedules.cache_info()
     doc = {
         "ts": int(time.time()),
         "max_ping_id": Ping.objects.values_list("id", flat=True).last(),
         "max_notification_id": Notification.objects.values_list("id", flat=True).last(),
         "num_unprocessed_flips": Flip.objects.filter(processed__isnull=True).count(),
+        # Per-process counters, see hc/api/schedules.py
+        "schedule_cache_hits": schedule_cache.hits,
+        "schedule_cache_misses": schedule_cache.misses,
     }
 
     return JsonResponse(doc)
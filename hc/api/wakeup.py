@@ -0,0 +1,171 @@
+"""Waking up sendalerts when new flips are created.
+
+sendalerts polls the database for unprocessed flips every couple of seconds.
+To send notifications without that delay, code that creates an unprocessed
+flip calls notify(), and sendalerts waits on a Listener between polls:
+
+* On PostgreSQL, notify() runs NOTIFY, and the listener runs LISTEN on
+  a dedicated database connection. NOTIFY is transactional: PostgreSQL
+  delivers the notification when the transaction that created the flip commits.
+* On other databases, if SENDALERTS_WAKEUP_SOCKET is set, every listener binds
+  its own Unix socket, "<SENDALERTS_WAKEUP_SOCKET>.<pid>", and notify() sends
+  a datagram to each of them after the transaction commits. This way several
+  sendalerts processes (for example, with --shards) all get woken up. This only
+  works when sendalerts runs on the same host as the web processes.
+
+Wakeups are best-effort, sendalerts keeps polling as a fallback.
+"""
+
+from __future__ import annotations
+
+import glob
+import logging
+import os
+import select
+import socket
+import time
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "hc_flips"
+
+
+def _socket_paths() -> list[str]:
+    """Return the paths of the listener sockets, live or stale."""
+    assert settings.SENDALERTS_WAKEUP_SOCKET
+    return glob.glob(glob.escape(settings.SENDALERTS_WAKEUP_SOCKET) + ".*")
+
+
+def _send_datagram() -> None:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
+        s.setblocking(False)
+        for path in _socket_paths():
+            try:
+                s.sendto(b"1", path)
+            except OSError:
+                # The listener has exited, or it has plenty of wakeups pending
+                pass
+
+
+def _is_stale(path: str) -> bool:
+    """Return True if no process is bound to the socket at `path`."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
+        try:
+            s.connect(path)
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            pass
+    return False
+
+
+def notify() -> None:
+    """Wake up sendalerts once the current transaction commits."""
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"NOTIFY {CHANNEL}")
+    elif settings.SENDALERTS_WAKEUP_SOCKET:
+        transaction.on_commit(_send_datagram)
+
+
+class Listener:
+    def __init__(self) -> None:
+        # A psycopg connection, used on PostgreSQL
+        self.conn: Any = None
+        # A Unix datagram socket, used on other databases
+        self.sock: socket.socket | None = None
+        self.path: Path | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.conn is not None or self.sock is not None
+
+    def start(self) -> None:
+        if connection.vendor == "postgresql":
+            self.connect()
+        elif settings.SENDALERTS_WAKEUP_SOCKET:
+            # Remove the socket files left over by processes that did not exit
+            # cleanly. Sockets other processes are bound to are left alone.
+            for stale_path in _socket_paths():
+                if _is_stale(stale_path):
+                    Path(stale_path).unlink(missing_ok=True)
+
+            path = Path(f"{settings.SENDALERTS_WAKEUP_SOCKET}.{os.getpid()}")
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                sock.bind(str(path))
+            except OSError:
+                # Another process (with the same PID in a different PID
+                # namespace) is bound to the path already, fall back to polling
+                logger.exception("Could not bind %s", path)
+                sock.close()
+                return
+
+            sock.setblocking(False)
+            self.sock, self.path = sock, path
+
+    def connect(self) -> None:
+        import psycopg
+
+        try:
+            params = connection.get_connection_params()
+            self.conn = psycopg.connect(**params, autocommit=True)
+            self.conn.execute(f"LISTEN {CHANNEL}")
+        except psycopg.Error:
+            logger.exception("Could not LISTEN for new flips")
+            self.conn = None
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for a wakeup.
+
+        Return True if woken up, False on timeout.
+        """
+
+        if connection.vendor == "postgresql" and self.conn is None:
+            # The connection got lost, try to reconnect
+            self.connect()
+
+        if self.conn is not None:
+            import psycopg
+
+            try:
+                notifies = self.conn.notifies(timeout=timeout, stop_after=1)
+                return any(True for _ in notifies)
+            except psycopg.Error:
+                logger.exception("Lost the LISTEN connection")
+                self.conn.close()
+                self.conn = None
+
+        elif self.sock is not None:
+            ready, _, _ = select.select([self.sock], [], [], timeout)
+            if not ready:
+                return False
+
+            # Drain the socket, several notify() calls need just one wakeup
+            try:
+                while self.sock.recv(64):
+                    pass
+            except BlockingIOError:
+                pass
+            return True
+
+        time.sleep(timeout)
+        return False
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+        if self.sock is not None:
+            # Only remove the socket file this process has bound itself
+            assert self.path
+            self.path.unlink(missing_ok=True)
+            self.sock.close()
+            self.sock, self.path = None, None
@@ -0,0 +1,41 @@
+"""
+ASGI config for hc project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+The ping endpoints are served by async views (see hc/asgi_urls.py), which run
+their database work in a thread pool of ASGI_PING_THREADS threads. This lets
+a single process keep many concurrent, slow client connections open while
+using a bounded number of database connections. All other endpoints are
+served by the same sync views as in hc/wsgi.py.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/6.1/howto/deployment/asgi/
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Mapping
+from typing import IO, Any
+
+import django
+from django.core.handlers.asgi import ASGIHandler as BaseASGIHandler
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseBase
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hc.settings")
+
+
+class ASGIHandler(BaseASGIHandler):
+    def create_request(
+        self, scope: Mapping[str, Any], body_file: IO[bytes]
+    ) -> tuple[ASGIRequest, None] | tuple[None, HttpResponseBase]:
+        result = super().create_request(scope, body_file)
+        if result[0] is not None:
+            result[0].urlconf = "hc.asgi_urls"
+        return result
+
+
+django.setup(set_prefix=False)
+application = ASGIHandler()
@@ -0,0 +1,17 @@
+"""URLconf for the ASGI entry point (see hc/asgi.py).
+
+Same as hc/urls.py, except the ping endpoints are served by async views.
+"""
+
+from __future__ import annotations
+
+from django.urls import include, path
+
+from hc.api.urls import async_ping_urlpatterns
+from hc.urls import prefix
+from hc.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path(prefix, include(async_ping_urlpatterns)),
+    *sync_urlpatterns,
+]
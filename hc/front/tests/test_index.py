@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+from datetime import timedelta as td
+
+from django.utils.timezone import now
+
 from hc.api.models import Check
 from hc.test import BaseTestCase
 
@@ -28,3 +32,25 @@ class IndexTestCase(BaseTestCase):
         r = self.client.get("/")
         self.assertContains(r, "status ic-down")
         self.assertContains(r, "favicon_down.svg")
+
+    def test_it_shows_overall_grace_status(self) -> None:
+        self.c1.status = "up"
+        self.c1.last_ping = now() - td(days=1, minutes=30)
+        self.c1.update_deadlines()
+        self.c1.save()
+
+        self.client.login(username="alice@example.org", password="password")
+        r = self.client.get("/?refresh=1")
+        doc = r.json()
+        self.assertEqual(doc[str(self.project.code)]["status"], "grace")
+        self.assertFalse(doc[str(self.project.code)]["started"])
+
+    def test_it_reports_started_checks(self) -> None:
+        self.c1.last_start = now()
+        self.c1.save()
+
+        self.client.login(username="alice@example.org", password="password")
+        r = self.client.get("/?refresh=1")
+        doc = r.json()
+        self.assertEqual(doc[str(self.project.code)]["status"], "up")
+        self.assertTrue(doc[str(self.project.code)]["started"])
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+import zlib
 from datetime import timedelta as td
 from unittest.mock import Mock, patch
 
@@ -52,6 +53,18 @@ class LogTestCase(BaseTestCase):
         self.assertContains(r, "1234 byte body")
         get_object.assert_not_called()
 
+    def test_it_shows_compressed_body_preview(self) -> None:
+        self.ping.body_raw = zlib.compress(b"hello world " * 100)
+        self.ping.compression = "zlib"
+        self.ping.save()
+
+        self.client.login(username="alice@example.org", password="password")
+        r = self.client.get(self.url)
+        self.assertContains(r, "hello world hello world")
+        # The preview is truncated to 150 characters
+        self.assertContains(r, "hello world " * 12 + "hello")
+        self.assertNotContains(r, "hello world " * 13)
+
     def test_it_displays_email(self) -> None:
         self.ping.scheme = "email"
         self.ping.ua = "email from server@example.org"
@@ -1,5 +1,10 @@
 from __future__ import annotations
 
+from datetime import timedelta as td
+
+from django.utils.timezone import now
+
+from hc.api.models import Check
 from hc.test import BaseTestCase
 
 
@@ -17,6 +22,16 @@ class ProjectsMenuTestCase(BaseTestCase):
         self.assertContains(r, "Alices Project")
         self.assertContains(r, "status ic-up")
 
+    def test_it_shows_overall_down_status(self) -> None:
+        check = Check(project=self.project, status="up")
+        check.last_ping = now() - td(days=2)
+        check.update_deadlines()
+        check.save()
+
+        self.client.login(username="alice@example.org", password="password")
+        r = self.client.get(self.url)
+        self.assertContains(r, "status ic-down")
+
     def test_it_requires_logged_in_user(self) -> None:
         r = self.client.get(self.url)
         self.assertEqual(r.status_code, 302)
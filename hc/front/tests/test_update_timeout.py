@@ -34,6 +34,7 @@ class UpdateTimeoutTestCase(BaseTestCase):
         assert self.check.last_ping
         expected_aa = self.check.last_ping + td(seconds=3600 + 60)
         self.assertEqual(self.check.alert_after, expected_aa)
+        self.assertEqual(self.check.grace_start, self.check.last_ping + td(hours=1))
 
     def test_redirect_preserves_querystring(self) -> None:
         referer = self.redirect_url + "?tag=foo"
@@ -51,6 +51,7 @@ from hc.api.models import (
     Ping,
     prepare_durations,
 )
+from hc.api.statuses import bulk_statuses, down_q, grace_q
 from hc.front import forms
 from hc.front.templatetags.hc_extras import (
     down_title,
@@ -60,6 +61,7 @@ from hc.front.templatetags.hc_extras import (
 )
 from hc.front.validators import CronValidator, OnCalendarValidator
 from hc.lib.badges import get_badge_url
+from hc.lib.compression import decompress_prefix
 from hc.lib.string import is_valid_uuid_string
 from hc.lib.tz import all_timezones
 from hc.lib.urls import absolute_reverse
@@ -318,15 +320,20 @@ def status(request: HttpRequest, code: UUID) -> HttpResponse:
         return HttpResponseForbidden()
 
     project, _rw = _get_project_for_user(request, code)
-    checks = list(Check.objects.filter(project=project))
+    q = Check.objects.filter(project=project)
+    checks = list(q)
+    check_statuses = bulk_statuses(q)
 
     details = []
     for check in checks:
+        # A check deleted between the two queries is not in the mapping
+        if check.code in check_statuses:
+            check.cached_status = check_statuses[check.code]
         ctx = {"check": check}
         details.append(
             {
                 "code": str(check.code),
-                "status": check.get_status(),
+                "status": check.cached_status,
                 "last_ping": LAST_PING_TMPL.render(ctx).strip(),
                 "started": check.last_start is not None,
             }
@@ -367,17 +374,20 @@ def _get_project_summary(profile: Profile) -> dict[UUID, ProjectStatus]:
     statuses: dict[UUID, ProjectStatus] = defaultdict(
         lambda: {"status": "up", "started": False}
     )
-    q = profile.checks_from_all_projects()
-    q = q.annotate(project_code=F("project__code"))
-    for check in q:
-        summary = statuses[check.project_code]
-        if check.last_start:
-            summary["started"] = True
-
-        if summary["status"] != "down":
-            status = check.get_status()
-            if status == "down" or (status == "grace" and summary["status"] == "up"):
-                summary["status"] = status
+    frozen_now = now()
+    q = profile.checks_from_all_projects().order_by()
+    rows = q.values("project__code").annotate(
+        n_down=Count("id", filter=down_q(frozen_now)),
+        n_grace=Count("id", filter=grace_q(frozen_now)),
+        n_started=Count("id", filter=Q(last_start__isnull=False)),
+    )
+    for row in rows:
+        summary = statuses[row["project__code"]]
+        summary["started"] = row["n_started"] > 0
+        if row["n_down"]:
+            summary["status"] = "down"
+        elif row["n_grace"]:
+            summary["status"] = "grace"
 
     return statuses
 
@@ -424,12 +434,17 @@ def projects_menu(request: AuthenticatedHttpRequest) -> HttpResponse:
     projects = list(request.profile.projects())
 
     statuses: dict[int, str] = defaultdict(lambda: "up")
-    for check in Check.objects.filter(project__in=projects):
-        old_status = statuses[check.project_id]
-        if old_status != "down":
-            status = check.get_status()
-            if status == "down" or (status == "grace" and old_status == "up"):
-                statuses[check.project_id] = status
+    frozen_now = now()
+    q = Check.objects.filter(project__in=projects).order_by()
+    rows = q.values("project_id").annotate(
+        n_down=Count("id", filter=down_q(frozen_now)),
+        n_grace=Count("id", filter=grace_q(frozen_now)),
+    )
+    for row in rows:
+        if row["n_down"]:
+            statuses[row["project_id"]] = "down"
+        elif row["n_grace"]:
+            statuses[row["project_id"]] = "grace"
 
     for p in projects:
         p.overall_status = statuses[p.id]
@@ -603,7 +618,15 @@ def filtering_rules(request: AuthenticatedHttpRequest, code: UUID) -> HttpRespon
 @login_required
 def update_timeout(request: AuthenticatedHttpRequest, code: UUID) -> HttpResponse:
     check = _get_rw_check_for_user(request, code)
-    fields = ("kind", "timeout", "grace", "schedule", "tz", "alert_after")
+    fields = (
+        "kind",
+        "timeout",
+        "grace",
+        "schedule",
+        "tz",
+        "alert_after",
+        "grace_start",
+    )
 
     kind = request.POST.get("kind")
     if kind == "simple":
@@ -633,7 +656,7 @@ def update_timeout(request: AuthenticatedHttpRequest, code: UUID) -> HttpRespons
         check.tz = oncalendar_form.cleaned_data["tz"]
         check.grace = oncalendar_form.cleaned_data["grace"]
 
-    check.alert_after = check.going_down_after()
+    check.update_deadlines()
     check_saved = False
     if check.status == "up":
         assert check.alert_after
@@ -650,6 +673,7 @@ def update_timeout(request: AuthenticatedHttpRequest, code: UUID) -> HttpRespons
             check.create_flip("down", mark_as_processed=True)
 
             check.alert_after = None
+            check.grace_start = None
             check.status = "down"
 
             # Kick off nags. This would normally happen in the sendalerts management
@@ -832,7 +856,8 @@ def pause(request: AuthenticatedHttpRequest, code: UUID) -> HttpResponse:
     check.status = "paused"
     check.last_start = None
     check.alert_after = None
-    check.save(update_fields=("status", "last_start", "alert_after"))
+    check.grace_start = None
+    check.save(update_fields=("status", "last_start", "alert_after", "grace_start"))
 
     # After pausing a check we must check if all checks are up,
     # and Profile.next_nag_date needs to be cleared out:
@@ -858,7 +883,9 @@ def resume(request: AuthenticatedHttpRequest, code: UUID) -> HttpResponse:
     check.last_start = None
     check.last_ping = None
     check.alert_after = None
-    check.save(update_fields=("status", "last_start", "last_ping", "alert_after"))
+    check.grace_start = None
+    fields = ("status", "last_start", "last_ping", "alert_after", "grace_start")
+    check.save(update_fields=fields)
 
     return redirect("hc-details", code)
 
@@ -884,6 +911,7 @@ def clear_events(request: AuthenticatedHttpRequest, code: UUID) -> HttpResponse:
     check.last_duration = None
     check.has_confirmation_link = False
     check.alert_after = None
+    check.grace_start = None
     check.save(
         update_fields=(
             "status",
@@ -892,6 +920,7 @@ def clear_events(request: AuthenticatedHttpRequest, code: UUID) -> HttpResponse:
             "last_duration",
             "has_confirmation_link",
             "alert_after",
+            "grace_start",
         )
     )
 
@@ -928,12 +957,24 @@ def _get_events(
     # Optimization: defer loading body_raw, instead load its first 150 bytes
     # as "body_raw_preview". This reduces both network I/O to database, and disk I/O
     # on the database host if the database contains large request bodies.
+    # For compressed bodies, load more bytes: the first 150 bytes of the
+    # decompressed body usually need more than 150 bytes of compressed input.
     pq = pq.defer("body_raw")
     pq = pq.annotate(
-        body_raw_preview=Substr("body_raw", 1, 151, output_field=BinaryField())
+        body_raw_preview=Case(
+            When(
+                compression__isnull=False,
+                then=Substr("body_raw", 1, 1024, output_field=BinaryField()),
+            ),
+            default=Substr("body_raw", 1, 151, output_field=BinaryField()),
+        )
     )
     pings = list(pq[:page_limit])
     prepare_durations(pings)
+    for ping in pings:
+        if ping.compression and ping.body_raw_preview:
+            preview = bytes(ping.body_raw_preview)
+            ping.body_raw_preview = decompress_prefix(preview, ping.compression, 151)
 
     alerts: list[Notification] = []
     if kinds and "notification" in kinds:
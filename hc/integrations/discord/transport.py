@@ -22,6 +22,12 @@ class Discord(Slackalike):
         prepared_payload = self.payload(flip)
         self.post(url, json=prepared_payload)
 
+    def notify_digest(
+        self, flips: list[Flip], notifications: list[Notification]
+    ) -> None:
+        url = self.channel.discord_webhook_url + "/slack"
+        self.post(url, json=self.digest_payload(flips))
+
     def fix_asterisks(self, s: str) -> str:
         # In Discord notifications asterisks should be escaped with a backslash
         return s.replace("*", r"\*")
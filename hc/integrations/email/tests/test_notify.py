@@ -486,3 +486,39 @@ Content-Transfer-Encoding: 8bit
         eml = message.message(policy=email.policy.SMTP).as_bytes().decode()
         for line in eml.split("\n"):
             self.assertLess(len(line), 80)
+
+    @override_settings(DEFAULT_FROM_EMAIL="alerts@example.org")
+    def test_digest_works(self) -> None:
+        other = Check.objects.create(project=self.project, name="Other")
+        flips = [
+            self.flip,
+            Flip(owner=other, created=EPOCH, old_status="down", new_status="up"),
+        ]
+        self.channel.notify_digest(flips)
+
+        self.assertEqual(Notification.objects.filter(error="").count(), 2)
+        self.assertEqual(len(mail.outbox), 1)
+
+        email = mail.outbox[0]
+        self.assertEqual(email.subject, "1 DOWN, 1 UP | Alices Project")
+        self.assertEqual(email.to[0], "alice@example.org")
+        self.assertTrue("List-Unsubscribe" in email.extra_headers)
+
+        self.assertEmailContainsText("""2 checks in project "Alices Project" """)
+        self.assertEmailContainsText(""""Daily Backup" has gone down""")
+        self.assertEmailContainsText(""""Other" has gone up""")
+        self.assertEmailContainsHtml(self.check.cloaked_url())
+        self.assertEmailContainsHtml(self.project.checks_url())
+
+    def test_digest_requires_verified_email(self) -> None:
+        self.channel.email_verified = False
+        self.channel.save()
+
+        other = Check.objects.create(project=self.project, name="Other")
+        flips = [self.flip, Flip(owner=other, created=EPOCH, new_status="down")]
+        self.channel.notify_digest(flips)
+
+        self.assertEqual(
+            Notification.objects.filter(error="Email not verified").count(), 2
+        )
+        self.assertEqual(len(mail.outbox), 0)
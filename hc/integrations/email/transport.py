@@ -5,7 +5,12 @@ from email.message import EmailMessage
 
 from hc.accounts.models import Profile
 from hc.api.models import Flip, Notification
-from hc.api.transports import Transport, TransportError, get_ping_body_bytes
+from hc.api.transports import (
+    DIGEST_MAX_FLIPS,
+    Transport,
+    TransportError,
+    get_ping_body_bytes,
+)
 from hc.lib import emails
 from hc.lib.signing import sign_bounce_id
 
@@ -34,17 +39,19 @@ class Email(Transport):
             m.set_content(m.get_content())
         return m
 
+    def headers(self, unsub_link: str, notification: Notification) -> dict[str, str]:
+        return {
+            "List-Unsubscribe": f"<{unsub_link}>",
+            "List-Unsubscribe-Post": "List-Unsubscribe=One-Click",
+            "X-Bounce-ID": sign_bounce_id(f"n.{notification.code}"),
+        }
+
     def notify(self, flip: Flip, notification: Notification) -> None:
         if not self.channel.email_verified:
             raise TransportError("Email not verified")
 
         unsub_link = self.channel.get_unsub_link()
-
-        headers = {
-            "List-Unsubscribe": f"<{unsub_link}>",
-            "List-Unsubscribe-Post": "List-Unsubscribe=One-Click",
-            "X-Bounce-ID": sign_bounce_id(f"n.{notification.code}"),
-        }
+        headers = self.headers(unsub_link, notification)
 
         # If this email address has an associated account,
         # - include a summary of projects the account has access to
@@ -78,6 +85,33 @@ class Email(Transport):
 
         emails.alert(self.channel.email.value, ctx, headers, attachment)
 
+    def notify_digest(
+        self, flips: list[Flip], notifications: list[Notification]
+    ) -> None:
+        if not self.channel.email_verified:
+            raise TransportError("Email not verified")
+
+        unsub_link = self.channel.get_unsub_link()
+        # A bounce marks the first notification of the digest as failed
+        headers = self.headers(unsub_link, notifications[0])
+
+        try:
+            profile = Profile.objects.get(user__email=self.channel.email.value)
+        except Profile.DoesNotExist:
+            profile = Profile.objects.for_user(self.channel.project.owner)
+
+        ctx = {
+            "flips": flips[:DIGEST_MAX_FLIPS],
+            "num_flips": len(flips),
+            "num_down": sum(1 for flip in flips if flip.new_status == "down"),
+            "num_up": sum(1 for flip in flips if flip.new_status == "up"),
+            "num_more": max(len(flips) - DIGEST_MAX_FLIPS, 0),
+            "project": self.channel.project,
+            "unsub_link": unsub_link,
+            "tz": profile.tz,
+        }
+        emails.digest(self.channel.email.value, ctx, headers)
+
     def is_noop(self, status: str) -> bool:
         if status == "down":
             return not self.channel.email.notify_down
@@ -14,3 +14,11 @@ class Mattermost(Slackalike):
 
         prepared_payload = self.payload(flip)
         self.post(self.channel.slack_webhook_url, json=prepared_payload)
+
+    def notify_digest(
+        self, flips: list[Flip], notifications: list[Notification]
+    ) -> None:
+        if not settings.MATTERMOST_ENABLED:
+            raise TransportError("Mattermost notifications are not enabled.")
+
+        super().notify_digest(flips, notifications)
@@ -127,6 +127,7 @@ class MetricsTestCase(BaseTestCase):
         self.check.grace = td(minutes=10)
         self.check.status = "up"
         self.check.last_ping = now() - td(minutes=15)
+        self.check.update_deadlines()
         self.check.save()
 
         r = self.client.get(self.url)
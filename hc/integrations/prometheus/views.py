@@ -18,6 +18,7 @@ from django.shortcuts import render
 from hc.accounts.http import AuthenticatedHttpRequest
 from hc.accounts.models import Project
 from hc.api.models import Check
+from hc.api.statuses import bulk_statuses
 from hc.front.decorators import require_setting
 from hc.front.views import _get_project_for_user
 
@@ -58,26 +59,21 @@ def metrics(request: HttpRequest, code: UUID, key: str | None = None) -> HttpRes
         "code",  # used in check.unique_key
         "name",
         "tags",
-        # the below fields are used in check.get_status():
-        "status",
-        "kind",
-        "timeout",
-        "grace",
-        "schedule",
-        "tz",
         "last_start",
-        "last_ping",
     )
 
     def esc(s: str) -> str:
         return s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
 
     def output(checks: QuerySet[Check]) -> Iterable[str]:
+        check_statuses = bulk_statuses(checks)
         labels_status_started = []
         for check in checks:
             labels = f'{{name="{esc(check.name)}", tags="{esc(check.tags)}", unique_key="{check.unique_key}"}}'
             started = 1 if check.last_start else 0
-            labels_status_started.append((labels, check.get_status(), started))
+            # A check created between the two queries is not in the mapping
+            status = check_statuses.get(check.code, "new")
+            labels_status_started.append((labels, status, started))
 
         yield "# HELP hc_check_up Whether the check is currently up (1 for yes, 0 for no).\n"
         yield "# TYPE hc_check_up gauge\n"
@@ -340,3 +340,64 @@ class NotifySlackTestCase(BaseTestCase):
         attachment = mock_post.call_args.kwargs["json"]["attachments"][0]
         fields = {f["title"]: f["value"] for f in attachment["fields"]}
         self.assertNotIn("Last Ping Body", fields)
+
+    def _digest_flips(self, n: int) -> list[Flip]:
+        flips = []
+        for i in range(0, n):
+            check = Check.objects.create(project=self.project, name=f"check-{i}")
+            flips.append(Flip(owner=check, created=now(), new_status="down"))
+        return flips
+
+    @override_settings(SITE_ROOT="http://testserver", SITE_LOGO_URL=None)
+    @patch("hc.api.transports.curl.request", autospec=True)
+    def test_digest_works(self, mock_post: Mock) -> None:
+        self._setup_data("https://example.org")
+        mock_post.return_value.status_code = 200
+
+        error = self.channel.notify_digest(self._digest_flips(3))
+        self.assertEqual(error, "")
+        self.assertEqual(mock_post.call_count, 1)
+
+        # It should create a Notification for every flip
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertFalse(Notification.objects.exclude(error="").exists())
+
+        attachment = mock_post.call_args.kwargs["json"]["attachments"][0]
+        self.assertEqual(attachment["title"], "3 checks changed status.")
+        self.assertEqual(attachment["color"], "danger")
+        self.assertIn("“check-0” is DOWN.\n", attachment["text"])
+        self.assertIn("“check-2” is DOWN.", attachment["text"])
+        self.assertEqual(attachment["title_link"], self.project.checks_url())
+
+        self.channel.refresh_from_db()
+        self.assertIsNotNone(self.channel.last_notify)
+
+    @patch("hc.api.transports.curl.request", autospec=True)
+    @patch("hc.integrations.slack.transport.DIGEST_MAX_FLIPS", 2)
+    def test_digest_truncates_long_lists(self, mock_post: Mock) -> None:
+        self._setup_data("https://example.org")
+        mock_post.return_value.status_code = 200
+
+        self.channel.notify_digest(self._digest_flips(5))
+
+        attachment = mock_post.call_args.kwargs["json"]["attachments"][0]
+        self.assertNotIn("check-2", attachment["text"])
+        self.assertIn("…and 3 more.", attachment["text"])
+
+    @patch("hc.api.transports.curl.request", autospec=True)
+    def test_digest_handles_single_flip(self, mock_post: Mock) -> None:
+        self._setup_data("https://example.org")
+        mock_post.return_value.status_code = 200
+
+        self.channel.notify_digest([self.flip])
+
+        # It should send a regular notification
+        attachment = mock_post.call_args.kwargs["json"]["attachments"][0]
+        self.assertEqual(attachment["title"], "“Foobar” is DOWN.")
+
+    @override_settings(SLACK_ENABLED=False)
+    def test_digest_requires_slack_enabled(self) -> None:
+        self._setup_data("https://example.org")
+        error = self.channel.notify_digest(self._digest_flips(2))
+        self.assertEqual(error, "Slack notifications are not enabled.")
+        self.assertEqual(Notification.objects.filter(error=error).count(), 2)
@@ -6,7 +6,12 @@ from typing import NoReturn
 from django.conf import settings
 
 from hc.api.models import Flip, Notification
-from hc.api.transports import HttpTransport, TransportError, get_ping_body
+from hc.api.transports import (
+    DIGEST_MAX_FLIPS,
+    HttpTransport,
+    TransportError,
+    get_ping_body,
+)
 from hc.front.templatetags.hc_extras import absolute_site_logo_url
 from hc.lib import curl
 from hc.lib.date import format_duration, format_duration_for_sentence
@@ -85,6 +90,38 @@ class Slackalike(HttpTransport):
 
         return result
 
+    def digest_payload(self, flips: list[Flip]) -> JSONDict:
+        """Prepare a payload listing several flips in a single message."""
+
+        lines = []
+        for flip in flips[:DIGEST_MAX_FLIPS]:
+            name = flip.owner.name_then_code()
+            lines.append(f"“{name}” is {flip.new_status.upper()}.")
+        if len(flips) > DIGEST_MAX_FLIPS:
+            lines.append(f"…and {len(flips) - DIGEST_MAX_FLIPS} more.")
+
+        title = f"{len(flips)} checks changed status."
+        any_down = any(flip.new_status == "down" for flip in flips)
+        fields = SlackFields()
+        if self.channel.project.name:
+            fields.add("Project", self.channel.project.name)
+
+        return {
+            "username": settings.SITE_NAME,
+            "icon_url": absolute_site_logo_url(),
+            "attachments": [
+                {
+                    "color": "danger" if any_down else "good",
+                    "fallback": title,
+                    "mrkdwn_in": ["fields"],
+                    "title": title,
+                    "title_link": self.channel.project.checks_url(),
+                    "text": "\n".join(lines),
+                    "fields": fields,
+                }
+            ],
+        }
+
     def fix_asterisks(self, s: str) -> str:
         """Escape asterisks so that they are not recognized as Markdown syntax."""
 
@@ -96,6 +133,11 @@ class Slackalike(HttpTransport):
     def notify(self, flip: Flip, notification: Notification) -> None:
         self.post(self.channel.slack_webhook_url, json=self.payload(flip))
 
+    def notify_digest(
+        self, flips: list[Flip], notifications: list[Notification]
+    ) -> None:
+        self.post(self.channel.slack_webhook_url, json=self.digest_payload(flips))
+
 
 class Slack(Slackalike):
     @classmethod
@@ -124,3 +166,11 @@ class Slack(Slackalike):
             raise TransportError("Slack notifications are not enabled.")
 
         self.post(self.channel.slack_webhook_url, json=self.payload(flip))
+
+    def notify_digest(
+        self, flips: list[Flip], notifications: list[Notification]
+    ) -> None:
+        if not settings.SLACK_ENABLED:
+            raise TransportError("Slack notifications are not enabled.")
+
+        super().notify_digest(flips, notifications)
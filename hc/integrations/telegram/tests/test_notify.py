@@ -349,3 +349,33 @@ class NotifyTelegramTestCase(BaseTestCase):
         payload = mock_post.call_args.kwargs["json"]
         self.assertIn("&lt;b&gt;bold&lt;/b&gt;\n", payload["text"])
         self.assertIn("foo &amp; bar", payload["text"])
+
+    @patch("hc.api.transports.curl.request", autospec=True)
+    def test_digest_works(self, mock_post: Mock) -> None:
+        mock_post.return_value.status_code = 200
+
+        other = Check.objects.create(project=self.project, name="Other")
+        up = Flip(owner=other, created=now(), old_status="down", new_status="up")
+        self.channel.notify_digest([self.flip, up])
+        self.assertEqual(Notification.objects.count(), 2)
+
+        payload = mock_post.call_args.kwargs["json"]
+        self.assertEqual(payload["chat_id"], 123)
+        self.assertIn("<b>2 checks changed status.</b>\n", payload["text"])
+        self.assertIn("<b>Project:</b> Alices Project\n", payload["text"])
+        self.assertIn(">DB Backup</a> is <b>DOWN</b>.", payload["text"])
+        self.assertIn(">Other</a> is now <b>UP</b>.", payload["text"])
+        self.assertIn(self.check.cloaked_url(), payload["text"])
+
+    @patch("hc.api.transports.curl.request", autospec=True)
+    def test_digest_obeys_rate_limit(self, mock_post: Mock) -> None:
+        TokenBucket.objects.create(value="tg-123", tokens=0)
+
+        other = Check.objects.create(project=self.project, name="Other")
+        flip = Flip(owner=other, created=now(), new_status="down")
+        self.channel.notify_digest([self.flip, flip])
+        mock_post.assert_not_called()
+
+        n = Notification.objects.first()
+        assert n
+        self.assertEqual(n.error, "Rate limit exceeded")
@@ -6,7 +6,12 @@ from django.conf import settings
 from pydantic import BaseModel, ValidationError
 
 from hc.api.models import Flip, Notification
-from hc.api.transports import HttpTransport, TransportError, get_ping_body
+from hc.api.transports import (
+    DIGEST_MAX_FLIPS,
+    HttpTransport,
+    TransportError,
+    get_ping_body,
+)
 from hc.lib import curl
 
 
@@ -82,7 +87,25 @@ class Telegram(HttpTransport):
             "body": get_ping_body(ping, maxlen=1000),
         }
         text = self.tmpl("telegram_message.html", **ctx)
+        self.send_to_channel(text)
 
+    def notify_digest(
+        self, flips: list[Flip], notifications: list[Notification]
+    ) -> None:
+        from hc.api.models import TokenBucket
+
+        if not TokenBucket.authorize_telegram(self.channel.telegram.id):
+            raise TransportError("Rate limit exceeded")
+
+        ctx = {
+            "flips": flips[:DIGEST_MAX_FLIPS],
+            "num_flips": len(flips),
+            "num_more": max(len(flips) - DIGEST_MAX_FLIPS, 0),
+            "project": self.channel.project,
+        }
+        self.send_to_channel(self.tmpl("telegram_digest.html", **ctx))
+
+    def send_to_channel(self, text: str) -> None:
         try:
             self.send(self.channel.telegram.id, self.channel.telegram.thread_id, text)
         except MigrationRequiredError as e:
@@ -0,0 +1,74 @@
+"""Compression of stored ping bodies.
+
+When PING_BODY_COMPRESSION is enabled, ping bodies are stored zlib-compressed,
+both in the database (Ping.body_raw) and in object storage. The Ping.compression
+field records the format: None for uncompressed bodies (including all
+bodies stored before compression was enabled), or "zlib".
+"""
+
+from __future__ import annotations
+
+import zlib
+from tempfile import SpooledTemporaryFile
+from typing import IO
+
+ZLIB = "zlib"
+CHUNK_SIZE = 64 * 1024
+# Compressed files up to this size are kept in memory, larger ones spill to disk
+SPOOL_MAX_SIZE = 256 * 1024
+
+
+class DecompressionError(Exception):
+    pass
+
+
+def compress(data: bytes) -> bytes:
+    return zlib.compress(data)
+
+
+def compress_file(f: IO[bytes]) -> IO[bytes]:
+    """Compress a file in chunks, and return the result as a temporary file.
+
+    The caller is responsible for closing the returned file.
+    """
+
+    result: SpooledTemporaryFile[bytes] = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    compressor = zlib.compressobj()
+    f.seek(0)
+    while chunk := f.read(CHUNK_SIZE):
+        result.write(compressor.compress(chunk))
+    result.write(compressor.flush())
+    result.seek(0)
+    return result
+
+
+def decompress(data: bytes, compression: str | None) -> bytes:
+    if compression is None:
+        return data
+
+    if compression != ZLIB:
+        raise DecompressionError(f"Unsupported compression: {compression}")
+
+    try:
+        return zlib.decompress(data)
+    except zlib.error as e:
+        raise DecompressionError() from e
+
+
+def decompress_prefix(data: bytes, compression: str | None, size: int) -> bytes:
+    """Decompress a truncated compressed stream, return at most `size` bytes.
+
+    Used for previews: the caller loads just the first few hundred bytes
+    of a compressed body, and decompresses as much as that allows.
+    """
+
+    if compression is None:
+        return data[:size]
+
+    if compression != ZLIB:
+        return b""
+
+    try:
+        return zlib.decompressobj().decompress(data, size)
+    except zlib.error:
+        return b""
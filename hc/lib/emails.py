@@ -105,6 +105,11 @@ def alert(
     send(m, block=True)
 
 
+def digest(to: str, ctx: dict[str, Any], headers: dict[str, str]) -> None:
+    m = make_message("digest", to, ctx, headers=headers)
+    send(m, block=True)
+
+
 def verify_email(to: str, ctx: dict[str, Any]) -> None:
     send(make_message("verify-email", to, ctx))
 
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import logging
-from io import BytesIO
+from io import SEEK_END, BytesIO
 from threading import Thread
+from typing import IO, BinaryIO, cast
 from uuid import UUID
 
 from django.conf import settings
@@ -100,13 +101,27 @@ def get_object(code: str, n: int) -> bytes | None:
                 response.release_conn()
 
 
-def put_object(code: UUID, n: int, data: bytes) -> None:
+def put_object(code: UUID, n: int, data: bytes | IO[bytes]) -> None:
+    """Upload a ping body to S3.
+
+    `data` can be a bytes object or a seekable binary file. The file
+    is uploaded in chunks, without reading it into memory.
+    """
+
     assert settings.S3_BUCKET
     key = "%s/%s" % (code, enc(n))
+    if isinstance(data, bytes):
+        stream: IO[bytes] = BytesIO(data)
+        length = len(data)
+    else:
+        stream = data
+        length = stream.seek(0, SEEK_END)
+
     retries = 10
     while True:
         try:
-            client().put_object(settings.S3_BUCKET, key, BytesIO(data), len(data))
+            stream.seek(0)
+            client().put_object(settings.S3_BUCKET, key, cast(BinaryIO, stream), length)
             break
         except S3Error as e:
             if e.code == "InternalError" and retries > 0:
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Container
+from functools import lru_cache
 
 uuid_match_regex = re.compile(
     "^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.IGNORECASE
@@ -51,10 +53,68 @@ def is_valid_uuid_string(value: str) -> bool:
     return bool(uuid_match_regex.match(value))
 
 
-def match_keywords(haystack: str, keywords: str) -> bool:
-    for s in keywords.split(","):
-        s = s.strip()
-        if s and s in haystack:
-            return True
+def _split_keywords(keywords: str) -> list[str]:
+    return [s.strip() for s in keywords.split(",") if s.strip()]
 
-    return False
+
+class KeywordMatcher:
+    """Match text against a check's failure, success and start keywords.
+
+    The keyword lists are split and deduplicated once, when the matcher is
+    built. A keyword that is listed in a higher-priority category is dropped
+    from the lower-priority categories, as it could never decide the result
+    there. The keywords are then searched with Python's substring search,
+    which, for literal keywords, is faster than a combined regular expression.
+
+    >>> m = KeywordMatcher("ERROR, FATAL", "OK", "START")
+    >>> m.match("STARTing backup")
+    'start'
+    >>> m.match("OK, but ERROR")
+    'fail'
+    >>> m.match("hello") is None
+    True
+
+    """
+
+    def __init__(self, failure_kw: str, success_kw: str, start_kw: str) -> None:
+        seen: set[str] = set()
+        rules = []
+        for action, keywords in (
+            ("fail", failure_kw),
+            ("success", success_kw),
+            ("start", start_kw),
+        ):
+            unique = [
+                s for s in dict.fromkeys(_split_keywords(keywords)) if s not in seen
+            ]
+            seen.update(unique)
+            if unique:
+                rules.append((action, tuple(unique)))
+
+        self.rules = tuple(rules)
+
+    def match(self, haystack: Container[str]) -> str | None:
+        """Return "fail", "success", "start", or None if nothing matches.
+
+        `haystack` is usually a str, but can be any object that supports
+        the `keyword in haystack` test.
+        """
+
+        for action, keywords in self.rules:
+            for keyword in keywords:
+                if keyword in haystack:
+                    return action
+
+        return None
+
+
+@lru_cache(maxsize=1000)
+def keyword_matcher(failure_kw: str, success_kw: str, start_kw: str) -> KeywordMatcher:
+    """Return a KeywordMatcher, cached by the keyword strings."""
+    return KeywordMatcher(failure_kw, success_kw, start_kw)
+
+
+def split_tags(tags: str) -> list[str]:
+    """Split a space-separated tags string into a list of tags."""
+
+    return [t.strip() for t in tags.split(" ") if t.strip()]
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import zlib
+from io import BytesIO
+
+from django.test import SimpleTestCase
+
+from hc.lib.compression import (
+    DecompressionError,
+    compress,
+    compress_file,
+    decompress,
+    decompress_prefix,
+)
+
+
+class CompressionTestCase(SimpleTestCase):
+    def test_it_round_trips(self) -> None:
+        data = b"hello world " * 100
+        compressed = compress(data)
+        self.assertLess(len(compressed), len(data))
+        self.assertEqual(decompress(compressed, "zlib"), data)
+
+    def test_it_passes_through_uncompressed_data(self) -> None:
+        self.assertEqual(decompress(b"hello", None), b"hello")
+
+    def test_it_compresses_files(self) -> None:
+        data = b"hello world " * 100_000
+        f = compress_file(BytesIO(data))
+        self.assertEqual(zlib.decompress(f.read()), data)
+
+    def test_it_rejects_unsupported_compression(self) -> None:
+        with self.assertRaises(DecompressionError):
+            decompress(b"hello", "lz4")
+
+    def test_it_rejects_corrupt_data(self) -> None:
+        with self.assertRaises(DecompressionError):
+            decompress(b"hello", "zlib")
+
+    def test_it_decompresses_prefix(self) -> None:
+        data = bytes(range(256)) * 100
+        compressed = compress(data)
+        prefix = decompress_prefix(compressed[:200], "zlib", 150)
+        self.assertEqual(prefix, data[: len(prefix)])
+        self.assertLessEqual(len(prefix), 150)
+        self.assertTrue(prefix)
+
+    def test_decompress_prefix_handles_uncompressed_data(self) -> None:
+        self.assertEqual(decompress_prefix(b"hello world", None, 5), b"hello")
+
+    def test_decompress_prefix_handles_corrupt_data(self) -> None:
+        self.assertEqual(decompress_prefix(b"hello", "zlib", 150), b"")
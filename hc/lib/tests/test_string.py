@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from unittest import TestCase
 
-from hc.lib.string import replace
+from hc.lib.string import KeywordMatcher, keyword_matcher, replace, split_tags
 
 
 class StringTestCase(TestCase):
@@ -21,3 +21,39 @@ class StringTestCase(TestCase):
     def test_it_preserves_non_placeholder_dollar_signs(self) -> None:
         result = replace("$3.50", {"$A": "text"})
         self.assertEqual(result, "$3.50")
+
+    def test_split_tags(self) -> None:
+        self.assertEqual(split_tags(" foo  bar "), ["foo", "bar"])
+        self.assertEqual(split_tags(" "), [])
+
+
+class KeywordMatcherTestCase(TestCase):
+    def test_it_works(self) -> None:
+        m = KeywordMatcher("ERROR,FATAL", " OK ", "START")
+        self.assertEqual(m.match("Backup FATAL"), "fail")
+        self.assertEqual(m.match("Backup OK"), "success")
+        self.assertEqual(m.match("Backup START"), "start")
+        self.assertIsNone(m.match("Backup"))
+
+    def test_it_prefers_failure_over_success_over_start(self) -> None:
+        m = KeywordMatcher("ERROR", "OK", "START")
+        self.assertEqual(m.match("START OK ERROR"), "fail")
+        self.assertEqual(m.match("START OK"), "success")
+
+    def test_it_finds_overlapping_keywords(self) -> None:
+        m = KeywordMatcher("ERROR", "NO ERROR", "")
+        self.assertEqual(m.match("NO ERROR"), "fail")
+
+    def test_it_drops_empty_and_duplicate_keywords(self) -> None:
+        m = KeywordMatcher("ERROR, ,ERROR", "ERROR,OK", "")
+        self.assertEqual(m.rules, (("fail", ("ERROR",)), ("success", ("OK",))))
+
+    def test_it_handles_no_keywords(self) -> None:
+        m = KeywordMatcher("", "", "")
+        self.assertEqual(m.rules, ())
+        self.assertIsNone(m.match("anything"))
+
+    def test_it_caches_matchers(self) -> None:
+        m1 = keyword_matcher("ERROR", "OK", "")
+        m2 = keyword_matcher("ERROR", "OK", "")
+        self.assertIs(m1, m2)
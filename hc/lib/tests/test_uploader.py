@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import fcntl
+import os
+import time
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import Mock, patch
+from uuid import UUID, uuid4
+
+from django.test import TestCase
+
+from hc.lib.uploader import Uploader
+
+
+@patch("hc.lib.uploader.Uploader.start", Mock())
+class UploaderTestCase(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.spool_dir = Path(tmp.name)
+        self.uploader = Uploader(tmp.name, max_size=2)
+        self.code = uuid4()
+
+    def test_it_spools_and_queues(self) -> None:
+        self.assertTrue(self.uploader.submit(self.code, 1, b"hello"))
+        self.assertEqual(self.uploader.queue.get_nowait(), (self.code, 1))
+        self.assertEqual(self.uploader.get_pending(self.code, 1), b"hello")
+
+    def test_it_spools_files(self) -> None:
+        self.assertTrue(self.uploader.submit(self.code, 1, BytesIO(b"hello")))
+        self.assertEqual(self.uploader.get_pending(self.code, 1), b"hello")
+
+    def test_it_returns_false_when_disabled(self) -> None:
+        uploader = Uploader(None)
+        self.assertFalse(uploader.submit(self.code, 1, b"hello"))
+        self.assertIsNone(uploader.get_pending(self.code, 1))
+
+    def test_it_returns_false_when_queue_is_full(self) -> None:
+        self.assertTrue(self.uploader.submit(self.code, 1, b"hello"))
+        self.assertTrue(self.uploader.submit(self.code, 2, b"hello"))
+        self.assertFalse(self.uploader.submit(self.code, 3, b"hello"))
+        # The file of the rejected body should not be left in the spool
+        self.assertIsNone(self.uploader.get_pending(self.code, 3))
+
+    @patch("hc.lib.uploader.put_object")
+    def test_it_uploads_and_removes_file(self, put_object: Mock) -> None:
+        def upload(code: UUID, n: int, f: BytesIO) -> None:
+            self.assertEqual(f.read(), b"hello")
+
+        put_object.side_effect = upload
+        self.uploader.submit(self.code, 1, b"hello")
+        self.uploader.upload(self.code, 1)
+
+        put_object.assert_called_once()
+        self.assertIsNone(self.uploader.get_pending(self.code, 1))
+
+    @patch("hc.lib.uploader.put_object")
+    def test_it_skips_files_locked_by_other_process(self, put_object: Mock) -> None:
+        self.uploader.submit(self.code, 1, b"hello")
+        with self.uploader.path(self.code, 1).open("rb") as f:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.uploader.upload(self.code, 1)
+
+        put_object.assert_not_called()
+        self.assertEqual(self.uploader.get_pending(self.code, 1), b"hello")
+
+    @patch("hc.lib.uploader.put_object")
+    def test_it_skips_files_replaced_while_waiting(self, put_object: Mock) -> None:
+        self.uploader.submit(self.code, 1, b"hello")
+        path = self.uploader.path(self.code, 1)
+
+        def stat() -> os.stat_result:
+            # Simulate another process removing the file after we opened it
+            path.unlink()
+            raise FileNotFoundError()
+
+        with patch.object(Path, "stat", side_effect=stat):
+            self.uploader.upload(self.code, 1)
+
+        put_object.assert_not_called()
+
+    @patch("hc.lib.uploader.put_object")
+    def test_it_skips_already_uploaded(self, put_object: Mock) -> None:
+        self.uploader.upload(self.code, 1)
+        put_object.assert_not_called()
+
+    def test_it_recovers_files(self) -> None:
+        old = self.spool_dir / f"{self.code}-1"
+        old.write_bytes(b"hello")
+        past = time.time() - 3600
+        os.utime(old, (past, past))
+
+        # Recently spooled files, for example from just before a crash,
+        # should be recovered too
+        (self.spool_dir / f"{self.code}-2").write_bytes(b"hello")
+        # Temporary files are skipped
+        (self.spool_dir / f".{self.code}-3.tmp").write_bytes(b"hello")
+
+        self.uploader.recover()
+        queued = {self.uploader.queue.get_nowait() for _ in range(0, 2)}
+        self.assertEqual(queued, {(self.code, 1), (self.code, 2)})
+        self.assertTrue(self.uploader.queue.empty())
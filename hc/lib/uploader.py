@@ -0,0 +1,191 @@
+"""Asynchronous uploads of ping bodies to S3.
+
+When S3_UPLOAD_SPOOL_DIR is set, Check.ping() does not upload ping bodies to S3
+in the request handler. Instead, it writes the body to a file in the spool
+directory, and queues it for upload. A pool of S3_UPLOAD_THREADS background
+threads uploads the queued files and removes them once uploaded.
+
+The spool directory is the source of truth for pending uploads: files left
+over from a previous run (for example, after a restart or a failed upload)
+get queued again when the uploader starts. While a body is waiting in the
+spool, Ping.get_body_bytes() reads it from the spool instead of S3.
+
+All web server processes on a host share the spool directory, and each of
+them queues the leftover files when its uploader starts. Before uploading
+a file, the uploader takes an exclusive lock on it (flock), and skips files
+another process is already uploading, so each file gets uploaded once.
+
+The queue is bounded. When it is full, or when writing to the spool fails,
+submit() returns False, and the caller falls back to a synchronous upload.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from queue import Full, Queue
+from threading import Lock, Thread
+from typing import IO
+from uuid import UUID
+
+from django.conf import settings
+
+from hc.lib.s3 import put_object
+from hc.lib.statsd import statsd
+
+logger = logging.getLogger(__name__)
+
+# Delay before retrying a failed upload, in seconds
+RETRY_DELAY = 5
+
+
+class Uploader:
+    def __init__(
+        self, spool_dir: str | None, num_threads: int = 4, max_size: int = 1000
+    ) -> None:
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.num_threads = num_threads
+        self.queue: Queue[tuple[UUID, int]] = Queue(maxsize=max_size)
+        self.threads: list[Thread] = []
+        self.lock = Lock()
+
+    def start(self) -> None:
+        assert self.spool_dir
+        with self.lock:
+            if self.threads:
+                return
+
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            for _ in range(self.num_threads):
+                self.threads.append(Thread(target=self.run, daemon=True))
+            self.threads.append(Thread(target=self.recover, daemon=True))
+            for t in self.threads:
+                t.start()
+
+    def path(self, code: UUID, n: int) -> Path:
+        assert self.spool_dir
+        return self.spool_dir / f"{code}-{n}"
+
+    def submit(self, code: UUID, n: int, data: bytes | IO[bytes]) -> bool:
+        """Write the ping body to the spool and queue it for upload.
+
+        Return False if the uploader is disabled, the queue is full, or the
+        body could not be written to the spool. The caller should then
+        upload the body synchronously.
+        """
+
+        if self.spool_dir is None:
+            return False
+
+        self.start()
+        path = self.path(code, n)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        try:
+            with tmp_path.open("wb") as f:
+                if isinstance(data, bytes):
+                    f.write(data)
+                else:
+                    data.seek(0)
+                    shutil.copyfileobj(data, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.exception("Could not write ping body to the upload spool")
+            tmp_path.unlink(missing_ok=True)
+            return False
+
+        try:
+            self.queue.put_nowait((code, n))
+        except Full:
+            statsd.incr("hc.lib.uploader.overflow")
+            path.unlink(missing_ok=True)
+            return False
+
+        statsd.gauge("hc.lib.uploader.queueDepth", self.queue.qsize())
+        return True
+
+    def get_pending(self, code: UUID, n: int) -> bytes | None:
+        """Return the ping body if it is still waiting for upload in the spool."""
+
+        if self.spool_dir is None:
+            return None
+
+        try:
+            return self.path(code, n).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def run(self) -> None:
+        while True:
+            code, n = self.queue.get()
+            statsd.gauge("hc.lib.uploader.queueDepth", self.queue.qsize())
+            try:
+                self.upload(code, n)
+            except Exception:
+                logger.exception("Exception while uploading ping body")
+                statsd.incr("hc.lib.uploader.errors")
+                time.sleep(RETRY_DELAY)
+                try:
+                    self.queue.put_nowait((code, n))
+                except Full:
+                    # The file stays in the spool, and will be picked up on
+                    # the next restart
+                    pass
+
+    def upload(self, code: UUID, n: int) -> None:
+        path = self.path(code, n)
+        try:
+            f = path.open("rb")
+        except FileNotFoundError:
+            # Another process has already uploaded this body
+            return
+
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process is uploading this body
+                return
+
+            try:
+                if path.stat().st_ino != os.fstat(f.fileno()).st_ino:
+                    return
+            except FileNotFoundError:
+                # Another process uploaded and removed the file while we
+                # were waiting for the lock
+                return
+
+            queued_at = os.fstat(f.fileno()).st_mtime
+            with statsd.timer("hc.lib.uploader.uploadTime"):
+                put_object(code, n, f)
+
+            # Remove the file while still holding the lock
+            path.unlink(missing_ok=True)
+        latency_ms = int((time.time() - queued_at) * 1000)
+        statsd.timing("hc.lib.uploader.latency", latency_ms)
+
+    def recover(self) -> None:
+        """Queue the spool files left over from previous runs."""
+
+        assert self.spool_dir
+        # This also queues files other running processes have queued. That is
+        # fine: upload() locks each file, so it only gets uploaded once.
+        for path in self.spool_dir.iterdir():
+            code_str, _, n_str = path.name.rpartition("-")
+            try:
+                code, n = UUID(code_str), int(n_str)
+            except ValueError:
+                # Skip temporary files
+                continue
+
+            self.queue.put((code, n))
+
+
+uploader = Uploader(
+    settings.S3_UPLOAD_SPOOL_DIR,
+    num_threads=settings.S3_UPLOAD_THREADS,
+    max_size=settings.S3_UPLOAD_QUEUE_SIZE,
+)
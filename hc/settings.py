@@ -270,10 +270,41 @@ MASTER_BADGE_LABEL = os.getenv("MASTER_BADGE_LABEL", SITE_NAME)
 PING_ENDPOINT = os.getenv("PING_ENDPOINT", SITE_ROOT + "/ping/")
 PING_EMAIL_DOMAIN = os.getenv("PING_EMAIL_DOMAIN", "localhost")
 PING_BODY_LIMIT = envint("PING_BODY_LIMIT", "10000")
+PING_BODY_COMPRESSION = envbool("PING_BODY_COMPRESSION", "False")
 # If PING_BODY_LIMIT is higher than the default value for DATA_UPLOAD_MAX_MEMORY_SIZE,
 # then we need to bump up DATA_UPLOAD_MAX_MEMORY_SIZE too:
 if PING_BODY_LIMIT and PING_BODY_LIMIT > 2621440:
     DATA_UPLOAD_MAX_MEMORY_SIZE = PING_BODY_LIMIT
+# Write-behind buffering of incoming pings, see hc/api/pingbuffer.py
+PING_BUFFER_ENABLED = envbool("PING_BUFFER_ENABLED", "False")
+PING_BUFFER_INTERVAL = envint("PING_BUFFER_INTERVAL", "200") or 200
+PING_BUFFER_SIZE = envint("PING_BUFFER_SIZE", "10000") or 10000
+# The number of threads for the database work of the ASGI ping endpoints
+ASGI_PING_THREADS = envint("ASGI_PING_THREADS", "10") or 10
+# Unix socket for waking up sendalerts on non-PostgreSQL databases,
+# see hc/api/wakeup.py
+SENDALERTS_WAKEUP_SOCKET = os.getenv("SENDALERTS_WAKEUP_SOCKET")
+
+# Caching of ping target lookups, see hc/api/pingcache.py
+PING_CACHE_TTL = envint("PING_CACHE_TTL", "0") or 0
+PING_CACHE_MAX_ENTRIES = envint("PING_CACHE_MAX_ENTRIES", "100000") or 100000
+CACHES: Mapping[str, Any] = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "pings": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "pings",
+        "OPTIONS": {"MAX_ENTRIES": PING_CACHE_MAX_ENTRIES},
+    },
+}
+if v := os.getenv("PING_CACHE_REDIS_URL"):
+    CACHES = {
+        "default": CACHES["default"],
+        "pings": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": v,
+            "KEY_PREFIX": "hc-pings",
+        },
+    }
 _site_root_parts = urlparse(SITE_ROOT)
 LOGIN_URL = f"{_site_root_parts.path}/accounts/login/"
 STATIC_URL = f"{_site_root_parts.path}/static/"
@@ -345,6 +376,10 @@ S3_REGION = os.getenv("S3_REGION")
 S3_BUCKET = os.getenv("S3_BUCKET")
 S3_TIMEOUT = envint("S3_TIMEOUT", "60")
 S3_SECURE = envbool("S3_SECURE", "True")
+# Upload ping bodies to S3 from background threads, see hc/lib/uploader.py
+S3_UPLOAD_SPOOL_DIR = os.getenv("S3_UPLOAD_SPOOL_DIR")
+S3_UPLOAD_THREADS = envint("S3_UPLOAD_THREADS", "4") or 4
+S3_UPLOAD_QUEUE_SIZE = envint("S3_UPLOAD_QUEUE_SIZE", "1000") or 1000
 
 # To enable statsd metric collection, set STATSD_HOST="host:hostport"
 # (example: "localhost:8125")